@@ -0,0 +1,8 @@
+"""
+deckkit: gallery / profile / scripts の各スクリプトから共通で利用するヘルパー集
+
+各スクリプトはリポジトリのルートを sys.path に追加してから import します。
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+    from deckkit.render_cache import DiskRenderCache
+"""
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+画像アセットの管理（マニフェストに沿った一括読み込み）
+
+assets/manifest.json に書いた「キー: ファイル（マニフェストからの相対パス）」の画像を起動時にまとめて読み込み、
+デッキのキーサイズにリサイズした画像と、ネイティブ形式（PILHelper.to_native_format の結果）のバイト列を
+キーごとにメモリに保持します。ゲーム中やアニメーション中にファイルを開いたりリサイズしたりすることはありません。
+
+- デコード・リサイズ・エンコードはスレッドプールで並列に行います（Pillow の処理中は GIL が解放されます）。
+- 各画像は 1 回だけデコードします。パスはマニフェストの場所から解決するので、実行時のカレントディレクトリに依存しません。
+- ファイルがない・読めないアセットは警告を 1 回表示してスキップします（image() / native() は None を返します）。
+- ディスクキャッシュを指定すると、リサイズ・エンコード済みの結果を機種ごとに保存し、
+  元のファイルの更新時刻（mtime）とサイズが変わっていなければ次回起動時はデコードせずに読み込みます。
+
+環境変数 STREAMDECK_ASSET_CACHE でディスクキャッシュを有効化します。
+    STREAMDECK_ASSET_CACHE=1            -> $XDG_CACHE_HOME/handson-streamdeck/assets を使用
+    STREAMDECK_ASSET_CACHE=/path/to/dir -> 指定ディレクトリを使用
+
+    assets = AssetStore.from_env(deck).load(["slot/cherry", "slot/lemon"])
+    deck.set_key_image(0, assets.native("slot/cherry"))
+"""
+
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+from StreamDeck.ImageHelpers import PILHelper
+
+from .render_cache import deck_model
+
+DEFAULT_MANIFEST = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "assets", "manifest.json")
+_SUFFIX = ".asset"
+
+
+def default_cache_dir() -> str:
+    """ XDG のキャッシュディレクトリ配下の既定パスを返します。 """
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "handson-streamdeck", "assets")
+
+
+def load_manifest(path: str = DEFAULT_MANIFEST) -> dict:
+    """ マニフェストを読み込み、{キー: ファイルの絶対パス} を返します。 """
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    return {key: os.path.normpath(os.path.join(base, relative)) for key, relative in entries.items()}
+
+
+class AssetStore:
+    """
+    Args:
+        deck: Stream Deck オブジェクト（open 済み）。キーサイズとネイティブ形式の決定に使います。
+        manifest (str): マニフェストのパス。
+        cache_dir (str): ディスクキャッシュのディレクトリ（省略時はキャッシュしない）。
+
+    Attributes:
+        decoded (int): load() で画像ファイルをデコードした数。
+        loaded (int): load() でディスクキャッシュから読み込んだ数。
+        missing (list): 読み込めなかったキー。
+    """
+
+    def __init__(self, deck, manifest: str = DEFAULT_MANIFEST, cache_dir: str = None):
+        self.deck = deck
+        self.paths = load_manifest(manifest)
+        self.cache_dir = cache_dir
+        self.width, self.height = deck.key_image_format()["size"]
+        self.model = deck_model(deck)
+        self.decoded = 0
+        self.loaded = 0
+        self.missing = []
+        self._images = {}  # key -> (キーサイズの PIL.Image, ネイティブ形式の画像)
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @classmethod
+    def from_env(cls, deck, manifest: str = DEFAULT_MANIFEST):
+        """ 環境変数 STREAMDECK_ASSET_CACHE が設定されていればディスクキャッシュを使うストアを作成します。 """
+        setting = os.environ.get("STREAMDECK_ASSET_CACHE", "")
+        cache_dir = None
+        if setting and setting != "0":
+            cache_dir = default_cache_dir() if setting == "1" else setting
+        return cls(deck, manifest=manifest, cache_dir=cache_dir)
+
+    def _cache_path(self, key: str) -> str:
+        digest = hashlib.sha256(f"{self.model}\0{self.paths[key]}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest + _SUFFIX)
+
+    def _read_cache(self, key: str, stat):
+        """
+        キャッシュファイルは 1 行目がヘッダー（JSON）、続いて RGB の画素、ネイティブ形式の画像です。
+        元のファイルの mtime・サイズが記録と違う場合や、キャッシュファイルが壊れている場合は None を返します。
+        """
+        try:
+            with open(self._cache_path(key), "rb") as f:
+                header = json.loads(f.readline())
+                if header["mtime_ns"] != stat.st_mtime_ns or header["size"] != stat.st_size:
+                    return None
+                pixels = f.read(header["pixels"])
+                native = f.read()
+            # 書き込み途中で切れたファイルなどは、元の画像から作り直す
+            image = Image.frombytes("RGB", (self.width, self.height), pixels)
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return image, native
+
+    def _write_cache(self, key: str, stat, image, native) -> None:
+        pixels = image.tobytes()
+        header = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "pixels": len(pixels)}
+        path = self._cache_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(json.dumps(header).encode("utf-8") + b"\n")
+                f.write(pixels)
+                f.write(bytes(native))
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    def _load_one(self, key: str):
+        path = self.paths[key]
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return key, None, False
+        if self.cache_dir is not None:
+            cached = self._read_cache(key, stat)
+            if cached is not None:
+                return key, cached, True
+        try:
+            with Image.open(path) as source:
+                image = source.convert("RGB").resize((self.width, self.height))
+        except OSError:
+            return key, None, False
+        native = PILHelper.to_native_format(self.deck, image)
+        if self.cache_dir is not None:
+            self._write_cache(key, stat, image, native)
+        return key, (image, native), False
+
+    def load(self, keys=None, workers: int = None):
+        """
+        keys（省略時はマニフェストのすべて）のうちまだ読み込んでいないものを並列に読み込み、自分自身を返します。
+        """
+        keys = [key for key in (self.paths if keys is None else keys) if key not in self._images]
+        unknown = [key for key in keys if key not in self.paths]
+        if unknown:
+            raise KeyError(f"not in the asset manifest: {', '.join(unknown)}")
+        if not keys:
+            return self
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+            for key, result, from_cache in pool.map(self._load_one, keys):
+                if result is None:
+                    print(f"アセット {key} を読み込めませんでした: {self.paths[key]}")
+                    self.missing.append(key)
+                    continue
+                self._images[key] = result
+                if from_cache:
+                    self.loaded += 1
+                else:
+                    self.decoded += 1
+        return self
+
+    def image(self, key: str):
+        """ キーサイズにリサイズ済みの画像（PIL.Image）を返します（読み込めていなければ None）。 """
+        entry = self._images.get(key)
+        return entry[0] if entry is not None else None
+
+    def native(self, key: str):
+        """ ネイティブ形式の画像を返します（読み込めていなければ None）。 """
+        entry = self._images.get(key)
+        return entry[1] if entry is not None else None
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._images
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+ディスク上のレンダリングキャッシュ
+
+キー画像をネイティブ形式（PILHelper.to_native_format の結果）のバイト列としてディスクに保存し、
+再起動後も同じ表示内容なら描画をスキップしてすぐに表示できるようにします。
+
+- キャッシュキーは「描画指定（spec）」「デッキの機種とキー画像形式」「コードのバージョン」のハッシュです。
+- 起動時はディレクトリ一覧（ファイル名とサイズ）だけを読み、中身は最初に参照されたときに読み込みます。
+- 合計サイズが上限を超えると、最終利用時刻の古いものから削除します。
+
+環境変数 STREAMDECK_RENDER_CACHE で有効化します。
+    STREAMDECK_RENDER_CACHE=1            -> $XDG_CACHE_HOME/handson-streamdeck/tiles を使用
+    STREAMDECK_RENDER_CACHE=/path/to/dir -> 指定ディレクトリを使用
+    STREAMDECK_RENDER_CACHE_MB=64        -> 容量上限（MB、既定 64）
+"""
+
+import hashlib
+import os
+import threading
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+_SUFFIX = ".tile"
+
+
+def default_cache_dir() -> str:
+    """ XDG のキャッシュディレクトリ配下の既定パスを返します。 """
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "handson-streamdeck", "tiles")
+
+
+def code_version(*paths: str) -> str:
+    """
+    描画コードのバージョン文字列を返します。
+    指定したソースファイルの内容のハッシュなので、描画処理を書き換えるとキャッシュは自動的に無効になります。
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def deck_model(deck) -> str:
+    """ デッキの機種とキー画像形式（サイズ、形式、反転、回転）を表す文字列を返します。 """
+    fmt = deck.key_image_format()
+    return f"{deck.deck_type()}|{fmt['size']}|{fmt['format']}|{fmt.get('flip')}|{fmt.get('rotation')}"
+
+
+class DiskRenderCache:
+    """
+    ネイティブ形式のタイル画像をディスクに保存するキャッシュ。
+
+    Args:
+        directory (str): キャッシュディレクトリ。
+        model (str): deck_model() の戻り値。
+        version (str): code_version() の戻り値など、描画コードを識別する文字列。
+        max_bytes (int): ディスク上の合計サイズの上限。
+    """
+
+    def __init__(self, directory: str, model: str, version: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.model = model
+        self.version = version
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._memory = {}  # digest -> bytes（一度読んだタイル）
+        self._index = {}   # digest -> ファイルサイズ（起動時はここだけを読む）
+        self._total_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    @classmethod
+    def from_env(cls, deck, version: str):
+        """ 環境変数 STREAMDECK_RENDER_CACHE が設定されていればキャッシュを作成し、なければ None を返します。 """
+        setting = os.environ.get("STREAMDECK_RENDER_CACHE", "")
+        if not setting or setting == "0":
+            return None
+        directory = default_cache_dir() if setting == "1" else setting
+        max_bytes = int(float(os.environ.get("STREAMDECK_RENDER_CACHE_MB", "64")) * 1024 * 1024)
+        return cls(directory, deck_model(deck), version, max_bytes=max_bytes)
+
+    def _scan(self) -> None:
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(_SUFFIX):
+                size = entry.stat().st_size
+                self._index[entry.name[:-len(_SUFFIX)]] = size
+                self._total_bytes += size
+
+    def _digest(self, spec) -> str:
+        return hashlib.sha256(f"{self.version}\0{self.model}\0{spec!r}".encode("utf-8")).hexdigest()
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest + _SUFFIX)
+
+    def get(self, spec):
+        """ spec に対応するネイティブ形式の画像を返します。なければ None。 """
+        digest = self._digest(spec)
+        with self._lock:
+            data = self._memory.get(digest)
+            known = digest in self._index
+        if data is None and known:
+            try:
+                with open(self._path(digest), "rb") as f:
+                    data = f.read()
+                # 最終利用時刻として mtime を更新（削除順序に利用）
+                os.utime(self._path(digest))
+            except OSError:
+                data = None
+            with self._lock:
+                if data is None:
+                    self._forget(digest)
+                else:
+                    self._memory[digest] = data
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return data
+
+    def put(self, spec, data) -> None:
+        """ spec に対応するネイティブ形式の画像を保存します。 """
+        data = bytes(data)
+        digest = self._digest(spec)
+        path = self._path(digest)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        with self._lock:
+            self._memory[digest] = data
+            self._total_bytes += len(data) - self._index.get(digest, 0)
+            self._index[digest] = len(data)
+            self.writes += 1
+            over = self._total_bytes > self.max_bytes
+        if over:
+            self._evict()
+
+    def get_or_render(self, spec, render):
+        """
+        キャッシュにあればそれを返し、なければ render() を呼び出して結果を保存します。
+        render はネイティブ形式の画像（bytes など）を返す関数です。
+        """
+        data = self.get(spec)
+        if data is None:
+            data = render()
+            self.put(spec, data)
+        return data
+
+    def _forget(self, digest: str) -> None:
+        self._total_bytes -= self._index.pop(digest, 0)
+        self._memory.pop(digest, None)
+
+    def _evict(self) -> None:
+        """ 最終利用時刻の古いものから、上限の 90% まで削除します。 """
+        entries = []
+        for digest in list(self._index):
+            try:
+                entries.append((os.stat(self._path(digest)).st_mtime, digest))
+            except OSError:
+                entries.append((0, digest))
+        entries.sort()
+        target = self.max_bytes * 0.9
+        for _, digest in entries:
+            with self._lock:
+                if self._total_bytes <= target:
+                    return
+                self._forget(digest)
+                self.evictions += 1
+            try:
+                os.remove(self._path(digest))
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        """ ヒット数などの統計情報を返します。 """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "entries": len(self._index),
+                "bytes": self._total_bytes,
+            }
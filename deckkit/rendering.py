@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+重い描画バックエンド（Pango / PangoCairo / Cairo / OpenCV）の遅延 import
+
+gi（PyGObject）・cairo・cv2 の import は合わせて数百ミリ秒かかり、モジュールの先頭で import すると
+デッキに最初の画像が表示されるまでの時間がその分だけ延びます。
+ここで公開しているオブジェクトは、最初に属性を参照したときに初めて本物のモジュールを import するので、
+先頭で import しても起動は遅くならず、使わないスクリプトでは import 自体が起きません。
+
+    from deckkit.rendering import Pango, PangoCairo, cairo
+
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)  # ここで cairo を import
+    layout = PangoCairo.create_layout(ctx)                            # ここで gi と PangoCairo を import
+
+起動時間の計測は scripts/bench_startup.py を参照してください。
+"""
+
+import importlib
+import threading
+
+_lock = threading.RLock()
+
+
+def _gi_repository(name: str):
+    import gi  # pylint: disable=import-outside-toplevel
+    gi.require_version("Pango", "1.0")
+    gi.require_version(name, "1.0")
+    return importlib.import_module(f"gi.repository.{name}")
+
+
+class LazyModule:
+    """
+    最初の属性参照でモジュールを import し、以降はそのモジュールの属性を返す代理オブジェクト。
+
+    Args:
+        name (str): 表示用の名前。
+        loader (callable): モジュールを import して返す関数。
+    """
+
+    def __init__(self, name: str, loader):
+        self._name = name
+        self._loader = loader
+        self._module = None
+
+    def load(self):
+        """ モジュールを import して返します（2 回目以降は import 済みのものを返します）。 """
+        if self._module is None:
+            with _lock:
+                if self._module is None:
+                    self._module = self._loader()
+        return self._module
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, attr: str):
+        return getattr(self.load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<LazyModule {self._name} ({state})>"
+
+
+Pango = LazyModule("Pango", lambda: _gi_repository("Pango"))
+PangoCairo = LazyModule("PangoCairo", lambda: _gi_repository("PangoCairo"))
+cairo = LazyModule("cairo", lambda: importlib.import_module("cairo"))
+cv2 = LazyModule("cv2", lambda: importlib.import_module("cv2"))
+
+BACKENDS = {"Pango": Pango, "PangoCairo": PangoCairo, "cairo": cairo, "cv2": cv2}
+
+
+def loaded_backends() -> list:
+    """ これまでに import されたバックエンドの名前を返します。 """
+    return [name for name, module in BACKENDS.items() if module.loaded]
@@ -1,27 +1,27 @@
 #!/usr/bin/env python3
+import os
+import sys
 import time
 from StreamDeck.DeviceManager import DeviceManager
-from PIL import Image
-from StreamDeck.ImageHelpers import PILHelper
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from deckkit.assets import AssetStore
 
 deck = DeviceManager().enumerate()[0]
 deck.open()
 deck.reset()
-key_format = deck.key_image_format()
-w, h = key_format["size"]
-
-# ※ 適宜、存在する画像ファイルのパスに変更してください
-image_path = "assets/sample2.png"
 
-try:
-    image = Image.open(image_path).resize((w, h))
-except Exception as e:
-    print(f"画像読み込みエラー: {e}")
+# ※ 表示する画像は assets/manifest.json のキーで指定します（ファイルの場所はマニフェストに登録してください）
+# 起動時にキーサイズへのリサイズとデッキのネイティブ形式への変換まで済ませておきます
+image_key = "sample2"
+assets = AssetStore.from_env(deck).load([image_key])
+image = assets.native(image_key)
+if image is None:
     deck.reset()
     deck.close()
     exit()
 
-deck.set_key_image(0, PILHelper.to_native_format(deck, image))
+deck.set_key_image(0, image)
 time.sleep(5)
 deck.reset()
 deck.close()
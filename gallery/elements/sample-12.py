@@ -1,21 +1,23 @@
 #!/usr/bin/env python3
+import os
+import sys
 import time
 from StreamDeck.DeviceManager import DeviceManager
-from PIL import Image
 from StreamDeck.ImageHelpers import PILHelper
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from deckkit.assets import AssetStore
+
 deck = DeviceManager().enumerate()[0]
 deck.open()
 deck.reset()
-key_format = deck.key_image_format()
-w, h = key_format["size"]
 
-# ※ 適宜、存在するアイコンファイルのパスに変更してください
-icon_path = "assets/sample2.png"
-try:
-    icon = Image.open(icon_path).resize((w, h))
-except Exception as e:
-    print(f"アイコン読み込みエラー: {e}")
+# ※ 表示するアイコンは assets/manifest.json のキーで指定します（ファイルの場所はマニフェストに登録してください）
+# 起動時にキーサイズにリサイズしておきます
+icon_key = "sample2"
+assets = AssetStore.from_env(deck).load([icon_key])
+icon = assets.image(icon_key)
+if icon is None:
     deck.reset()
     deck.close()
     exit()
@@ -1,12 +1,15 @@
 #!/usr/bin/env python3
 import time
-import cv2
 import math
 import os
+import sys
 from PIL import Image
 from StreamDeck.DeviceManager import DeviceManager
 from StreamDeck.ImageHelpers import PILHelper
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from deckkit.rendering import cv2  # 最初の使用時に import（デッキの初期化を先に済ませる）
+
 
 def slice_image_to_keys(full_image, rows, cols, key_width, key_height):
     """
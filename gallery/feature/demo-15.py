@@ -1,10 +1,14 @@
 #!/usr/bin/env python3
+import os
+import sys
 import time
-import cv2
 from PIL import Image
 from StreamDeck.DeviceManager import DeviceManager
 from StreamDeck.ImageHelpers import PILHelper
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from deckkit.rendering import cv2  # 最初の使用時に import（デッキの初期化を先に済ませる）
+
 
 def precompute_coords(rows, cols, key_width, key_height):
     """各キーの左上座標 (x, y) をリストで返す"""
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+落ちものパズルのエンジン（tetromino.py）のベンチマーク
+
+ランダムな操作（左右移動・回転・落下）をデッキなしで繰り返し、1 秒あたりに処理できた操作数を表示します。
+
+例:
+    python gallery/game/bench_tetromino.py --board 8x4 --moves 2000000
+"""
+
+import argparse
+import functools
+import random
+import time
+
+from tetromino import Board
+
+
+def bench(width: int, height: int, moves: int, seed: int) -> None:
+    board = Board(width, height, seed=seed)
+    rng = random.Random(seed)
+    actions = [functools.partial(board.move, -1), functools.partial(board.move, 1), board.rotate, board.tick]
+    script = [rng.choice(actions) for _ in range(4096)]
+    games = 0
+    start = time.perf_counter()
+    for i in range(moves):
+        script[i & 4095]()
+        if board.over:
+            games += 1
+            board.reset()
+    elapsed = time.perf_counter() - start
+    print(f"{width}x{height}: {moves / elapsed:12,.0f} moves/s "
+          f"({games} games, {board.lines} lines in the last game)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--board", default="4x4,8x4", help="盤面の大きさ（カンマ区切りで複数指定可）")
+    parser.add_argument("--moves", type=int, default=1000000, help="操作数")
+    parser.add_argument("--seed", type=int, default=0, help="乱数の種")
+    args = parser.parse_args()
+    for size in args.board.split(","):
+        width, height = (int(part) for part in size.lower().split("x"))
+        bench(width, height, args.moves, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+複数の Stream Deck を横に並べて 1 台として扱うラッパー
+
+同じ機種のデッキを左から順に並べ、キー番号を「行 × (全デッキの列数の合計) + 列」に振り直します。
+GameEngine・SpriteAtlas・DiskRenderCache には 1 台のデッキと同じように渡せます。
+
+    span = DeckSpan(DeviceManager().enumerate()[:2])
+    span.open()
+    engine = GameEngine(span, render_spec)
+"""
+
+
+class DeckSpan:
+    """
+    Args:
+        decks (list): 並べるデッキ（左から順、すべて同じ機種）。
+
+    Attributes:
+        rows (int): 行数。
+        columns (int): 全デッキの列数の合計。
+    """
+
+    def __init__(self, decks):
+        decks = list(decks)
+        if not decks:
+            raise ValueError("DeckSpan needs at least one deck")
+        if len({deck.deck_type() for deck in decks}) > 1:
+            raise ValueError("all decks in a span must be the same model")
+        self.decks = decks
+        self.rows, self.deck_columns = decks[0].key_layout()
+        self.columns = self.deck_columns * len(decks)
+
+    def open(self) -> None:
+        for deck in self.decks:
+            deck.open()
+
+    def reset(self) -> None:
+        for deck in self.decks:
+            deck.reset()
+
+    def close(self) -> None:
+        for deck in self.decks:
+            deck.close()
+
+    def deck_type(self) -> str:
+        return self.decks[0].deck_type()
+
+    def key_image_format(self) -> dict:
+        return self.decks[0].key_image_format()
+
+    def key_layout(self) -> tuple:
+        return self.rows, self.columns
+
+    def key_count(self) -> int:
+        return self.rows * self.columns
+
+    def locate(self, key: int) -> tuple:
+        """ 通し番号のキーを (デッキ, デッキ内のキー番号) に変換します。 """
+        row, column = divmod(key, self.columns)
+        index, column = divmod(column, self.deck_columns)
+        return self.decks[index], row * self.deck_columns + column
+
+    def set_key_image(self, key: int, image) -> None:
+        deck, key = self.locate(key)
+        deck.set_key_image(key, image)
+
+    def set_key_callback(self, callback) -> None:
+        """ 各デッキのキーイベントを通し番号に変換して callback(span, key, state) を呼び出します。 """
+        for index, deck in enumerate(self.decks):
+            def relay(_deck, key, state, offset=index * self.deck_columns):
+                row, column = divmod(key, self.deck_columns)
+                callback(self, row * self.columns + offset + column, state)
+            deck.set_key_callback(relay)
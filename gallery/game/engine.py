@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+gallery/game の共通ゲームエンジン（tick ベース）
+
+各タイトルは次の関数を用意して GameEngine.run() に渡します。
+
+    frame()       -> {キー番号: spec}  現在の状態で各キーに表示する内容（spec はハッシュ可能な値）
+    on_key(key)   キーが押されたときの処理
+    update(now)   固定間隔（step 秒）ごとのシミュレーション。
+                  時間の経過でまだ状態が変わりうる（アニメーション中・タイマー待ちなど）なら True を返します。
+    render(spec, width, height) -> PIL.Image   spec からキー画像を作る関数（GameEngine の引数）
+
+- キーイベントはデッキのコールバックスレッドからキューに積むだけで、状態の変更と描画は
+  すべて run() を呼んだスレッドで行います（タイトル側でロックは不要です）。
+- frame() の結果を前回と比較し、spec が変わったキーだけを描画・書き込みします。
+  描画結果は spec ごとにメモリ（と指定があればディスク）にキャッシュします。
+  atlas（sprites.SpriteAtlas）を渡すと、起動時に描画済みの spec はそのまま書き込みます。
+- シミュレーションは固定間隔で進めます。処理が遅れた場合はまとめて進めて追いつきます（最大 max_catchup 回）。
+- 「○秒後に〜する」処理は timers（timers.TimerWheel）に予約すると、各 tick の update() の前に呼び出します。
+- update が False を返し予約もなく、入力もない間は、キューを待つだけなのでアイドル時の CPU 使用率はほぼ 0 です。
+- 各 tick の予定時刻からの遅れを記録します（jitter() で平均・最大を取得できます）。
+- キー入力ごとに、デッキのコールバックで受け取ってから結果がキーに書き込まれる（set_key_image が戻る）までの
+  時間を記録します（latency_summary() でパーセンタイルを表示できます）。押されたキーは最初に書き込みます。
+
+    engine = GameEngine(deck, render_spec, step=0.1)
+    engine.run(frame, on_key=on_key, update=update_game_state)
+"""
+
+import math
+import queue
+import time
+from collections import OrderedDict, deque, namedtuple
+
+from StreamDeck.ImageHelpers import PILHelper
+
+from timers import TimerWheel
+
+# キー入力 1 回の遅延（秒）: 合計、キューで待った時間、on_key の処理時間、
+# on_key の後で結果の書き込みが終わるまでの時間（その間の tick・描画・エンコード・書き込み）
+KeyLatency = namedtuple("KeyLatency", ["total", "queued", "handled", "drawn"])
+
+
+def percentile(values, p: float) -> float:
+    """ values の p パーセンタイル（最近接順位法）。values が空なら 0.0。 """
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = min(len(ordered), max(1, math.ceil(p / 100 * len(ordered))))
+    return ordered[rank - 1]
+
+
+class GameEngine:
+    """
+    Args:
+        deck: Stream Deck オブジェクト（open 済み）。
+        render (callable): render(spec, width, height) -> PIL.Image
+        step (float): シミュレーションの固定間隔（秒）。
+        cache: deckkit.render_cache.DiskRenderCache（省略可）。
+        atlas: sprites.SpriteAtlas（省略可）。
+        clock (callable): 現在時刻（秒）を返す関数。
+        max_images (int): メモリにキャッシュする描画結果の数。
+        max_catchup (int): 1 回の処理でまとめて進める tick 数の上限。
+        history (int): tick の遅れ・キー入力の遅延を記録しておく件数。
+
+    Attributes:
+        now (float): シミュレーション時刻。update() とキー処理の中ではこの値を現在時刻として使います。
+        timers (TimerWheel): 遅れて起こる状態遷移の予約（時刻は now と同じ時計、精度は step）。
+        width, height (int): キー画像のサイズ。
+        renders (int): 描画した回数。
+        writes (int): キーに書き込んだ回数。
+        ticks (int): update() を呼び出した回数。
+        skipped (int): 遅れすぎて追いかけなかった tick 数。
+        lateness (deque): 直近の tick の予定時刻からの遅れ（秒）。
+        latencies (deque): 直近のキー入力の遅延（KeyLatency）。
+    """
+
+    def __init__(self, deck, render, step: float = 0.1, cache=None, atlas=None, clock=time.monotonic,
+                 max_images: int = 256, max_catchup: int = 10, history: int = 1000):
+        self.deck = deck
+        self.render = render
+        self.step = step
+        self.cache = cache
+        self.atlas = atlas
+        self.clock = clock
+        self.max_images = max_images
+        self.max_catchup = max_catchup
+        self.width, self.height = deck.key_image_format()["size"]
+        self.events = queue.Queue()
+        self.timers = TimerWheel(step)
+        self.now = clock()
+        self.renders = 0
+        self.writes = 0
+        self.ticks = 0
+        self.skipped = 0
+        self.lateness = deque(maxlen=history)
+        self.latencies = deque(maxlen=history)
+        self._shown = {}              # key -> 表示中の spec
+        self.written_at = {}          # key -> 直前の draw() で書き込みが終わった時刻
+        self._images = OrderedDict()  # spec -> ネイティブ形式の画像（LRU）
+
+    def post(self, key: int) -> None:
+        """ キー入力をキューに積みます（どのスレッドからでも呼び出せます）。 """
+        self.events.put((key, time.perf_counter()))
+
+    def _key_callback(self, deck, key, state_pressed) -> None:
+        if state_pressed:
+            self.events.put((key, time.perf_counter()))
+
+    def image(self, spec):
+        """ spec のネイティブ形式の画像を返します（アトラスにもキャッシュにもなければ描画します）。 """
+        if self.atlas is not None:
+            image = self.atlas.get(spec)
+            if image is not None:
+                return image
+        image = self._images.get(spec)
+        if image is not None:
+            self._images.move_to_end(spec)
+            return image
+
+        def render():
+            self.renders += 1
+            return PILHelper.to_native_format(self.deck, self.render(spec, self.width, self.height))
+
+        if self.cache is not None:
+            image = self.cache.get_or_render((spec, self.width, self.height), render)
+        else:
+            image = render()
+        self._images[spec] = image
+        if len(self._images) > self.max_images:
+            self._images.popitem(last=False)
+        return image
+
+    def draw(self, frame: dict, priority=()) -> int:
+        """
+        前回から spec が変わったキーだけを書き込み、書き込んだキー数を返します。
+        priority のキーは他のキーより先に書き込みます（押されたキーの結果を先に表示するため）。
+        """
+        written = 0
+        self.written_at = {}
+        keys = [key for key in priority if key in frame]
+        keys.extend(key for key in frame if key not in priority)
+        for key in keys:
+            spec = frame[key]
+            if self._shown.get(key) == spec:
+                continue
+            self.deck.set_key_image(key, self.image(spec))
+            self.written_at[key] = time.perf_counter()  # デバイスへの書き込みが終わった時刻
+            self._shown[key] = spec
+            written += 1
+        self.writes += written
+        return written
+
+    def latency_summary(self, percentiles=(50, 90, 99)) -> str:
+        """ キー入力の遅延のパーセンタイル（ミリ秒）を 1 行の文字列で返します。 """
+        if not self.latencies:
+            return "key latency: no samples"
+        parts = []
+        for field in KeyLatency._fields:
+            values = [getattr(sample, field) for sample in self.latencies]
+            parts.append(field + " " + "/".join(f"{percentile(values, p) * 1000:.1f}" for p in percentiles))
+        names = "/".join(f"p{p}" for p in percentiles)
+        return f"key latency {names} ms ({len(self.latencies)} presses): " + ", ".join(parts)
+
+    def invalidate(self) -> None:
+        """ 表示中の内容を忘れ、次の draw() ですべてのキーを書き直します（deck.reset() の後など）。 """
+        self._shown = {}
+
+    def jitter(self):
+        """ 直近の tick の予定時刻からの遅れの (平均, 最大)（秒）を返します（記録がなければ (0.0, 0.0)）。 """
+        if not self.lateness:
+            return 0.0, 0.0
+        return sum(self.lateness) / len(self.lateness), max(self.lateness)
+
+    def advance(self, update=None) -> bool:
+        """
+        now の時点の tick を 1 回処理します（期限の来た予約を呼び出してから update(now)）。
+        まだ tick が必要（update が True を返したか予約が残っている）なら True を返します。
+        """
+        self.timers.advance(self.now)
+        active = bool(update(self.now)) if update is not None else False
+        self.ticks += 1
+        return active or len(self.timers) > 0
+
+    def run(self, frame, on_key=None, update=None) -> None:
+        """
+        Ctrl+C まで入力処理・シミュレーション・描画を繰り返します。
+
+        Args:
+            frame (callable): frame() -> {キー番号: spec}
+            on_key (callable): on_key(key)（省略可）
+            update (callable): update(now) -> bool（省略時は入力と予約の処理があったときだけ描画します）
+        """
+        self.deck.set_key_callback(self._key_callback)
+        self.now = self.clock()
+        ticking = update is not None or len(self.timers) > 0
+        next_step = self.now + self.step
+        self.draw(frame())
+        while True:
+            timeout = max(0.0, next_step - self.clock()) if ticking else None
+            try:
+                key, pressed_at = self.events.get(timeout=timeout)
+            except queue.Empty:
+                key = pressed_at = None
+            if key is not None:
+                started = time.perf_counter()
+                self.now = self.clock()
+                if on_key is not None:
+                    on_key(key)
+                handled = time.perf_counter()
+                if not ticking and (update is not None or len(self.timers) > 0):
+                    # 入力でアニメーションやタイマーが始まったかもしれないので tick を再開する
+                    ticking = True
+                    next_step = self.now + self.step
+            if ticking:
+                current = self.clock()
+                steps = 0
+                while ticking and next_step <= current:
+                    self.now = next_step
+                    self.lateness.append(current - next_step)
+                    ticking = self.advance(update)
+                    next_step += self.step
+                    steps += 1
+                    if steps >= self.max_catchup:
+                        if next_step <= current:
+                            # 遅れすぎた分は追いかけない
+                            self.skipped += int((current - next_step) / self.step) + 1
+                            next_step = current + self.step
+                        break
+            if key is None:
+                self.draw(frame())
+                continue
+            self.draw(frame(), priority=(key,))
+            if self.written_at:
+                # 押されたキーが書き換わればその書き込み、そうでなければ最後の書き込みまで
+                done = self.written_at.get(key, max(self.written_at.values()))
+                self.latencies.append(KeyLatency(done - pressed_at, started - pressed_at,
+                                                 handled - started, done - handled))
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+ゲームのヘッドレス実行ハーネス
+
+gallery/game の各タイトルを Stream Deck なしで実行します。タイトルのコードは変更せず、
+モジュールの DeviceManager・GameEngine などを差し替えて main() をそのまま呼び出します。
+
+- 乱数: 実行前に random.seed(seed) で固定します（タイトルは random モジュールの関数を使います）。
+- 時刻: 仮想時計を GameEngine の clock に渡し、tick と台本のキー入力の時刻まで待たずに進めます。
+- 入力: 台本（[(時刻, キー番号), ...]、時刻は開始からの秒数）のキー入力を順に渡します。
+- 記録: 変化したキーの spec を時刻とともに記録し、ダイジェスト（SHA-256）で比較できるようにします。
+- 計測: update()（予約の呼び出しを含む）・on_key()・frame() にかかった時間を計り、
+  1 tick あたりのゲームロジックのコストを表示します。
+
+描画は既定で行いません（--render で描画・エンコードも含めて計測します。Pango / Cairo が必要です）。
+
+実機で遊んだ操作を記録し、あとから同じ乱数・同じ時刻で再現することもできます（バグ報告の再現用）。
+
+例:
+    python gallery/game/harness.py record title_05 bug.json       # 実機で遊んで Ctrl+C で保存
+    python gallery/game/harness.py run --script bug.json --frames frames.jsonl
+    python gallery/game/harness.py run title_04 --seed 1 --keys 0.5:31,2:24,2.5:25,3:26
+"""
+
+import argparse
+import hashlib
+import importlib.util
+import itertools
+import json
+import os
+import random
+import time
+from collections import namedtuple
+
+from engine import GameEngine
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+MAX_SECONDS = 600.0  # 終了時刻を指定しない場合に進める仮想時刻の上限（終わらないゲーム用）
+
+HarnessReport = namedtuple("HarnessReport", ["ticks", "keys", "frames", "writes", "renders", "virtual_time",
+                                             "update_time", "key_time", "frame_time", "elapsed", "digest"])
+
+_module_ids = itertools.count()
+
+
+def title_path(title: str) -> str:
+    """ "title_05" などのタイトル名（またはファイルのパス）をファイルのパスに変換します。 """
+    if title.endswith(".py"):
+        return title
+    return os.path.join(HERE, title + ".py")
+
+
+def load_title(title: str):
+    """ タイトルのモジュールを読み込みます（実行のたびに別のモジュールとして読み込みます）。 """
+    path = title_path(title)
+    name = f"{os.path.splitext(os.path.basename(path))[0]}_harness{next(_module_ids)}"
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def parse_keys(text: str) -> list:
+    """ "0.5:31,2:24" を [(0.5, 31), (2.0, 24)] に変換します。 """
+    events = []
+    for item in filter(None, text.split(",")):
+        at, key = item.split(":")
+        events.append((float(at), int(key)))
+    return events
+
+
+class VirtualClock:
+    """ 呼び出すと現在の仮想時刻（秒）を返す時計。 """
+
+    def __init__(self, start: float = 0.0):
+        self.time = start
+
+    def __call__(self) -> float:
+        return self.time
+
+
+class HeadlessDeck:
+    """
+    何も表示しないデッキ（Stream Deck XL と同じキー配置・画像形式）。
+
+    Attributes:
+        writes (int): set_key_image() が呼ばれた回数。
+    """
+
+    def __init__(self, rows: int = 4, columns: int = 8, size=(96, 96)):
+        self.rows = rows
+        self.columns = columns
+        self.size = size
+        self.writes = 0
+
+    def deck_type(self) -> str:
+        return "Headless Stream Deck"
+
+    def key_layout(self) -> tuple:
+        return self.rows, self.columns
+
+    def key_count(self) -> int:
+        return self.rows * self.columns
+
+    def key_image_format(self) -> dict:
+        return {"size": self.size, "format": "JPEG", "flip": (True, True), "rotation": 0}
+
+    def set_key_image(self, key: int, image) -> None:
+        self.writes += 1
+
+    def set_key_callback(self, callback) -> None:
+        pass
+
+    def open(self) -> None:
+        pass
+
+    def reset(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class _NoRenderCache:
+    """ ヘッドレス実行ではディスクキャッシュを使わない（DiskRenderCache の差し替え）。 """
+
+    @staticmethod
+    def from_env(deck, version):
+        return None
+
+
+class _NoAtlas:
+    """ ヘッドレス実行ではスプライトを描画しない（SpriteAtlas の差し替え）。 """
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def build(self, specs, workers: int = None):
+        return None
+
+
+class Harness:
+    """
+    タイトルを仮想時刻で実行します。
+
+    Args:
+        title (str): タイトル名（"title_05" など）またはファイルのパス。
+        seed (int): 乱数の種。
+        events (list): 台本のキー入力 [(開始からの秒数, キー番号), ...]。
+        duration (float): 終了する仮想時刻（開始からの秒数）。省略時は最後の入力の後、ゲームが止まる（tick が
+            不要になる）まで進めます（最大 MAX_SECONDS 秒）。
+        render (bool): spec を実際に描画・エンコードするか。
+        decks (int): 用意するデッキの台数。
+    """
+
+    def __init__(self, title: str, seed: int = 0, events=(), duration: float = None, render: bool = False,
+                 decks: int = 1):
+        self.title = title
+        self.seed = seed
+        self.events = sorted(events, key=lambda event: event[0])
+        self.duration = duration
+        self.render = render
+        self.decks = [HeadlessDeck() for _ in range(decks)]
+        self.clock = VirtualClock()
+        self.frames = []  # [(開始からの秒数, {キー番号: spec}), ...]（変化したキーだけ）
+        self.update_time = 0.0
+        self.key_time = 0.0
+        self.frame_time = 0.0
+        self.keys = 0
+        self.engine = None
+
+    def _engine_class(self):
+        harness = self
+
+        class HeadlessEngine(GameEngine):
+            def __init__(self, deck, render, **kwargs):
+                kwargs["clock"] = harness.clock
+                if not harness.render:
+                    kwargs["cache"] = kwargs["atlas"] = None
+                super().__init__(deck, render, **kwargs)
+                harness.engine = self
+
+            def image(self, spec):
+                return super().image(spec) if harness.render else spec
+
+            def draw(self, frame: dict, priority=()) -> int:
+                changed = {key: spec for key, spec in frame.items() if self._shown.get(key) != spec}
+                if changed:
+                    harness.frames.append((self.now, changed))
+                return super().draw(frame, priority)
+
+            def run(self, frame, on_key=None, update=None) -> None:
+                harness.run_engine(self, frame, on_key, update)
+                raise KeyboardInterrupt  # タイトルの main() の終了処理を通って戻る
+
+        return HeadlessEngine
+
+    def run_engine(self, engine, frame, on_key, update) -> None:
+        """ GameEngine.run() と同じ順序で、台本の入力と tick を仮想時刻の順に処理します。 """
+        clock = self.clock
+        end = self.duration
+        if end is None:
+            end = MAX_SECONDS if not self.events else self.events[-1][0] + MAX_SECONDS
+
+        def timed(function, *args):
+            start = time.perf_counter()
+            result = function(*args)
+            return result, time.perf_counter() - start
+
+        engine.now = clock()
+        ticking = update is not None or len(engine.timers) > 0
+        next_step = engine.now + engine.step
+        specs, spent = timed(frame)
+        self.frame_time += spent
+        engine.draw(specs)
+        events = iter(self.events)
+        pending = next(events, None)
+        while True:
+            if ticking and (pending is None or next_step <= pending[0]):
+                if next_step > end:
+                    break
+                clock.time = engine.now = next_step
+                ticking, spent = timed(engine.advance, update)
+                self.update_time += spent
+                next_step += engine.step
+            elif pending is not None:
+                if pending[0] > end:
+                    break
+                clock.time = engine.now = pending[0]
+                if on_key is not None:
+                    _, spent = timed(on_key, pending[1])
+                    self.key_time += spent
+                self.keys += 1
+                pending = next(events, None)
+                if not ticking and (update is not None or len(engine.timers) > 0):
+                    ticking = True
+                    next_step = engine.now + engine.step
+            else:
+                break  # 台本の入力が尽き、ゲームも止まった
+            specs, spent = timed(frame)
+            self.frame_time += spent
+            engine.draw(specs)
+
+    def run(self) -> HarnessReport:
+        """ タイトルの main() を実行し、結果を返します。 """
+        module = load_title(self.title)
+        decks = self.decks
+
+        class HeadlessDeviceManager:
+            def enumerate(self):
+                return list(decks)
+
+        module.DeviceManager = HeadlessDeviceManager
+        module.GameEngine = self._engine_class()
+        if not self.render:
+            if hasattr(module, "SpriteAtlas"):
+                module.SpriteAtlas = _NoAtlas
+            if hasattr(module, "DiskRenderCache"):
+                module.DiskRenderCache = _NoRenderCache
+        random.seed(self.seed)
+        start = time.perf_counter()
+        module.main()
+        elapsed = time.perf_counter() - start
+        engine = self.engine
+        return HarnessReport(
+            ticks=engine.ticks if engine else 0,
+            keys=self.keys,
+            frames=len(self.frames),
+            writes=sum(deck.writes for deck in decks),
+            renders=engine.renders if engine else 0,
+            virtual_time=self.clock.time,
+            update_time=self.update_time,
+            key_time=self.key_time,
+            frame_time=self.frame_time,
+            elapsed=elapsed,
+            digest=self.digest(),
+        )
+
+    def frame_lines(self):
+        """ 記録したフレームを JSON の行（1 行 1 フレーム）で返します。 """
+        for at, changed in self.frames:
+            yield json.dumps({"t": round(at, 6), "keys": {str(key): spec for key, spec in changed.items()}},
+                             ensure_ascii=False, default=repr)
+
+    def digest(self) -> str:
+        """ 記録したフレーム列の SHA-256（同じ入力で同じ表示になったかの比較用）。 """
+        sha = hashlib.sha256()
+        for line in self.frame_lines():
+            sha.update(line.encode("utf-8") + b"\n")
+        return sha.hexdigest()
+
+
+def record(title: str, path: str, seed: int = None) -> None:
+    """
+    実機でタイトルを遊び、乱数の種とキー入力（エンジンが処理した時刻）をファイルに保存します（Ctrl+C で終了）。
+    """
+    seed = random.randrange(2 ** 32) if seed is None else seed
+    module = load_title(title)
+    session = {"title": title, "seed": seed, "events": [], "duration": None}
+    started = []
+
+    class RecordingEngine(GameEngine):
+        def run(self, frame, on_key=None, update=None) -> None:
+            def first_frame():
+                if not started:
+                    started.append(self.now)  # run() の開始時刻（仮想時計の 0 秒に対応）
+                return frame()
+
+            def recorded(key):
+                session["events"].append([round(self.now - started[0], 6), key])
+                if on_key is not None:
+                    on_key(key)
+
+            try:
+                super().run(first_frame, on_key=recorded, update=update)
+            finally:
+                session["duration"] = round(self.clock() - started[0], 6) if started else 0.0
+
+    module.GameEngine = RecordingEngine
+    random.seed(seed)
+    module.main()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(session, f)
+    print(f"recorded {len(session['events'])} key events (seed {seed}) to {path}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="ヘッドレスで実行する")
+    run_parser.add_argument("title", nargs="?", help="タイトル名（title_05 など）")
+    run_parser.add_argument("--script", help="record で保存したファイル（タイトル・種・入力を読み込みます）")
+    run_parser.add_argument("--seed", type=int, default=0, help="乱数の種")
+    run_parser.add_argument("--keys", default="", help="キー入力（秒:キー番号 をカンマ区切り）")
+    run_parser.add_argument("--duration", type=float, help="終了する仮想時刻（秒）")
+    run_parser.add_argument("--render", action="store_true", help="spec を実際に描画する")
+    run_parser.add_argument("--decks", type=int, default=1, help="デッキの台数")
+    run_parser.add_argument("--frames", help="フレームを書き出すファイル（JSON Lines）")
+
+    record_parser = commands.add_parser("record", help="実機で遊んだ操作を記録する")
+    record_parser.add_argument("title", help="タイトル名（title_05 など）")
+    record_parser.add_argument("path", help="保存先")
+    record_parser.add_argument("--seed", type=int, help="乱数の種（省略時はランダム）")
+
+    args = parser.parse_args()
+    if args.command == "record":
+        record(args.title, args.path, args.seed)
+        return
+
+    title, seed, events, duration = args.title, args.seed, parse_keys(args.keys), args.duration
+    if args.script:
+        with open(args.script, encoding="utf-8") as f:
+            session = json.load(f)
+        title = title or session["title"]
+        seed = session["seed"]
+        events = [tuple(event) for event in session["events"]]
+        duration = duration if duration is not None else session.get("duration")
+    if not title:
+        parser.error("title or --script is required")
+
+    harness = Harness(title, seed=seed, events=events, duration=duration, render=args.render, decks=args.decks)
+    report = harness.run()
+    if args.frames:
+        with open(args.frames, "w", encoding="utf-8") as f:
+            for line in harness.frame_lines():
+                f.write(line + "\n")
+    per_tick = report.update_time / report.ticks * 1e6 if report.ticks else 0.0
+    per_frame = report.frame_time / (report.ticks + report.keys + 1) * 1e6
+    print(f"{title}: {report.virtual_time:.2f} s virtual in {report.elapsed:.3f} s "
+          f"({report.ticks} ticks, {report.keys} keys, {report.frames} frames, {report.writes} writes, "
+          f"{report.renders} renders)")
+    print(f"  update {per_tick:.1f} us/tick, frame {per_frame:.1f} us/call, on_key {report.key_time * 1e3:.3f} ms total")
+    print(f"  frames digest {report.digest}")
+
+
+if __name__ == "__main__":
+    main()
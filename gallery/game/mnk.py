@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+m,n,k ゲーム（三目並べとその一般化）のビットボード探索
+
+盤面は手番の石と相手の石をそれぞれ整数 1 つで表し（r 行 c 列がビット r × 列数 + c）、
+勝ちの判定は「そのマスを通る k 連のマスク」との AND で行います。
+
+- solve(game): 初期局面から到達できるすべての局面を、メモ化した negamax で読み切った表を作ります。
+  3×3 の三目並べなら 5478 局面で、起動時に一度作れば以降の着手は表引き 1 回です。
+- Solver: 読み切れない大きな盤面（4×4 の四目、8×4 の五目など）向けに、
+  置換表つきの alpha-beta を反復深化で深くしていき、持ち時間が来たら最後に読み終えた深さの最善手を返します。
+- 描画やデッキには依存しないので、ヘッドレスで対戦・検証できます。
+
+    game = Game(3, 3, 3)
+    table = solve(game)
+    score, moves = table[(mine, theirs)]   # 手番から見た評価と最善手（マス番号）の一覧
+"""
+
+import time
+
+WIN = 1 << 20  # 勝ちの評価値の基準（実際の値は WIN + 勝った時点の空きマス数。早い勝ちほど大きい）
+
+
+class Game:
+    """
+    m,n,k ゲームの盤面の形と勝ち筋。
+
+    Args:
+        columns (int): 列数。
+        rows (int): 行数。
+        k (int): 勝ちに必要な連の長さ。
+
+    Attributes:
+        cells (int): マスの数。
+        full (int): すべてのマスのビット。
+        lines (list): 勝ち筋（k 連）のマスクの一覧。
+        order (tuple): 着手を試す順（中央に近いマスから）。
+    """
+
+    def __init__(self, columns: int = 3, rows: int = 3, k: int = 3):
+        if k > max(columns, rows):
+            raise ValueError(f"k={k} does not fit on a {columns}x{rows} board")
+        self.columns = columns
+        self.rows = rows
+        self.k = k
+        self.cells = columns * rows
+        self.full = (1 << self.cells) - 1
+        self.lines = []
+        for row in range(rows):
+            for col in range(columns):
+                for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                    end_row, end_col = row + dr * (k - 1), col + dc * (k - 1)
+                    if 0 <= end_row < rows and 0 <= end_col < columns:
+                        mask = 0
+                        for i in range(k):
+                            mask |= 1 << ((row + dr * i) * columns + col + dc * i)
+                        self.lines.append(mask)
+        # マスごとに、そのマスを通る勝ち筋だけを調べれば足りる
+        self.lines_through = [tuple(line for line in self.lines if line >> cell & 1) for cell in range(self.cells)]
+        center_row, center_col = (rows - 1) / 2, (columns - 1) / 2
+        self.order = tuple(sorted(range(self.cells), key=lambda cell: abs(cell // columns - center_row)
+                                  + abs(cell % columns - center_col)))
+
+    def wins(self, bits: int, cell: int) -> bool:
+        """ cell に置いた直後の石 bits が、cell を通る勝ち筋のどれかを揃えているか。 """
+        for line in self.lines_through[cell]:
+            if bits & line == line:
+                return True
+        return False
+
+    def winner(self, mine: int, theirs: int):
+        """ 揃っている側（"mine" / "theirs"）を返します。どちらも揃っていなければ None。 """
+        for line in self.lines:
+            if mine & line == line:
+                return "mine"
+            if theirs & line == line:
+                return "theirs"
+        return None
+
+    def moves(self, mine: int, theirs: int) -> list:
+        """ 空きマスを中央に近い順に返します。 """
+        taken = mine | theirs
+        return [cell for cell in self.order if not taken >> cell & 1]
+
+
+def solve(game: Game) -> dict:
+    """
+    初期局面から到達できるすべての局面を読み切り、{(手番の石, 相手の石): (評価, 最善手のタプル)} を返します。
+    評価は手番から見た値で、勝ちは WIN + 勝った時点の空きマス数、負けはその符号反転、引き分けは 0 です。
+    決着済みの局面の最善手は空のタプルです。
+    """
+    table = {}
+
+    def negamax(mine: int, theirs: int, last: int) -> int:
+        key = (mine, theirs)
+        entry = table.get(key)
+        if entry is not None:
+            return entry[0]
+        empty = game.cells - (mine | theirs).bit_count()
+        if last >= 0 and game.wins(theirs, last):
+            table[key] = (-(WIN + empty), ())
+            return -(WIN + empty)
+        if empty == 0:
+            table[key] = (0, ())
+            return 0
+        best, best_moves = None, []
+        for cell in game.moves(mine, theirs):
+            score = -negamax(theirs, mine | 1 << cell, cell)
+            if best is None or score > best:
+                best, best_moves = score, [cell]
+            elif score == best:
+                best_moves.append(cell)
+        table[key] = (best, tuple(best_moves))
+        return best
+
+    negamax(0, 0, -1)
+    return table
+
+
+class _Timeout(Exception):
+    pass
+
+
+class Solver:
+    """
+    置換表つき alpha-beta と反復深化による探索（読み切れない盤面用）。
+
+    Args:
+        game (Game): 盤面の形。
+        clock (callable): 現在時刻（秒）を返す関数。持ち時間の判定に使います。
+        max_entries (int): 置換表の最大件数（超えたら空にします）。
+
+    Attributes:
+        nodes (int): 直前の best_move() で調べた局面数。
+        depth (int): 直前の best_move() で読み終えた深さ。
+    """
+
+    EXACT, LOWER, UPPER = 0, 1, 2
+
+    def __init__(self, game: Game, clock=time.monotonic, max_entries: int = 1 << 20):
+        self.game = game
+        self.clock = clock
+        self.max_entries = max_entries
+        self.table = {}  # (手番の石, 相手の石) -> (深さ, 種類, 評価, 最善手)
+        self.nodes = 0
+        self.depth = 0
+        self._deadline = None
+        # 石が c 個入っていて相手の石がない勝ち筋の重み
+        self._weights = [0] + [4 ** count for count in range(1, game.k + 1)]
+
+    def evaluate(self, mine: int, theirs: int) -> int:
+        """ 読みの末端の評価（手番から見て、自分だけが石を置いている勝ち筋ほど高い）。 """
+        score = 0
+        weights = self._weights
+        for line in self.game.lines:
+            m = mine & line
+            t = theirs & line
+            if m and not t:
+                score += weights[m.bit_count()]
+            elif t and not m:
+                score -= weights[t.bit_count()]
+        return score
+
+    def best_move(self, mine: int, theirs: int, budget: float = 1.0):
+        """
+        手番（mine）の最善手のマス番号を返します（空きマスがなければ None）。
+        深さ 1 から読み直しながら深くし、budget 秒を過ぎたら最後に読み終えた深さの最善手を返します。
+        """
+        moves = self.game.moves(mine, theirs)
+        if not moves:
+            return None
+        if len(self.table) > self.max_entries:
+            self.table.clear()
+        self.nodes = 0
+        self.depth = 0
+        self._deadline = self.clock() + budget
+        best = moves[0]
+        for depth in range(1, len(moves) + 1):
+            try:
+                score = self._search(mine, theirs, depth, -WIN * 2, WIN * 2)
+            except _Timeout:
+                break
+            best = self.table[(mine, theirs)][3]
+            self.depth = depth
+            if abs(score) >= WIN:
+                break  # 勝ち負けが読み切れた
+        return best
+
+    def _search(self, mine: int, theirs: int, depth: int, alpha: int, beta: int) -> int:
+        self.nodes += 1
+        if self.nodes & 1023 == 0 and self.clock() > self._deadline:
+            raise _Timeout()
+        game = self.game
+        moves = game.moves(mine, theirs)
+        if not moves:
+            return 0
+        if depth == 0:
+            return self.evaluate(mine, theirs)
+        key = (mine, theirs)
+        entry = self.table.get(key)
+        first = None
+        if entry is not None:
+            entry_depth, kind, score, first = entry
+            if entry_depth >= depth:
+                if kind == self.EXACT:
+                    return score
+                if kind == self.LOWER and score >= beta:
+                    return score
+                if kind == self.UPPER and score <= alpha:
+                    return score
+            # 前回の最善手から試す
+            moves.remove(first)
+            moves.insert(0, first)
+        original_alpha = alpha
+        best, best_move = None, moves[0]
+        empty_after = len(moves) - 1
+        for cell in moves:
+            bits = mine | 1 << cell
+            if game.wins(bits, cell):
+                score = WIN + empty_after
+            else:
+                score = -self._search(theirs, bits, depth - 1, -beta, -alpha)
+            if best is None or score > best:
+                best, best_move = score, cell
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                break
+        if best <= original_alpha:
+            kind = self.UPPER
+        elif best >= beta:
+            kind = self.LOWER
+        else:
+            kind = self.EXACT
+        self.table[key] = (depth, kind, best, best_move)
+        return best
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+ゲーム用のスプライトアトラス（描画済みキー画像の表）
+
+ゲームが使う表示内容（spec: 絵文字・文字サイズ・背景色の組など）を起動時にまとめて描画し、
+ネイティブ形式（PILHelper.to_native_format の結果）のバイト列として保持します。
+GameEngine に渡すと、アトラスにある spec は描画せずにそのまま書き込むため、
+ゲーム中のフレームで Pango / Cairo を呼び出すことはありません。
+
+- 描画はスレッドプールで並列に行います（Pango / Cairo / Pillow の処理中は GIL が解放されます）。
+- ネイティブ形式はデッキの機種ごとに異なるため、アトラスはデッキごとに作成します。
+  DiskRenderCache を渡すと機種ごとにディスクへ保存し、次回起動時は描画せずに読み込みます。
+
+    atlas = SpriteAtlas(deck, render_spec, cache=render_cache).build(SPRITES)
+    engine = GameEngine(deck, render_spec, atlas=atlas)
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from StreamDeck.ImageHelpers import PILHelper
+
+
+class SpriteAtlas:
+    """
+    Args:
+        deck: Stream Deck オブジェクト（open 済み）。
+        render (callable): render(spec, width, height) -> PIL.Image
+        cache: deckkit.render_cache.DiskRenderCache（省略可）。
+
+    Attributes:
+        rendered (int): build() で描画した数。
+        loaded (int): build() でディスクキャッシュから読み込んだ数。
+    """
+
+    def __init__(self, deck, render, cache=None):
+        self.deck = deck
+        self.render = render
+        self.cache = cache
+        self.width, self.height = deck.key_image_format()["size"]
+        self.rendered = 0
+        self.loaded = 0
+        self._images = {}  # spec -> ネイティブ形式の画像
+
+    def _render_native(self, spec):
+        return PILHelper.to_native_format(self.deck, self.render(spec, self.width, self.height))
+
+    def build(self, specs, workers: int = None):
+        """
+        specs のうちまだアトラスにないものを並列に描画して追加し、自分自身を返します。
+
+        Args:
+            specs (iterable): 描画する spec（ハッシュ可能な値）。
+            workers (int): 描画スレッド数（省略時は CPU 数）。
+        """
+        missing = []
+        for spec in dict.fromkeys(specs):
+            if spec in self._images:
+                continue
+            data = self.cache.get((spec, self.width, self.height)) if self.cache is not None else None
+            if data is not None:
+                self._images[spec] = data
+                self.loaded += 1
+            else:
+                missing.append(spec)
+        if not missing:
+            return self
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+            for spec, data in zip(missing, pool.map(self._render_native, missing)):
+                self._images[spec] = data
+                if self.cache is not None:
+                    self.cache.put((spec, self.width, self.height), data)
+        self.rendered += len(missing)
+        return self
+
+    def get(self, spec):
+        """ spec のネイティブ形式の画像を返します（アトラスになければ None）。 """
+        return self._images.get(spec)
+
+    def __contains__(self, spec) -> bool:
+        return spec in self._images
+
+    def __len__(self) -> int:
+        return len(self._images)
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+落ちものパズルのビットボードエンジン
+
+盤面全体を整数 1 つで表し（r 行 c 列がビット r × 列数 + c、つまり各行が列数ビットずつ並んだもの）、
+衝突判定・固定・ライン消去をビット演算で行います。
+7 種類のテトロミノ（I, O, T, S, Z, J, L）の 4 方向の形は起動時に横位置ごとのビットマスクとして表にしておくため、
+移動・回転の判定は表引き・シフト・AND が 1 回ずつだけです。
+
+- 盤面の大きさは自由です。title_11 では盤面の右に操作キーを 2 列置くので、Stream Deck XL 1 台なら最大 6×4、
+  8×4 などそれより広い盤面は DeckSpan で複数台に広げて遊びます。
+- 描画やデッキには依存しないので、ヘッドレスでシミュレーションできます（bench_tetromino.py）。
+
+    board = Board(width=4, height=4)
+    board.move(-1)    # 左へ
+    board.rotate()    # 時計回り
+    board.tick()      # 1 段落とす（落とせなければ固定して次のブロック）
+"""
+
+import random
+
+# 回転の基準となる枠の中での形（# がブロック）。I は 4×4、O は 2×2、それ以外は 3×3 の枠で回転します。
+PIECES = {
+    "I": ["....", "####", "....", "...."],
+    "O": ["##", "##"],
+    "T": [".#.", "###", "..."],
+    "S": [".##", "##.", "..."],
+    "Z": ["##.", ".##", "..."],
+    "J": ["#..", "###", "..."],
+    "L": ["..#", "###", "..."],
+}
+PIECE_NAMES = tuple(PIECES)
+
+# 回転した形が壁やブロックにぶつかるときに試す横方向のずらし（壁蹴り）
+KICKS = (0, -1, 1, -2, 2)
+
+LINE_SCORE = 10  # 1 ライン消去あたりの得点
+
+
+def _rotations(pattern: list) -> list:
+    """ 形の 4 方向（時計回り）を、枠内のブロックの (行, 列) の集合のリストで返します。 """
+    n = len(pattern)
+    cells = {(r, c) for r, line in enumerate(pattern) for c, ch in enumerate(line) if ch == "#"}
+    rotations = []
+    for _ in range(4):
+        rotations.append(cells)
+        cells = {(c, n - 1 - r) for r, c in cells}
+    return rotations
+
+
+def _placements(cells: set, width: int) -> dict:
+    """
+    1 方向の形について {枠の横位置: (枠の上端からブロックの最上段までの行数, ブロックの行数, マスク)} を返します。
+    マスクはブロックの最上段を盤面の 0 行目に置いたときのビットです。盤面からはみ出す横位置は表に含めません。
+    """
+    top = min(r for r, _ in cells)
+    left = min(c for _, c in cells)
+    right = max(c for _, c in cells)
+    height = max(r for r, _ in cells) - top + 1
+    table = {}
+    for x in range(-left, width - right):
+        mask = 0
+        for r, c in cells:
+            mask |= 1 << ((r - top) * width + c + x)
+        table[x] = (top, height, mask)
+    return table
+
+
+class Board:
+    """
+    落ちものパズルの盤面と操作中のブロック。
+
+    Args:
+        width (int): 盤面の列数（4 以上）。
+        height (int): 盤面の行数。
+        seed: 乱数の種（省略時はランダム）。
+
+    Attributes:
+        bits (int): 固定ブロックの占有ビット（0 行目が最上段、r 行 c 列がビット r × width + c）。
+        piece (str): 操作中のブロックの種類。
+        rotation (int): 操作中のブロックの向き（0〜3）。
+        x, y (int): 操作中のブロックの回転枠の左上の位置（列, 行）。
+        score (int): 得点。
+        lines (int): 消去したライン数。
+        over (bool): ゲームオーバーかどうか。
+    """
+
+    def __init__(self, width: int = 4, height: int = 4, seed=None):
+        if width < 4 or height < 2:
+            raise ValueError(f"board must be at least 4x2 (got {width}x{height})")
+        self.width = width
+        self.height = height
+        self.full = (1 << width) - 1
+        self.random = random.Random(seed)
+        # 種類 -> 向き -> {横位置: (上端の行数, 行数, マスク)}
+        self._table = {name: [_placements(cells, width) for cells in _rotations(pattern)]
+                       for name, pattern in PIECES.items()}
+        self._frame = {name: len(pattern) for name, pattern in PIECES.items()}
+        self.reset()
+
+    def reset(self) -> None:
+        """ 盤面を空にして最初のブロックを出します。 """
+        self.bits = 0
+        self.layers = dict.fromkeys(PIECE_NAMES, 0)  # 種類ごとの固定ブロックの占有ビット（表示用）
+        self.score = 0
+        self.lines = 0
+        self.over = False
+        self._bag = []
+        self.spawn()
+
+    def _next_piece(self) -> str:
+        # 7 種類を 1 回ずつシャッフルした袋から順に取り出す（同じ種類が続きすぎない）
+        if not self._bag:
+            self._bag = list(PIECE_NAMES)
+            self.random.shuffle(self._bag)
+        return self._bag.pop()
+
+    def spawn(self, piece: str = None) -> bool:
+        """ 新しいブロックを最上段の中央に出します。置けなければゲームオーバーにして False を返します。 """
+        self.piece = piece or self._next_piece()
+        self.rotation = 0
+        self.x = (self.width - self._frame[self.piece]) // 2
+        self.y = -self._table[self.piece][0][self.x][0]
+        if not self.fits(self.piece, 0, self.x, self.y):
+            self.over = True
+        return not self.over
+
+    def fits(self, piece: str, rotation: int, x: int, y: int) -> bool:
+        """ ブロックをその向き・位置に置けるか（盤面内で固定ブロックと重ならないか）を返します。 """
+        placement = self._table[piece][rotation].get(x)
+        if placement is None:
+            return False
+        top, height, mask = placement
+        y += top
+        if y + height > self.height:
+            return False
+        if y >= 0:
+            return not self.bits & (mask << (y * self.width))
+        return not self.bits & (mask >> (-y * self.width))  # 盤面の上にはみ出した部分は判定しない
+
+    def move(self, dx: int) -> bool:
+        """ 操作中のブロックを横に dx 列動かします。動かせたら True を返します。 """
+        if self.over or not self.fits(self.piece, self.rotation, self.x + dx, self.y):
+            return False
+        self.x += dx
+        return True
+
+    def rotate(self, direction: int = 1) -> bool:
+        """ 操作中のブロックを回転します（1: 時計回り、-1: 反時計回り）。ぶつかる場合は横にずらして試します。 """
+        if self.over:
+            return False
+        rotation = (self.rotation + direction) % 4
+        for kick in KICKS:
+            if self.fits(self.piece, rotation, self.x + kick, self.y):
+                self.rotation = rotation
+                self.x += kick
+                return True
+        return False
+
+    def drop(self) -> bool:
+        """ 操作中のブロックを 1 段落とします。落とせたら True を返します。 """
+        if self.over or not self.fits(self.piece, self.rotation, self.x, self.y + 1):
+            return False
+        self.y += 1
+        return True
+
+    def tick(self) -> bool:
+        """ 1 段落とし、落とせなければ固定して次のブロックを出します。ゲームが続いていれば True を返します。 """
+        if not self.drop() and not self.over:
+            self.lock()
+        return not self.over
+
+    def lock(self) -> int:
+        """ 操作中のブロックを固定し、揃ったラインを消して次のブロックを出します。消したライン数を返します。 """
+        mask = self._piece_bits()
+        if self.y + self._table[self.piece][self.rotation][self.x][0] < 0:
+            self.over = True  # 盤面の上にはみ出して固定された
+        self.bits |= mask
+        self.layers[self.piece] |= mask
+        cleared = self.clear_lines()
+        if not self.over:
+            self.spawn()
+        return cleared
+
+    def _piece_bits(self) -> int:
+        """ 操作中のブロックの占有ビット（盤面の上にはみ出した部分は含みません）。 """
+        top, _, mask = self._table[self.piece][self.rotation][self.x]
+        y = self.y + top
+        return mask << (y * self.width) if y >= 0 else mask >> (-y * self.width)
+
+    def row(self, r: int) -> int:
+        """ r 行目の占有ビット（ビット c が列 c）。 """
+        return (self.bits >> (r * self.width)) & self.full
+
+    def clear_lines(self) -> int:
+        """ 揃った行を消して上の行を詰めます。消したライン数を返します。 """
+        width, full = self.width, self.full
+        cleared = 0
+        r = self.height - 1
+        while r >= 0:
+            if (self.bits >> (r * width)) & full != full:
+                r -= 1
+                continue
+            # r 行目を取り除き、それより上の行を 1 行下にずらす（r は次も同じ行を調べる）
+            below = (1 << (r * width)) - 1
+            self.bits = ((self.bits & below) << width) | (self.bits >> ((r + 1) * width) << ((r + 1) * width))
+            for name, layer in self.layers.items():
+                self.layers[name] = ((layer & below) << width) | (layer >> ((r + 1) * width) << ((r + 1) * width))
+            cleared += 1
+        if cleared:
+            self.lines += cleared
+            self.score += LINE_SCORE * cleared
+        return cleared
+
+    def cells(self) -> list:
+        """ 各マスのブロックの種類（空きは None）を、操作中のブロックも含めて行ごとのリストで返します。 """
+        grid = [[None] * self.width for _ in range(self.height)]
+        layers = list(self.layers.items())
+        if not self.over:
+            layers.append((self.piece, self._piece_bits()))
+        for name, bits in layers:
+            while bits:
+                low = bits & -bits
+                r, c = divmod(low.bit_length() - 1, self.width)
+                grid[r][c] = name
+                bits ^= low
+        return grid
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+ゲーム用のタイマーホイール（遅れて起こる状態遷移の予約）
+
+カードを伏せ直す・モグラを引っ込める・結果表示を消すなど「○秒後に〜する」処理を予約し、
+GameEngine の tick ごとに期限の来たものを呼び出します。
+キー入力の処理を止めずに待つことができ、同時にいくつでも予約できます。
+
+- 時刻を resolution 秒ごとの枠に分け、枠番号を slots で割った余りのスロットに入れます（ハッシュ式のホイール）。
+  予約・取り消しは O(1)、advance() は経過した枠のスロットだけを調べます。
+- slots × resolution 秒より先の予約は同じスロットで周回待ちになり、時刻が来るまで呼び出しません。
+- コールバックは必ず予約した時刻以降に、時刻順（同時刻なら予約順）で呼び出します。
+  コールバックの中で新しく予約したものも、期限が来ていれば同じ advance() の中で呼び出します。
+
+    timers = engine.timers
+    timers.schedule(engine.now + 1.0, flip_back, (key1, key2))
+"""
+
+import itertools
+import math
+
+
+class Timer:
+    """ schedule() が返す予約。cancel() で取り消せます。 """
+
+    __slots__ = ("at", "callback", "args", "order", "cancelled", "_wheel")
+
+    def __init__(self, wheel, at: float, callback, args: tuple, order: int):
+        self._wheel = wheel
+        self.at = at
+        self.callback = callback
+        self.args = args
+        self.order = order
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        if not self.cancelled:
+            self.cancelled = True
+            self._wheel._live -= 1
+
+
+class TimerWheel:
+    """
+    Args:
+        resolution (float): 枠の長さ（秒）。GameEngine では tick 間隔です。
+        slots (int): スロット数。
+
+    len(timers) は呼び出し待ちの予約の数です。
+    """
+
+    def __init__(self, resolution: float = 0.1, slots: int = 256):
+        self.resolution = resolution
+        self.slots = [[] for _ in range(slots)]
+        self._order = itertools.count()
+        self._live = 0
+        self._cursor = None  # 次の advance() で最初に調べる枠番号（最初の advance() までは None）
+        self._earliest = None  # 最初の advance() までに予約された最も早い枠番号
+
+    def __len__(self) -> int:
+        return self._live
+
+    def _slot_number(self, at: float) -> int:
+        return math.floor(at / self.resolution)
+
+    def schedule(self, at: float, callback, *args) -> Timer:
+        """ 時刻 at（GameEngine.now と同じ時計）に callback(*args) を呼び出すよう予約します。 """
+        timer = Timer(self, at, callback, args, next(self._order))
+        number = self._slot_number(at)
+        if self._cursor is None:
+            self._earliest = number if self._earliest is None else min(self._earliest, number)
+        elif number < self._cursor:
+            number = self._cursor  # 調べ終わった枠には入れない（次の advance() で呼び出す）
+        self.slots[number % len(self.slots)].append(timer)
+        self._live += 1
+        return timer
+
+    def clear(self) -> None:
+        """ すべての予約を取り消します（ゲームのリセット時など）。 """
+        for slot in self.slots:
+            for timer in slot:
+                timer.cancel()
+            slot.clear()
+
+    def advance(self, now: float) -> int:
+        """ 時刻 now までに期限の来た予約を呼び出し、呼び出した数を返します。 """
+        fired = 0
+        while True:
+            due = self._collect(now)
+            if not due:
+                return fired
+            due.sort(key=lambda timer: (timer.at, timer.order))
+            for timer in due:
+                if timer.cancelled:
+                    continue  # 先に呼び出したコールバックの中で取り消された
+                timer.cancel()
+                timer.callback(*timer.args)
+                fired += 1
+
+    def _collect(self, now: float) -> list:
+        """ 期限の来た予約をスロットから取り出します（取り消し済みのものはここで捨てます）。 """
+        last = self._slot_number(now)
+        if self._cursor is not None:
+            first = self._cursor
+        else:
+            first = last if self._earliest is None else min(last, self._earliest)
+        count = len(self.slots)
+        due = []
+        # 一周以上進んだ場合も各スロットは 1 回調べれば足りる
+        for number in range(max(first, last - count + 1), last + 1):
+            slot = self.slots[number % count]
+            if not slot:
+                continue
+            keep = []
+            for timer in slot:
+                if timer.cancelled:
+                    continue
+                if timer.at <= now:
+                    due.append(timer)
+                else:
+                    keep.append(timer)  # 同じ枠の後半か、周回待ちの予約
+            slot[:] = keep
+        # 現在の枠には now より後の予約が残りうるので、次回も現在の枠から調べる
+        self._cursor = last
+        return due
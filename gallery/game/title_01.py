@@ -3,29 +3,32 @@
 Omikuji Shuffle:
 Stream Deck XL 用の簡単な占いゲームです。
 キーを押すと「Shuffling...」と表示され、1秒後にランダムな占い結果が表示されます。
+（複数のキーを続けて押すと、それぞれ 1 秒後に結果が表示されます。）
 
 占い結果: 大吉, 中吉, 小吉, 末吉, 吉, 凶, 大凶
 """
 
 # pylint: disable=wrong-import-position,no-member
 
-import time
 import random
 
-import gi
-gi.require_version('Pango', '1.0')
-gi.require_version('PangoCairo', '1.0')
-from gi.repository import Pango, PangoCairo
-
-import cairo  # Pycairo (pip install pycairo)
 from PIL import Image, ImageDraw, ImageFont
 
 from StreamDeck.DeviceManager import DeviceManager
-from StreamDeck.ImageHelpers import PILHelper
+
+from engine import GameEngine
 
 # 占い結果のリスト
 FORTUNES = ["大吉", "中吉", "小吉", "末吉", "吉", "凶", "大凶"]
 
+# 判定中の表示時間（秒）
+SHUFFLE_SECONDS = 1.0
+
+# ゲーム状態
+key_labels = {0: ("占い", 30)}  # キー番号 -> 表示内容 (テキスト, フォントサイズ)
+reveal_times = {}               # 判定中のキー番号 -> 結果を表示する時刻
+engine = None
+
 def create_text_image(text: str, width: int, height: int, font_size: int = 40,
                       text_color: tuple = (255, 255, 255),
                       background_color: tuple = (0, 0, 0)) -> Image.Image:
@@ -68,47 +71,46 @@ def shuffle_fortune() -> str:
     """
     return random.choice(FORTUNES)
 
-def key_callback(deck, key, state_pressed):
+def render_spec(spec: tuple, width: int, height: int) -> Image.Image:
+    text, font_size = spec
+    return create_text_image(text, width, height, font_size=font_size)
+
+def frame() -> dict:
+    """ 各キーに表示する内容を返します。 """
+    return dict(key_labels)
+
+def on_key(key: int) -> None:
     """
-    キー押下時のコールバック関数です。
-    キーが押されると、まず「Shuffling...」と表示し、1秒後にランダムな占い結果を表示します。
+    キーが押されたら「判定中」と表示し、1秒後に結果を表示するよう予約します。
     """
-    if state_pressed:
-        shuffling_img = create_text_image("判定中", w, h, font_size=30)
-        native_shuffling = PILHelper.to_native_format(deck, shuffling_img)
-        deck.set_key_image(key, native_shuffling)
-        time.sleep(1)
-        fortune = shuffle_fortune()
-        fortune_img = create_text_image(fortune, w, h, font_size=40)
-        native_fortune = PILHelper.to_native_format(deck, fortune_img)
-        deck.set_key_image(key, native_fortune)
+    key_labels[key] = ("判定中", 30)
+    reveal_times[key] = engine.now + SHUFFLE_SECONDS
+
+def update(now: float) -> bool:
+    """
+    時刻になったキーにランダムな占い結果を表示します。判定中のキーが残っていれば True を返します。
+    """
+    for key, reveal_time in list(reveal_times.items()):
+        if now >= reveal_time:
+            key_labels[key] = (shuffle_fortune(), 40)
+            del reveal_times[key]
+    return bool(reveal_times)
 
 def main() -> None:
     """
     メイン関数:
-      - Stream Deck を初期化し、キーサイズを取得します。
+      - Stream Deck を初期化します。
       - キー0 に初期ラベル「Omikuji」を表示します。
-      - キー押下で占い結果が表示されるよう、コールバックを登録します。
-      - ユーザーがキーを押すまでループで待機します。
+      - キー押下で占い結果が表示されるよう、ゲームエンジンで入力を待ちます。
     """
+    global engine
     deck = DeviceManager().enumerate()[0]
     deck.open()
     deck.reset()
 
-    global w, h  # キーサイズ（グローバル変数として利用）
-    key_format = deck.key_image_format()
-    w, h = key_format["size"]
-
-    # 初期画像として「Omikuji」を表示
-    init_img = create_text_image("占い", w, h, font_size=30)
-    native_init = PILHelper.to_native_format(deck, init_img)
-    deck.set_key_image(0, native_init)
-
-    deck.set_key_callback(key_callback)
-
+    engine = GameEngine(deck, render_spec)
     try:
-        while True:
-            time.sleep(0.1)
+        engine.run(frame, on_key=on_key, update=update)
     except KeyboardInterrupt:
         deck.reset()
         deck.close()
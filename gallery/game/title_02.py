@@ -11,34 +11,54 @@ Stream Deck XL 用のシンプルな三目並べゲームです。
 また、右上（キー 7）には「XOゲーム」と表示します。
 
 プレイヤーは交互に "X" と "O" を入力し、勝敗または引き分けが決まると結果が全盤面に表示されます。
+リセットボタンの右（キー 25）でコンピューター対戦（プレイヤーが X、コンピューターが O）と 2 人対戦を切り替えます。
+
+- 盤面はビットボード（mnk.py）で表します。3×3 では起動時に到達可能な全 5478 局面を読み切った表を作るので、
+  コンピューターの着手は表引き 1 回です（同じ評価の手が複数あればランダムに選びます）。
+- 環境変数 STREAMDECK_BOARD で盤面を「列x行x連」（例: 4x4x4、8x4x5。連を省略すると列数と行数の小さい方）に変更できます。
+  読み切れない大きさでは、置換表つき alpha-beta の反復深化で持ち時間（CPU_BUDGET 秒）まで読みます。
+  盤面の右に操作キーの列が収まらない場合は、複数台のデッキを横に並べて使います（deckspan.py）。
 """
 
 # pylint: disable=wrong-import-position,no-member
 
-import time
+import math
+import os
 import random
 
-import gi
-gi.require_version('Pango', '1.0')
-gi.require_version('PangoCairo', '1.0')
-from gi.repository import Pango, PangoCairo
-
-import cairo  # Pycairo (pip install pycairo)
 from PIL import Image, ImageDraw, ImageFont
 
 from StreamDeck.DeviceManager import DeviceManager
-from StreamDeck.ImageHelpers import PILHelper
 
-# 使用するキー番号の定義
-BOARD_KEYS = [0, 1, 2, 8, 9, 10, 16, 17, 18]  # 盤面のキー (3x3)
-RESET_KEY = 24  # リセットボタン (最下段左端)
+from deckspan import DeckSpan
+from engine import GameEngine
+from mnk import Game, Solver, solve
+
+# 盤面の大きさ（列x行x連）
+BOARD_SIZE = os.environ.get("STREAMDECK_BOARD", "3x3")
+SOLVE_LIMIT = 9  # このマス数以下の盤面は起動時に読み切る
+CPU_BUDGET = 1.0  # 読み切れない盤面でのコンピューターの持ち時間（秒）
+CPU_DELAY = 0.4  # プレイヤーの手を見せてからコンピューターが打つまでの間（秒）
+
+# 使用するキー番号の定義。デッキの列数に合わせて main() で決めます。
+# 3×3 の盤面を XL 1 台で遊ぶ場合は従来どおり 盤面: 0,1,2,8,9,10,16,17,18、リセット: 24、タイトル: 7 になります。
+BOARD_KEYS = []  # 盤面のキー（マス番号 = 行 × 列数 + 列 の順）
+RESET_KEY = None  # リセットボタン
+CPU_KEY = None  # コンピューター対戦の切り替え
+TITLE_KEY = None  # タイトル表示（右上）
 # キー番号から盤面インデックスへのマッピング
-BOARD_KEY_MAP = {key: index for index, key in enumerate(BOARD_KEYS)}
+BOARD_KEY_MAP = {}
 
 # ゲームの状態
-board = [None] * 9  # 各セルは None, "X", "O"
+game = None  # 盤面の形と勝ち筋（mnk.Game）
+table = None  # 読み切った表（小さい盤面のみ）
+solver = None  # 探索（読み切れない盤面用）
+stones = {"X": 0, "O": 0}  # 各プレイヤーの石のビットボード
 current_player = "X"
+cpu_player = "O"  # コンピューターが打つ側（2 人対戦なら None）
 game_over = False
+result_message = ""  # 勝敗が決まったときに盤面全体に表示するメッセージ
+engine = None
 
 def create_text_image(text: str, width: int, height: int, font_size: int = 40,
                       text_color: tuple = (255, 255, 255),
@@ -73,26 +93,38 @@ def create_text_image(text: str, width: int, height: int, font_size: int = 40,
     draw.text((x, y), text, fill=text_color, font=font)
     return image
 
-def update_board(deck, key_width: int, key_height: int) -> None:
+def render_spec(spec: tuple, width: int, height: int) -> Image.Image:
+    text, font_size, background_color = spec
+    return create_text_image(text, width, height, font_size=font_size, background_color=background_color)
+
+def frame() -> dict:
     """
-    盤面の状態に合わせて、各 BOARD_KEYS にセルの内容 ("X", "O" または空) を表示します。
+    盤面の状態に合わせて、各 BOARD_KEYS にセルの内容 ("X", "O" または空) を返します。
     空セルはライトブルーの背景色で表示し、既入力セルは黒背景で表示します。
-    また、RESET_KEY にはオレンジレッド背景で "Reset" を表示します。
+    勝敗が決まった後は盤面全体に結果メッセージを表示します。
+    また、RESET_KEY にはオレンジレッド背景で "Reset"、CPU_KEY には対戦モード、右上（キー 7）には "OXゲーム" を表示します。
     """
-    global board
+    specs = {}
     for key in BOARD_KEYS:
-        cell_index = BOARD_KEY_MAP[key]
-        if board[cell_index] is None:
-            bg_color = (173, 216, 230)  # ライトブルー
-            cell_text = ""
+        bit = 1 << BOARD_KEY_MAP[key]
+        if result_message:
+            specs[key] = (result_message, 20, (0, 0, 0))
+        elif stones["X"] & bit:
+            specs[key] = ("X", 50, (0, 0, 0))
+        elif stones["O"] & bit:
+            specs[key] = ("O", 50, (0, 0, 0))
         else:
-            bg_color = (0, 0, 0)
-            cell_text = board[cell_index]
-        img = create_text_image(cell_text, key_width, key_height, font_size=50, background_color=bg_color)
-        deck.set_key_image(key, PILHelper.to_native_format(deck, img))
+            specs[key] = ("", 50, (173, 216, 230))  # ライトブルー
     # Reset ボタン表示（オレンジレッド背景）
-    reset_img = create_text_image("Reset", key_width, key_height, font_size=30, background_color=(255, 69, 0))
-    deck.set_key_image(RESET_KEY, PILHelper.to_native_format(deck, reset_img))
+    specs[RESET_KEY] = ("Reset", 30, (255, 69, 0))
+    # 対戦モード表示
+    if cpu_player is None:
+        specs[CPU_KEY] = ("2人", 25, (0, 100, 0))
+    else:
+        specs[CPU_KEY] = (f"CPU:{cpu_player}", 20, (75, 0, 130))
+    # タイトル表示：右上（キー 7）に "OXゲーム" を表示
+    specs[TITLE_KEY] = ("OXゲーム", 15, (0, 0, 128))
+    return specs
 
 def check_winner() -> str:
     """
@@ -101,88 +133,142 @@ def check_winner() -> str:
     Returns:
         str: 勝者がいれば "X" または "O"、引き分けなら "Draw"、ゲーム継続なら空文字列 "" を返す。
     """
-    winning_positions = [
-        (0, 1, 2), (3, 4, 5), (6, 7, 8),  # 行
-        (0, 3, 6), (1, 4, 7), (2, 5, 8),  # 列
-        (0, 4, 8), (2, 4, 6)              # 斜め
-    ]
-    for a, b, c in winning_positions:
-        if board[a] is not None and board[a] == board[b] == board[c]:
-            return board[a]
-    if all(cell is not None for cell in board):
+    winner = game.winner(stones["X"], stones["O"])
+    if winner is not None:
+        return "X" if winner == "mine" else "O"
+    if stones["X"] | stones["O"] == game.full:
         return "Draw"
     return ""
 
-def reset_game(deck, key_width: int, key_height: int) -> None:
+def reset_game() -> None:
     """
-    ゲームをリセットし、盤面と状態を初期化します.
+    ゲームをリセットし、盤面と状態を初期化します（予約済みのコンピューターの手も取り消します）.
     """
-    global board, current_player, game_over
-    board = [None] * 9
+    global stones, current_player, game_over, result_message
+    engine.timers.clear()
+    stones = {"X": 0, "O": 0}
     current_player = "X"
     game_over = False
-    update_board(deck, key_width, key_height)
+    result_message = ""
+
+def place(index: int) -> None:
+    """
+    現在のプレイヤーの印をマス index に置き、勝敗を判定して手番を交代します.
+    次がコンピューターの手番なら、少し間を置いて打つよう予約します.
+    """
+    global current_player, game_over, result_message
+    stones[current_player] |= 1 << index
+    winner = check_winner()
+    if winner:
+        game_over = True
+        result_message = "引き分け" if winner == "Draw" else f"勝者: {winner}"
+        return
+    # プレイヤー交代
+    current_player = "O" if current_player == "X" else "X"
+    if current_player == cpu_player:
+        engine.timers.schedule(engine.now + CPU_DELAY, cpu_move)
 
-def key_callback(deck, key, state_pressed):
+def cpu_move() -> None:
+    """
+    コンピューターの手を打ちます（タイマーから呼び出されます）.
+    読み切った表があれば最善手の中からランダムに、なければ持ち時間まで探索した最善手を選びます.
     """
-    キー押下時のコールバック関数です.
+    mine = stones[current_player]
+    theirs = stones["O" if current_player == "X" else "X"]
+    if table is not None:
+        index = random.choice(table[(mine, theirs)][1])
+    else:
+        index = solver.best_move(mine, theirs, budget=CPU_BUDGET)
+    place(index)
+
+def parse_board_size(value: str) -> tuple:
+    """
+    "列x行" または "列x行x連"（例: "3x3"、"4x4x4"、"8x4x5"）を (列数, 行数, 連) に変換します.
+    """
+    try:
+        parts = [int(part) for part in value.lower().split("x")]
+    except ValueError:
+        parts = []
+    if len(parts) == 2:
+        parts.append(min(parts))
+    if len(parts) != 3:
+        raise ValueError(f"STREAMDECK_BOARD must look like '3x3' or '4x4x4' (got {value!r})")
+    return tuple(parts)
+
+def init_layout(columns: int, rows: int, deck_columns: int, deck_rows: int) -> None:
+    """
+    盤面を左上に置き、右上にタイトルを表示します.
+    盤面の下に空きの行があれば最下段の左端にリセット・その右に対戦モード、
+    なければ右端の列の最下段にリセット・その上に対戦モードを配置します.
+    deck_columns はデッキ（DeckSpan の場合は全デッキの合計）の列数です.
+    """
+    global BOARD_KEYS, BOARD_KEY_MAP, RESET_KEY, CPU_KEY, TITLE_KEY
+    BOARD_KEYS = [row * deck_columns + col for row in range(rows) for col in range(columns)]
+    BOARD_KEY_MAP = {key: index for index, key in enumerate(BOARD_KEYS)}
+    TITLE_KEY = deck_columns - 1
+    if rows < deck_rows:
+        RESET_KEY = (deck_rows - 1) * deck_columns
+        CPU_KEY = RESET_KEY + 1
+    else:
+        RESET_KEY = deck_rows * deck_columns - 1
+        CPU_KEY = RESET_KEY - deck_columns
+
+def on_key(key: int) -> None:
+    """
+    キー押下時の処理です.
 
     - RESET_KEY が押されるとゲームをリセットします。
-    - BOARD_KEYS のいずれかが押され、空セルの場合、現在のプレイヤーの印 ("X" または "O") を入力します。
+    - CPU_KEY が押されるとコンピューター対戦と 2 人対戦を切り替えて、ゲームをリセットします。
+    - BOARD_KEYS のいずれかが押され、空セルの場合、現在のプレイヤーの印 ("X" または "O") を入力します
+      （コンピューターの手番の間は受け付けません）。
     - 勝者または引き分けが判定された場合、盤面全体に結果メッセージを表示します。
     """
-    global board, current_player, game_over
-    if not state_pressed:
-        return
+    global cpu_player
     if key == RESET_KEY:
-        reset_game(deck, w, h)
+        reset_game()
         return
-    if key in BOARD_KEY_MAP and not game_over:
+    if key == CPU_KEY:
+        cpu_player = "O" if cpu_player is None else None
+        reset_game()
+        return
+    if key in BOARD_KEY_MAP and not game_over and current_player != cpu_player:
         index = BOARD_KEY_MAP[key]
-        if board[index] is None:
-            board[index] = current_player
-            update_board(deck, w, h)
-            winner = check_winner()
-            if winner:
-                game_over = True
-                if winner == "Draw":
-                    message = "引き分け"
-                else:
-                    message = f"勝者: {winner}"
-                # 結果を盤面全体に表示
-                for k in BOARD_KEYS:
-                    img = create_text_image(message, w, h, font_size=20)
-                    deck.set_key_image(k, PILHelper.to_native_format(deck, img))
-                return
-            # プレイヤー交代
-            current_player = "O" if current_player == "X" else "X"
+        if not (stones["X"] | stones["O"]) >> index & 1:
+            place(index)
 
 def main() -> None:
     """
     メイン関数:
-      - Stream Deck を初期化し、キーサイズを取得します。
+      - Stream Deck を初期化します。
       - BOARD_KEYS に初期状態の盤面を表示し、RESET_KEY にリセットボタンを表示します。
       - さらに、右上（物理キー番号 7）には "XOゲーム" を表示して初見でもゲームであることを示します。
-      - キー押下時のコールバックを登録し、ユーザーの入力を待機します。
+      - 小さい盤面は全局面を読み切り、大きい盤面は探索を用意します。
+      - ゲームエンジンでユーザーの入力を待機し、変化したキーだけを描画します。
     """
-    deck = DeviceManager().enumerate()[0]
+    global engine, game, table, solver
+    columns, rows, k = parse_board_size(BOARD_SIZE)
+    decks = DeviceManager().enumerate()
+    deck_rows, deck_columns = decks[0].key_layout()
+    # 盤面の右に操作キー 1 列分が収まるだけのデッキを横に並べる
+    needed = math.ceil((columns + 1) / deck_columns)
+    if rows > deck_rows or deck_rows < 3 or len(decks) < needed:
+        print(f"Board {columns}x{rows} needs {needed} deck(s) with at least {max(rows, 3)} rows "
+              f"({len(decks)} connected, {deck_rows} rows each).")
+        return
+    deck = DeckSpan(decks[:needed]) if needed > 1 else decks[0]
     deck.open()
     deck.reset()
 
-    global w, h
-    key_format = deck.key_image_format()
-    w, h = key_format["size"]
-
-    reset_game(deck, w, h)
-    # タイトル表示：右上（キー 7）に "OXゲーム" を表示
-    title_img = create_text_image("OXゲーム", w, h, font_size=15, background_color=(0, 0, 128))
-    deck.set_key_image(7, PILHelper.to_native_format(deck, title_img))
-
-    deck.set_key_callback(key_callback)
-
+    init_layout(columns, rows, deck_columns * needed, deck_rows)
+    game = Game(columns, rows, k)
+    if game.cells <= SOLVE_LIMIT:
+        table = solve(game)
+    else:
+        solver = Solver(game)
+    engine = GameEngine(deck, render_spec)
+    reset_game()
     try:
-        while True:
-            time.sleep(0.1)
+        engine.run(frame, on_key=on_key)
     except KeyboardInterrupt:
         deck.reset()
         deck.close()
@@ -17,25 +17,33 @@ Stream Deck XL 用の 3×3 グリッドを使ったミニスロットマシン
 各リールは、固定順序リストに沿って連続的にシンボルを回転させます。
 ストップボタンで各列を個別に停止し、停止時に列のオフセットを調整して表示状態を「クリーン」にします。
 全列停止後、グリッド全体（3×3）で横・縦・斜めのいずれかに３つのシンボルが揃っていれば "Win!"、そうでなければ "Lose" と判定します。
+
+リールの回転はゲームエンジン（engine.py）の tick（30 FPS）で進めます。
+各列のリールはリサイズ済みのシンボルを縦につなげた 1 枚の帯画像（NumPy 配列）として用意し、
+毎フレームはその帯を 1 ピクセル単位の位置で切り出すだけなので、フレームごとのリサイズは行いません。
+シンボルの画像（assets/slot_images、assets/manifest.json に登録）は起動時に deckkit.assets でキーサイズにリサイズして並列に読み込みます。
+3 列とも同じ tick で進め、変化したキーはエンジンが 1 回の描画パスでまとめて書き込みます。
+各列は開始時に少しずつずらして加速し（スピンアップ）、ストップボタンの後は減速して整った位置に止まります（スピンダウン）。
+終了時（Ctrl+C）に tick の遅れ（ジッター）を表示します。
 """
 
 # pylint: disable=wrong-import-position,no-member
 
+import functools
+import math
 import os
-import time
 import random
-import threading
-
-import gi
-gi.require_version('Pango', '1.0')
-gi.require_version('PangoCairo', '1.0')
-from gi.repository import Pango, PangoCairo
+import sys
 
-import cairo  # Pycairo (pip install pycairo)
+import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 
 from StreamDeck.DeviceManager import DeviceManager
-from StreamDeck.ImageHelpers import PILHelper
+
+from engine import GameEngine
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from deckkit.assets import AssetStore
 
 # --- キー設定 ---
 COLUMN_KEYS = [
@@ -49,28 +57,29 @@ START_KEY = 31            # スタートボタン
 # --- スロットシンボル設定 ---
 SLOT_SYMBOLS = ["cherry", "lemon", "orange", "grape", "star", "diamond"]
 
+# --- タイミング設定（秒） ---
+FRAME_INTERVAL = 1 / 30  # エンジンの tick 間隔（リールの描画は 30 FPS）
+REEL_SPEED = 5.0         # リールの回転速度（1 秒あたりのシンボル数。従来の 0.2 秒に 1 コマと同じ）
+SPIN_UP_SECONDS = 0.6    # 停止状態から REEL_SPEED に達するまでの時間
+SPIN_UP_STAGGER = 0.15   # 列ごとの回転開始のずれ
+SPIN_DOWN_SECONDS = 0.8  # ストップボタンから止まるまでの最短時間（整った位置までの距離に応じて延びます）
+REVEAL_SECONDS = 2.0  # 全列停止後、結果判定までに最終状態を表示する時間
+RESULT_SECONDS = 3.0  # 結果を表示してから自動リセットするまでの時間
+
 # --- グローバル変数 ---
 reel_spinning = [False, False, False]  # 各列の回転状態
 reel_results = [None, None, None]        # 各列の最終状態（各列は長さ３のリスト）
-animation_threads = [None, None, None]   # 各列のアニメーション用スレッド
 game_active = False                      # ゲーム進行状態
-# 各列の固定順序リストと現在のオフセット（列ごとに SLOT_SYMBOLS を複数回連結したリスト）
+# 各列の固定順序リストと現在の位置（列ごとに SLOT_SYMBOLS を複数回連結したリスト）
 column_orders = [[], [], []]
-reel_offsets = [0, 0, 0]
-
-# グローバルロック（キー更新用）
-deck_lock = threading.Lock()
-
-# --- 画像読み込み ---
-SLOT_IMAGES = {}
-IMAGE_DIR = "assets/slot_images"
-for symbol in SLOT_SYMBOLS:
-    path = os.path.join(IMAGE_DIR, f"{symbol}.png")
-    try:
-        img = Image.open(path).convert("RGB")
-        SLOT_IMAGES[symbol] = img
-    except IOError:
-        print(f"Error: Unable to load image for {symbol} at {path}")
+reel_positions = [0.0, 0.0, 0.0]  # 帯画像の中での最上段キーの位置（ピクセル）
+reel_strips = [None, None, None]  # 各列の帯画像（高さ = (シンボル数 + 3) × キーの高さ）
+strip_version = 0                 # 列の順序を作り直すたびに増やす（描画キャッシュの区別用）
+reel_start_times = [0.0, 0.0, 0.0]  # 各列の回転開始時刻
+reel_stops = [None, None, None]     # 減速中の列の (開始時刻, 開始位置, 移動距離, 所要時間)
+result_message = None  # 盤面全体に表示する結果（"Win!" / "Lose"、表示前は None）
+engine = None
+assets = None  # シンボルの画像（deckkit.assets.AssetStore。main() で起動時にまとめて読み込みます）
 
 def create_text_image(text: str, width: int, height: int, font_size: int = 40,
                       text_color: tuple = (255, 255, 255),
@@ -97,7 +106,7 @@ def init_column_orders() -> None:
     各列の固定順序リストを初期化します.
     各列について、SLOT_SYMBOLS を 10 回繰り返したリストをランダムにシャッフルして設定します.
     """
-    global column_orders, reel_offsets
+    global column_orders
     for i in range(3):
         order = []
         for _ in range(10):
@@ -105,72 +114,105 @@ def init_column_orders() -> None:
             random.shuffle(temp)
             order.extend(temp)
         column_orders[i] = order
-        reel_offsets[i] = 0
+        reel_positions[i] = 0.0
 
-def animate_column(col_index: int, deck, width: int, height: int) -> None:
+@functools.lru_cache(maxsize=None)
+def symbol_tile(symbol: str, width: int, height: int) -> np.ndarray:
     """
-    指定列 (col_index) の垂直回転アニメーションを実行します.
-    COLUMN_KEYS[col_index] のキー群に対して、順序リストに沿った連続的な表示（上・中・下）を更新します.
+    シンボル 1 つをキーサイズにリサイズした画像（height × width × 3 の配列）を返します.
+    画像が読み込めなかったシンボルは名前を文字で表示します.
+    """
+    img = assets.image(f"slot/{symbol}") if assets is not None else None
+    if img is not None:
+        if img.size != (width, height):
+            img = img.resize((width, height))
+    else:
+        img = create_text_image(symbol, width, height, font_size=50)
+    return np.asarray(img.convert("RGB"))
+
+def reel_strip(col_index: int, width: int, height: int) -> np.ndarray:
+    """
+    指定列の順序リストに沿ってシンボルを縦につなげた帯画像を返します（順序が変わった後の最初の描画で作ります）.
+    末尾には先頭の 3 シンボルを重ねて付け、一周したところでも切り出し位置が途切れないようにします.
+    """
+    if reel_strips[col_index] is None:
+        order = column_orders[col_index]
+        tiles = [symbol_tile(symbol, width, height) for symbol in order + order[:3]]
+        reel_strips[col_index] = np.concatenate(tiles, axis=0)
+    return reel_strips[col_index]
+
+def reel_offset(col_index: int) -> int:
+    """
+    指定列の最上段キーに（大部分が）表示されているシンボルの番号を返します.
+    """
+    return int(reel_positions[col_index] // engine.height)
+
+def reel_speed(col_index: int, now: float) -> float:
+    """
+    回転中の指定列の速度（ピクセル/秒）を返します. 開始直後はなめらかに加速します.
+    """
+    u = min(max((now - reel_start_times[col_index]) / SPIN_UP_SECONDS, 0.0), 1.0)
+    return REEL_SPEED * engine.height * u * u * (3 - 2 * u)
+
+def visible_symbols(col_index: int) -> list:
+    """
+    指定列 (col_index) に現在表示されている上・中・下の 3 つのシンボルを返します.
     """
-    global reel_spinning, reel_offsets, column_orders, reel_results
-    keys = COLUMN_KEYS[col_index]
     order = column_orders[col_index]
-    while reel_spinning[col_index]:
-        offset = reel_offsets[col_index]
-        # 画面に表示するのは、上、中、下の 3 つのシンボル
-        visible = [order[(offset + j) % len(order)] for j in range(3)]
-        # 各キーに対応する画像を更新
-        for j, key in enumerate(keys):
-            symbol = visible[j]
-            if symbol in SLOT_IMAGES:
-                img = SLOT_IMAGES[symbol].resize((width, height))
-            else:
-                img = create_text_image(symbol, width, height, font_size=50)
-            native_img = PILHelper.to_native_format(deck, img)
-            with deck_lock:
-                deck.set_key_image(key, native_img)
-        reel_offsets[col_index] = (offset + 1) % len(order)
-        time.sleep(0.2)
-    # 停止時、調整：列内の表示が「整合」するよう、オフセットを最も近い整った位置に調整する
-    remainder = reel_offsets[col_index] % len(keys)
-    if remainder != 0:
-        reel_offsets[col_index] -= remainder  # 下方向に調整
-    # 最終表示の更新
-    final = [order[(reel_offsets[col_index] + j) % len(order)] for j in range(3)]
-    for j, key in enumerate(keys):
-        symbol = final[j]
-        if symbol in SLOT_IMAGES:
-            img = SLOT_IMAGES[symbol].resize((width, height))
-        else:
-            img = create_text_image(symbol, width, height, font_size=50)
-        with deck_lock:
-            deck.set_key_image(key, PILHelper.to_native_format(deck, img))
-    reel_results[col_index] = final
-
-def start_game(deck, width: int, height: int) -> None:
+    offset = reel_offset(col_index)
+    return [order[(offset + j) % len(order)] for j in range(3)]
+
+def start_game() -> None:
     """
     ゲーム開始: 各列の回転状態を True にしてアニメーションを開始します.
     各列の順序リストを初期化します.
     """
-    global reel_spinning, animation_threads, game_active, reel_results
+    global game_active, reel_results, result_message, strip_version
     game_active = True
     reel_results = [None, None, None]
+    result_message = None
     init_column_orders()
+    reel_strips[:] = [None, None, None]
+    strip_version += 1
     for i in range(3):
         reel_spinning[i] = True
-        t = threading.Thread(target=animate_column, args=(i, deck, width, height))
-        t.start()
-        animation_threads[i] = t
+        reel_start_times[i] = engine.now + i * SPIN_UP_STAGGER
+        reel_stops[i] = None
 
-def stop_column(col_index: int, deck, width: int, height: int) -> None:
+def stop_column(col_index: int) -> None:
     """
-    指定列 (col_index) の回転を停止し、整った状態に調整します.
+    指定列 (col_index) の回転を止め、減速を開始します.
+    列内の表示が「整合」する位置（シンボル 3 つ分の境界）のうち、減速に必要な距離より先で最も近い位置に止めます.
+    減速は二次のイーズアウトで、所要時間は停止ボタン時点の速度から途切れなく減速するように決めます.
     """
-    global reel_spinning, animation_threads
     reel_spinning[col_index] = False
-    if animation_threads[col_index] is not None:
-        animation_threads[col_index].join()
-        animation_threads[col_index] = None
+    speed = reel_speed(col_index, engine.now)
+    start = reel_positions[col_index]
+    if speed <= 0:
+        # 回転開始前に止めた場合はその場で止める
+        reel_stops[col_index] = (engine.now, start, 0.0, 0.0)
+        return
+    period = len(COLUMN_KEYS[col_index]) * engine.height
+    target = math.ceil((start + speed * SPIN_DOWN_SECONDS / 2) / period) * period
+    distance = target - start
+    reel_stops[col_index] = (engine.now, start, distance, 2 * distance / speed)
+
+def land_column(col_index: int, now: float) -> None:
+    """
+    減速を終えた列の結果を確定し、全列が止まったら結果表示を予約します.
+    """
+    reel_stops[col_index] = None
+    reel_results[col_index] = visible_symbols(col_index)
+    if all(result is not None for result in reel_results):
+        engine.timers.schedule(now + REVEAL_SECONDS, show_result)  # 最終状態を確認するため2秒待つ
+
+def show_result() -> None:
+    """
+    結果を判定して盤面全体に表示し、自動リセットを予約します（タイマーから呼び出されます）.
+    """
+    global result_message
+    result_message = check_grid_result()
+    engine.timers.schedule(engine.now + RESULT_SECONDS, reset_game)
 
 def check_grid_result() -> str:
     """
@@ -196,86 +238,104 @@ def check_grid_result() -> str:
         return "Win!"
     return "Lose"
 
-def show_result(deck, width: int, height: int, result: str) -> None:
-    """
-    盤面全体に結果メッセージを表示します.
-    """
-    overlay = create_text_image(result, width, height, font_size=30, background_color=(0, 128, 0))
-    for col in COLUMN_KEYS:
-        for key in col:
-            with deck_lock:
-                deck.set_key_image(key, PILHelper.to_native_format(deck, overlay))
-
-def reset_game(deck, width: int, height: int) -> None:
+def reset_game() -> None:
     """
     ゲームをリセットし、各列に "Spin" 表示を戻します.
     """
-    global game_active, reel_results
+    global game_active, reel_results, result_message
     game_active = False
     reel_results = [None, None, None]
-    spin_img = create_text_image("Spin", width, height, font_size=30, background_color=(0, 0, 128))
-    for col in COLUMN_KEYS:
-        for key in col:
-            with deck_lock:
-                deck.set_key_image(key, PILHelper.to_native_format(deck, spin_img))
+    result_message = None
+
+def render_spec(spec: tuple, width: int, height: int) -> Image.Image:
+    """
+    ("strip", 列, 切り出し位置, 帯画像の版) はリールの帯画像の切り出し、
+    (テキスト, フォントサイズ, 背景色) はテキストの画像を生成します.
+    """
+    if spec[0] == "strip":
+        _, col_index, top, _ = spec
+        return Image.fromarray(reel_strip(col_index, width, height)[top:top + height])
+    text, font_size, background_color = spec
+    return create_text_image(text, width, height, font_size=font_size, background_color=background_color)
+
+def frame() -> dict:
+    """
+    各キーに表示する内容を返します.
+    
+    - ゲーム前は各 COLUMN_KEYS に "Spin"、結果判定後は結果メッセージ、それ以外は各リールの帯画像の切り出し。
+    - 各 STOP_KEYS に "Stop"、START_KEY に "Start"。
+    """
+    specs = {}
+    for col_index, keys in enumerate(COLUMN_KEYS):
+        top = int(reel_positions[col_index])
+        for j, key in enumerate(keys):
+            if result_message is not None:
+                specs[key] = (result_message, 30, (0, 128, 0))
+            elif not game_active:
+                specs[key] = ("Spin", 30, (0, 0, 128))
+            else:
+                specs[key] = ("strip", col_index, top + j * engine.height, strip_version)
+    for sk in STOP_KEYS:
+        specs[sk] = ("Stop", 30, (255, 69, 0))
+    specs[START_KEY] = ("Start", 30, (0, 0, 128))
+    return specs
 
-def key_callback(deck, key, state_pressed):
+def on_key(key: int) -> None:
     """
-    キー押下時のコールバック関数.
+    キー押下時の処理.
     
     - START_KEY (キー 31) でゲーム開始（各列の回転開始）。
-    - 各 STOP_KEYS (キー 24,25,26) で対応する列の回転を停止。
+    - 各 STOP_KEYS (キー 24,25,26) で対応する列の回転を停止（減速して止まります）。
     - 全列停止後、2秒間最終状態を表示し、結果判定して全盤面にオーバーレイ表示、3秒後に自動リセット。
     """
-    global game_active
-    if not state_pressed:
-        return
     if key == START_KEY and not game_active:
-        start_game(deck, w, h)
+        start_game()
     elif key in STOP_KEYS and game_active:
         col_index = STOP_KEYS.index(key)
         if reel_spinning[col_index]:
-            stop_column(col_index, deck, w, h)
-        if all(not spin for spin in reel_spinning):
-            time.sleep(2)  # 最終状態を確認するため2秒待つ
-            result = check_grid_result()
-            show_result(deck, w, h, result)
-            time.sleep(3)
-            reset_game(deck, w, h)
+            stop_column(col_index)
+
+def update(now: float) -> bool:
+    """
+    回転中・減速中のリールを 1 tick 分（ピクセル単位）進めます.
+    まだ動いているリールがあれば True を返します（結果表示・自動リセットはタイマーで行います）.
+    """
+    for i in range(3):
+        length = len(column_orders[i]) * engine.height
+        if reel_spinning[i]:
+            reel_positions[i] = (reel_positions[i] + reel_speed(i, now) * engine.step) % length
+        elif reel_stops[i] is not None:
+            started, start, distance, duration = reel_stops[i]
+            u = min((now - started) / duration, 1.0) if duration > 0 else 1.0
+            reel_positions[i] = (start + distance * (1 - (1 - u) ** 2)) % length
+            if u >= 1.0:
+                reel_positions[i] = float(round(start + distance) % length)
+                land_column(i, now)
+    return any(reel_spinning) or any(stop is not None for stop in reel_stops)
 
 def main() -> None:
     """
     メイン関数:
-      - Stream Deck を初期化し、キーサイズを取得します.
+      - Stream Deck を初期化します.
       - 各 COLUMN_KEYS に初期表示 "Spin" を、各 STOP_KEYS に "Stop"、START_KEY に "Start" を表示します.
-      - キー押下時のコールバックを登録し、ユーザー入力を待機します.
+      - ゲームエンジンでユーザー入力を待機し、リールの回転を進めます.
     """
+    global engine, assets
     deck = DeviceManager().enumerate()[0]
     deck.open()
     deck.reset()
 
-    global w, h
-    key_format = deck.key_image_format()
-    w, h = key_format["size"]
-
-    reset_game(deck, w, h)
-
-    # 各 STOP_KEYS 表示 ("Stop")
-    stop_img = create_text_image("Stop", w, h, font_size=30, background_color=(255, 69, 0))
-    for sk in STOP_KEYS:
-        with deck_lock:
-            deck.set_key_image(sk, PILHelper.to_native_format(deck, stop_img))
-    # START_KEY 表示 ("Start")
-    start_img = create_text_image("Start", w, h, font_size=30, background_color=(0, 0, 128))
-    with deck_lock:
-        deck.set_key_image(START_KEY, PILHelper.to_native_format(deck, start_img))
-
-    deck.set_key_callback(key_callback)
+    # シンボルの画像はキーサイズにリサイズした状態で並列に読み込んでおく
+    assets = AssetStore.from_env(deck).load([f"slot/{symbol}" for symbol in SLOT_SYMBOLS])
 
+    reset_game()
+    engine = GameEngine(deck, render_spec, step=FRAME_INTERVAL)
     try:
-        while True:
-            time.sleep(0.1)
+        engine.run(frame, on_key=on_key, update=update)
     except KeyboardInterrupt:
+        mean, worst = engine.jitter()
+        print(f"tick jitter: mean {mean * 1000:.1f} ms, max {worst * 1000:.1f} ms "
+              f"({engine.ticks} ticks, {engine.skipped} skipped)")
         deck.reset()
         deck.close()
 
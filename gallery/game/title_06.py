@@ -10,35 +10,46 @@ Stream Deck XL 用のシンプルなモグラたたきゲームです。
   Row 3: 24,25,26,27）上にランダムで「モグラ」が現れ、
 プレイヤーはモグラが現れているキーを押してスコアを稼ぎます。
 RESET_KEY (キー 31) を押すとゲームがリセットされます。
+
+終了時（Ctrl+C）に、キーを押してから結果が表示されるまでの遅延のパーセンタイルを表示します。
+STREAMDECK_LOW_LATENCY=1 では、モグラ・穴などのタイルを起動時に描画しておき、叩いたときは書き込みだけで結果を表示します。
+モグラの画像（assets/mole.png、assets/manifest.json に登録）は起動時に deckkit.assets でキーサイズにリサイズして読み込みます。
 """
 
-import time
 import random
 import os
+import sys
 
-import gi
-
-gi.require_version("Pango", "1.0")
-gi.require_version("PangoCairo", "1.0")
-from gi.repository import Pango, PangoCairo
-
-import cairo  # Pycairo (pip install pycairo)
 from PIL import Image, ImageDraw, ImageFont
 
 from StreamDeck.DeviceManager import DeviceManager
-from StreamDeck.ImageHelpers import PILHelper
+
+from engine import GameEngine
+from sprites import SpriteAtlas
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from deckkit.assets import AssetStore
 
 # 使用するキー番号の定義（4x4 グリッド）
 MEMORY_KEYS = [0, 1, 2, 3, 8, 9, 10, 11, 16, 17, 18, 19, 24, 25, 26, 27]
 RESET_KEY = 31  # リセットボタン（グリッド外のキー）
 
+# 低遅延モード: ゲーム中に切り替わるタイル（スコア表示以外）を起動時に描画しておく
+LOW_LATENCY = os.environ.get("STREAMDECK_LOW_LATENCY", "0") != "0"
+TILES = [
+    ("mole",),  # モグラ
+    ("", 30, (169, 169, 169)),  # 穴
+    ("Game\nOver", 30, (128, 0, 0)),
+]
+
 # グローバル変数：ゲーム状態管理
 score = 0  # プレイヤースコア
 active_mole = None  # 現在モグラが現れているキー（なければ None）
-mole_end_time = 0  # 現在のモグラが消える時刻
-next_mole_time = 0  # 次のモグラ出現までの時刻
+mole_timer = None  # 次のモグラの出現、または現在のモグラの消去の予約（engine.timers）
 game_end_time = 0  # ゲーム終了時刻
 game_over = False  # ゲームオーバーか否か
+engine = None
+assets = None  # モグラの画像（deckkit.assets.AssetStore。main() で起動時に読み込みます）
 
 
 def create_text_image(
@@ -78,20 +89,16 @@ def create_text_image(
 
 def load_mole_image(width: int, height: int) -> Image.Image:
     """
-    mole.png という画像ファイルからモグラの画像を読み込み、指定サイズにリサイズします。
-    画像の読み込みに失敗した場合は、代わりにテキスト（🐹）を描画した画像を返します。
+    起動時に読み込んだモグラの画像（assets/mole.png）を返します。
+    読み込めなかった場合は、代わりに絵文字（🐹）を描画した画像を返します。
     """
-    try:
-        # 画像ファイルの存在チェック
-        if not os.path.exists("mole.png"):
-            raise FileNotFoundError("mole.png が存在しません。")
-        img = Image.open("mole.png").convert("RGB")
-        img = img.resize((width, height))
-    except Exception as e:
-        print("mole.png の読み込みに失敗しました:", e)
-        img = create_text_image(
+    img = assets.image("mole") if assets is not None else None
+    if img is None:
+        return create_text_image(
             "🐹", width, height, font_size=30, background_color=(139, 69, 19)
         )
+    if img.size != (width, height):
+        img = img.resize((width, height))
     return img
 
 
@@ -100,18 +107,58 @@ def init_game() -> None:
     ゲームの初期化を行います.
     スコア、出現タイミング、ゲーム終了時刻などをリセットします.
     """
-    global score, active_mole, mole_end_time, next_mole_time, game_end_time, game_over
+    global score, active_mole, mole_timer, game_end_time, game_over
+    engine.timers.clear()
     score = 0
     active_mole = None
-    mole_end_time = 0
-    next_mole_time = time.time() + random.uniform(0.5, 1.5)
-    game_end_time = time.time() + 60  # ゲームは60秒間
+    mole_timer = engine.timers.schedule(engine.now + random.uniform(0.5, 1.5), spawn_mole)
+    game_end_time = engine.now + 60  # ゲームは60秒間
+    engine.timers.schedule(game_end_time, end_game)
     game_over = False
 
 
-def update_game_board(deck, key_width: int, key_height: int) -> None:
+def spawn_mole() -> None:
+    """
+    モグラを出現させ、1 秒後に消えるよう予約します（タイマーから呼び出されます）.
+    """
+    global active_mole, mole_timer
+    active_mole = random.choice(MEMORY_KEYS)
+    mole_timer = engine.timers.schedule(engine.now + 1.0, despawn_mole)  # 1秒間表示
+
+
+def despawn_mole() -> None:
+    """
+    モグラを消し、次の出現を予約します（タイマーから呼び出されます. 叩いたときも呼び出します）.
+    """
+    global active_mole, mole_timer
+    active_mole = None
+    mole_timer = engine.timers.schedule(engine.now + random.uniform(0.5, 1.5), spawn_mole)
+
+
+def end_game() -> None:
+    """
+    制限時間になったらゲームオーバーにし、残りの予約を取り消します（タイマーから呼び出されます）.
     """
-    現在のゲーム状態に応じて、各キーに表示する内容を更新します.
+    global game_over
+    game_over = True
+    engine.timers.clear()
+
+
+def render_spec(spec: tuple, width: int, height: int) -> Image.Image:
+    """
+    ("mole",) はモグラ画像、(テキスト, フォントサイズ, 背景色) はテキストの画像を生成します.
+    """
+    if spec == ("mole",):
+        return load_mole_image(width, height)
+    text, font_size, background_color = spec
+    return create_text_image(
+        text, width, height, font_size=font_size, background_color=background_color
+    )
+
+
+def frame() -> dict:
+    """
+    現在のゲーム状態に応じて、各キーに表示する内容を返します.
 
     - ゲーム中の場合:
         * モグラが出現しているキーにはモグラ画像を表示（茶色背景）
@@ -121,111 +168,63 @@ def update_game_board(deck, key_width: int, key_height: int) -> None:
         * 全キーに「Game Over」を表示（濃い赤背景）
         * RESET_KEY には最終スコアと「Reset」を表示
     """
-    global score, active_mole, game_over, game_end_time
+    specs = {}
     if game_over:
         # ゲームオーバー表示
         for key in MEMORY_KEYS:
-            img = create_text_image(
-                "Game\nOver",
-                key_width,
-                key_height,
-                font_size=30,
-                background_color=(128, 0, 0),
-            )
-            deck.set_key_image(key, PILHelper.to_native_format(deck, img))
-        reset_img = create_text_image(
-            f"Score: {score}\nReset",
-            key_width,
-            key_height,
-            font_size=25,
-            background_color=(255, 69, 0),
-        )
-        deck.set_key_image(RESET_KEY, PILHelper.to_native_format(deck, reset_img))
-        return
+            specs[key] = ("Game\nOver", 30, (128, 0, 0))
+        specs[RESET_KEY] = (f"Score: {score}\nReset", 25, (255, 69, 0))
+        return specs
 
-    # ゲーム中の表示更新
+    # ゲーム中の表示
     for key in MEMORY_KEYS:
         if active_mole == key:
             # モグラが出現中の場合、画像を表示
-            img = load_mole_image(key_width, key_height)
+            specs[key] = ("mole",)
         else:
             # 何もない穴（グレー背景）
-            img = create_text_image(
-                "",
-                key_width,
-                key_height,
-                font_size=30,
-                background_color=(169, 169, 169),
-            )
-        deck.set_key_image(key, PILHelper.to_native_format(deck, img))
+            specs[key] = ("", 30, (169, 169, 169))
 
     # RESET_KEY にスコアと残り時間を表示
-    time_left = max(0, int(game_end_time - time.time()))
-    reset_img = create_text_image(
-        f"Score: {score}\nTime: {time_left}",
-        key_width,
-        key_height,
-        font_size=14,
-        background_color=(0, 100, 0),
-    )
-    deck.set_key_image(RESET_KEY, PILHelper.to_native_format(deck, reset_img))
+    time_left = max(0, int(game_end_time - engine.now))
+    specs[RESET_KEY] = (f"Score: {score}\nTime: {time_left}", 14, (0, 100, 0))
+    return specs
 
 
-def key_callback(deck, key, state_pressed):
+def on_key(key: int) -> None:
     """
-    キー押下時のコールバック関数.
+    キー押下時の処理.
 
     - RESET_KEY が押されるとゲームリセット.
     - MEMORY_KEYS 上で、モグラが出現中のキーが押されるとスコア加点し、モグラを消去.
     """
-    global active_mole, score, next_mole_time, game_over
-    if not state_pressed:
-        return
+    global score
     if key == RESET_KEY:
         init_game()
-        update_game_board(deck, w, h)
         return
-    if key in MEMORY_KEYS:
+    if key in MEMORY_KEYS and not game_over:
         if active_mole == key:
-            # モグラを叩いた → スコア加点＆モグラ消去
+            # モグラを叩いた → スコア加点＆モグラ消去（消去の予約は取り消す）
             score += 1
-            active_mole = None
-            next_mole_time = time.time() + random.uniform(0.5, 1.5)
-            update_game_board(deck, w, h)
+            mole_timer.cancel()
+            despawn_mole()
 
 
 def main() -> None:
-    global game_over, active_mole, mole_end_time, next_mole_time, game_end_time
+    global engine, assets
     deck = DeviceManager().enumerate()[0]
     deck.open()
     deck.reset()
 
-    global w, h
-    key_format = deck.key_image_format()
-    w, h = key_format["size"]
+    assets = AssetStore.from_env(deck).load(["mole"])
 
+    atlas = SpriteAtlas(deck, render_spec).build(TILES) if LOW_LATENCY else None
+    engine = GameEngine(deck, render_spec, atlas=atlas)
     init_game()
-    update_game_board(deck, w, h)
-    deck.set_key_callback(key_callback)
-
     try:
-        while True:
-            current_time = time.time()
-            if not game_over:
-                if current_time >= game_end_time:
-                    game_over = True
-                    update_game_board(deck, w, h)
-                else:
-                    # モグラ出現の処理
-                    if active_mole is None and current_time >= next_mole_time:
-                        active_mole = random.choice(MEMORY_KEYS)
-                        mole_end_time = current_time + 1.0  # 1秒間表示
-                    elif active_mole is not None and current_time >= mole_end_time:
-                        active_mole = None
-                        next_mole_time = current_time + random.uniform(0.5, 1.5)
-                    update_game_board(deck, w, h)
-            time.sleep(0.1)
+        engine.run(frame, on_key=on_key)
     except KeyboardInterrupt:
+        print(engine.latency_summary())
         deck.reset()
         deck.close()
 
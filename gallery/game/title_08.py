@@ -12,20 +12,18 @@ Stream Deck XL 用のシンプルな神経衰弱ゲームです。
 RESET_KEY (キー 31) を押すとゲームをリセットします。
 """
 
-import time
 import random
 import io
+import os
+import sys
 
-import gi
-
-gi.require_version("Pango", "1.0")
-gi.require_version("PangoCairo", "1.0")
-from gi.repository import Pango, PangoCairo
-
-import cairo
 from PIL import Image
 from StreamDeck.DeviceManager import DeviceManager
-from StreamDeck.ImageHelpers import PILHelper
+
+from engine import GameEngine
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from deckkit.rendering import Pango, PangoCairo, cairo
 
 # 使用するキー番号の定義（4x4 グリッド）
 MEMORY_KEYS = [0, 1, 2, 3, 8, 9, 10, 11, 16, 17, 18, 19, 24, 25, 26, 27]
@@ -39,7 +37,10 @@ memory_cards = {}  # MEMORY_KEYS -> カードシンボルの割り当て
 flipped_cards = []  # 現在表向きのカードのキー番号（最大2枚）
 solved_cards = set()  # 既に一致したカードのキー番号
 selection_count = 0  # 選択回数のカウンター
+pending_flips = set()  # 一致せず、伏せ直す予約をしたカードのキー番号
 COUNTER_KEY = 7  # カウンター表示用のキー
+FLIP_BACK_SECONDS = 1.0  # 一致しなかったカードを表示しておく時間（秒）
+engine = None
 
 
 def create_text_image(
@@ -103,56 +104,45 @@ def init_memory_cards() -> None:
     """
     MEMORY_KEYS にランダムなカード割り当てを行い、グローバル変数を初期化します.
     """
-    global memory_cards, flipped_cards, solved_cards, selection_count
+    global memory_cards, flipped_cards, solved_cards, selection_count, pending_flips
     deck_cards = CARD_SYMBOLS * 2  # 16 枚 (8ペア)
     random.shuffle(deck_cards)
     memory_cards = {key: deck_cards[i] for i, key in enumerate(MEMORY_KEYS)}
     flipped_cards = []
     solved_cards = set()
     selection_count = 0
+    pending_flips = set()
 
 
-def update_counter_display(deck, key_width: int, key_height: int) -> None:
-    """
-    選択回数カウンターを表示します.
-    """
-    counter_img = create_text_image(
-        f"{selection_count}回",
-        key_width,
-        key_height,
-        font_size=30,
-        background_color=(70, 130, 180),  # スチールブルー
+def render_spec(spec: tuple, width: int, height: int) -> Image.Image:
+    text, font_size, background_color = spec
+    return create_text_image(
+        text, width, height, font_size=font_size, background_color=background_color
     )
-    deck.set_key_image(COUNTER_KEY, PILHelper.to_native_format(deck, counter_img))
 
 
-def update_memory_board(deck, key_width: int, key_height: int) -> None:
+def frame() -> dict:
     """
-    MEMORY_KEYS の状態に合わせて、各キーにカードの内容を表示します.
+    MEMORY_KEYS の状態に合わせて、各キーに表示するカードの内容を返します.
 
     - カードが伏せられている場合は「❓」を表示（背景はライトグレー）。
     - カードが表向き（flipped または solved）の場合は実際の野菜絵文字を表示（背景は黒）。
-    - RESET_KEY には「Reset」をオレンジレッド背景で表示します.
+    - 全ペアが解決されたら、全てのキーに「🎉」を表示します。
+    - RESET_KEY には「Reset」をオレンジレッド背景で、COUNTER_KEY には選択回数を表示します.
     """
-    global memory_cards, flipped_cards, solved_cards
+    specs = {}
     for key in MEMORY_KEYS:
-        if key in flipped_cards or key in solved_cards:
-            symbol = memory_cards[key]
+        if check_all_solved():
+            specs[key] = ("🎉", 50, (0, 128, 0))
+        elif key in flipped_cards or key in solved_cards or key in pending_flips:
+            specs[key] = (memory_cards[key], 50, (0, 0, 0))  # 黒
         else:
-            symbol = "❓"
-        bg_color = (
-            (0, 0, 0) if symbol != "❓" else (173, 216, 230)
-        )  # 黒 or ライトブルー
-        img = create_text_image(
-            symbol, key_width, key_height, font_size=50, background_color=bg_color
-        )
-        deck.set_key_image(key, PILHelper.to_native_format(deck, img))
+            specs[key] = ("❓", 50, (173, 216, 230))  # ライトブルー
     # RESET_KEY 表示（オレンジレッド背景）
-    reset_img = create_text_image(
-        "Reset", key_width, key_height, font_size=30, background_color=(255, 69, 0)
-    )
-    deck.set_key_image(RESET_KEY, PILHelper.to_native_format(deck, reset_img))
-    update_counter_display(deck, key_width, key_height)
+    specs[RESET_KEY] = ("Reset", 30, (255, 69, 0))
+    # 選択回数カウンター（スチールブルー）
+    specs[COUNTER_KEY] = (f"{selection_count}回", 30, (70, 130, 180))
+    return specs
 
 
 def check_all_solved() -> bool:
@@ -165,69 +155,59 @@ def check_all_solved() -> bool:
     return len(solved_cards) == len(MEMORY_KEYS)
 
 
-def key_callback(deck, key, state_pressed):
+def flip_back(pair: tuple) -> None:
+    """
+    一致しなかった 2 枚を伏せ直します（タイマーから呼び出されます）.
     """
-    キー押下時のコールバック関数です.
+    pending_flips.difference_update(pair)
 
-    - RESET_KEY が押された場合、ゲームをリセットします.
+
+def on_key(key: int) -> None:
+    """
+    キー押下時の処理です.
+
+    - RESET_KEY が押された場合、ゲームをリセットします（伏せ直しの予約も取り消します）.
     - MEMORY_KEYS のうち、まだ解決されておらず伏せられているカードを選択した場合、カードを表向きにします.
-    - 2 枚表向きになった場合、一致するかを判定し、一致すればそのカードは解決状態に、そうでなければ伏せ直します.
+    - 2 枚表向きになった場合、一致するかを判定し、一致すればそのカードは解決状態に、
+      そうでなければ 1 秒後に伏せ直すようタイマーに予約します.
+      伏せ直しを待つ間も入力は受け付け、次の 2 枚を選ぶことができます（待っているカードは選べません）.
     """
-    global memory_cards, flipped_cards, solved_cards, selection_count
-    if not state_pressed:
-        return
+    global selection_count
     if key == RESET_KEY:
+        engine.timers.clear()
         init_memory_cards()
-        update_memory_board(deck, w, h)
         return
-    if key in MEMORY_KEYS and key not in flipped_cards and key not in solved_cards:
+    face_up = key in flipped_cards or key in solved_cards or key in pending_flips
+    if key in MEMORY_KEYS and not face_up:
         selection_count += 1
         flipped_cards.append(key)
-        update_memory_board(deck, w, h)
         if len(flipped_cards) == 2:
-            key1, key2 = flipped_cards
-            if memory_cards[key1] == memory_cards[key2]:
-                solved_cards.add(key1)
-                solved_cards.add(key2)
-                flipped_cards.clear()
-                update_memory_board(deck, w, h)
-                if check_all_solved():
-                    # 全ペアが解決されたら、全てのキーに結果を表示
-                    for k in MEMORY_KEYS:
-                        img = create_text_image(
-                            "🎉", w, h, font_size=50, background_color=(0, 128, 0)
-                        )
-                        deck.set_key_image(k, PILHelper.to_native_format(deck, img))
+            pair = tuple(flipped_cards)
+            flipped_cards.clear()
+            if memory_cards[pair[0]] == memory_cards[pair[1]]:
+                solved_cards.update(pair)
             else:
-                time.sleep(1)
-                flipped_cards.clear()
-                update_memory_board(deck, w, h)
+                pending_flips.update(pair)
+                engine.timers.schedule(engine.now + FLIP_BACK_SECONDS, flip_back, pair)
 
 
 def main() -> None:
     """
     メイン関数:
-      - Stream Deck を初期化し、キーサイズを取得します.
+      - Stream Deck を初期化します.
       - MEMORY_KEYS にランダムなカード割り当てを行い、初期状態（全伏せ）を表示します.
       - RESET_KEY にリセットボタンを表示します.
-      - キー押下時のコールバックを登録し、ユーザー入力を待機します.
+      - ゲームエンジンでユーザー入力を待機し、変化したキーだけを描画します.
     """
+    global engine
     deck = DeviceManager().enumerate()[0]
     deck.open()
     deck.reset()
 
-    global w, h
-    key_format = deck.key_image_format()
-    w, h = key_format["size"]
-
     init_memory_cards()
-    update_memory_board(deck, w, h)
-
-    deck.set_key_callback(key_callback)
-
+    engine = GameEngine(deck, render_spec)
     try:
-        while True:
-            time.sleep(0.1)
+        engine.run(frame, on_key=on_key)
     except KeyboardInterrupt:
         deck.reset()
         deck.close()
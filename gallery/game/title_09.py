@@ -19,19 +19,19 @@ STREAM DECK 用ゲーム例
     ・リセット：キー 31　（ゲーム状態を初期化）
 """
 
-import time
+import os
+import sys
 import io
 
-import gi
-
-gi.require_version("Pango", "1.0")
-gi.require_version("PangoCairo", "1.0")
-from gi.repository import Pango, PangoCairo
-
-import cairo
 from PIL import Image
 from StreamDeck.DeviceManager import DeviceManager
-from StreamDeck.ImageHelpers import PILHelper
+
+from engine import GameEngine
+from sprites import SpriteAtlas
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from deckkit.render_cache import DiskRenderCache, code_version
+from deckkit.rendering import Pango, PangoCairo, cairo
 
 # --- キー定義 ---
 # ゲーム盤（4x4グリッド）に対応するキー番号
@@ -63,6 +63,22 @@ RIGHT_KEY = 5  # 右操作
 OPEN_KEY = 13  # ドアオープン（スペース相当）
 RESET_KEY = 31  # ゲームリセット
 
+# 起動時にまとめて描画しておく表示内容（text, font_size, background_color）
+SPRITES = [
+    ("█", 40, (100, 100, 100)),  # 壁
+    ("🚪", 40, (0, 0, 255)),  # ドア（閉）
+    ("🚪", 40, (0, 128, 0)),  # ドア（開）
+    ("🐍", 40, (255, 0, 0)),  # 蛇のヘッド
+    ("🐍", 40, (0, 255, 0)),  # 蛇の胴体
+    ("", 40, (200, 200, 200)),  # 空きマス
+    ("💀", 40, (255, 0, 0)),  # ゲームオーバー
+    ("🎉", 40, (0, 128, 0)),  # クリア
+    ("←", 40, (0, 0, 0)),
+    ("→", 40, (0, 0, 0)),
+    ("Open", 30, (255, 165, 0)),
+    ("Reset", 30, (255, 69, 0)),
+]
+
 # --- ゲーム状態のグローバル変数 ---
 # ゲーム盤は 4x4、ただしプレイ可能は中央2列（col1, col2）。
 # 外枠（col0, col3）は壁として描画します。
@@ -72,12 +88,8 @@ door_open = False
 game_over = False
 win = False
 
-# 自動移動の更新間隔（秒）
+# 自動移動の更新間隔（秒）。ゲームエンジンの tick 間隔として使います。
 update_interval = 1.0
-last_update_time = 0
-
-# 差分更新用キャッシュ（key 番号 → (text, font_size, background_color)）
-last_key_state = {}
 
 
 # --- 画像生成ヘルパー ---
@@ -116,143 +128,115 @@ def create_text_image(
     return Image.open(output)
 
 
-# --- 差分更新用ヘルパー ---
-def update_key(deck, key, new_state, key_width, key_height):
+# --- 描画指定（spec）から画像を生成 ---
+def render_spec(spec: tuple, width: int, height: int) -> Image.Image:
     """
-    指定の key に対し、新しい状態 new_state が前回と異なる場合のみ再描画します。
-    new_state: (text, font_size, background_color)
+    spec: (text, font_size, background_color)
     """
-    global last_key_state
-    if last_key_state.get(key) == new_state:
-        return  # 状態が変わっていないため、更新不要
-    text, font_size, background_color = new_state
-    img = create_text_image(
-        text,
-        key_width,
-        key_height,
-        font_size=font_size,
-        background_color=background_color,
-    )
-    deck.set_key_image(key, PILHelper.to_native_format(deck, img))
-    last_key_state[key] = new_state
+    text, font_size, background_color = spec
+    return create_text_image(text, width, height, font_size=font_size, background_color=background_color)
 
 
 # --- ゲーム初期化 ---
 def init_game() -> None:
-    global snake_body, next_col, door_open, game_over, win, last_update_time, last_key_state
+    global snake_body, next_col, door_open, game_over, win
     # 蛇の初期位置：下段、プレイ可能領域の左側（row 3, col 1）
     snake_body = [(3, 1)]
     next_col = 1
     door_open = False
     game_over = False
     win = False
-    last_update_time = time.time()
-    # キャッシュもクリア
-    last_key_state = {}
 
 
-# --- ゲーム状態更新 ---
-def update_game_state() -> None:
-    global snake_body, next_col, game_over, win, door_open, last_update_time
+# --- ゲーム状態更新（update_interval ごと） ---
+def update_game_state(now: float) -> bool:
+    """
+    蛇を 1 マス進めます。まだ自動で進む（ゲーム中でヘッドが上段に達していない）なら True を返します。
+    """
+    global game_over, win
     if game_over or win:
-        return
-    current_time = time.time()
+        return False
     head_row, head_col = snake_body[-1]
     # ヘッドが既に上段（row 0）に到達している場合は自動更新せずドアオープン待ち
     if head_row == 0:
-        return
-    if current_time - last_update_time >= update_interval:
-        last_update_time = current_time
-        new_row = head_row - 1
-        new_col = next_col
-        # プレイ可能領域は col 1～2 以外は壁との衝突
-        if new_col not in (1, 2):
+        return False
+    new_row = head_row - 1
+    new_col = next_col
+    # プレイ可能領域は col 1～2 以外は壁との衝突
+    if new_col not in (1, 2):
+        game_over = True
+        return False
+    if new_row < 0:
+        # もしドアが開いていれば勝利、それ以外はゲームオーバー
+        if door_open:
+            win = True
+        else:
             game_over = True
-            return
-        if new_row < 0:
-            # もしドアが開いていれば勝利、それ以外はゲームオーバー
-            if door_open:
-                win = True
-            else:
-                game_over = True
-            return
-        snake_body.append((new_row, new_col))
+        return False
+    snake_body.append((new_row, new_col))
+    return new_row > 0
 
 
-# --- 画面更新 ---
-def update_display(deck, key_width: int, key_height: int) -> None:
-    # ゲーム盤全体の再描画（差分更新）
+# --- 画面（各キーの spec） ---
+def frame() -> dict:
+    specs = {}
+    # 操作キー
+    specs[LEFT_KEY] = ("←", 40, (0, 0, 0))
+    specs[RIGHT_KEY] = ("→", 40, (0, 0, 0))
+    specs[OPEN_KEY] = ("Open", 30, (255, 165, 0))
+    specs[RESET_KEY] = ("Reset", 30, (255, 69, 0))
+
     if game_over:
         for key in GRID_KEYS.values():
-            update_key(deck, key, ("💀", 40, (255, 0, 0)), key_width, key_height)
-        # 操作キーも更新
-        update_key(deck, LEFT_KEY, ("←", 40, (0, 0, 0)), key_width, key_height)
-        update_key(deck, RIGHT_KEY, ("→", 40, (0, 0, 0)), key_width, key_height)
-        update_key(deck, OPEN_KEY, ("Open", 30, (255, 165, 0)), key_width, key_height)
-        update_key(deck, RESET_KEY, ("Reset", 30, (255, 69, 0)), key_width, key_height)
-        return
+            specs[key] = ("💀", 40, (255, 0, 0))
+        return specs
 
     if win:
         for key in GRID_KEYS.values():
-            update_key(deck, key, ("🎉", 40, (0, 128, 0)), key_width, key_height)
-        update_key(deck, LEFT_KEY, ("←", 40, (0, 0, 0)), key_width, key_height)
-        update_key(deck, RIGHT_KEY, ("→", 40, (0, 0, 0)), key_width, key_height)
-        update_key(deck, OPEN_KEY, ("Open", 30, (255, 165, 0)), key_width, key_height)
-        update_key(deck, RESET_KEY, ("Reset", 30, (255, 69, 0)), key_width, key_height)
-        return
+            specs[key] = ("🎉", 40, (0, 128, 0))
+        return specs
 
-    # 通常のゲーム盤描画
+    # 通常のゲーム盤
     for row in range(4):
         for col in range(4):
             key = GRID_KEYS[(row, col)]
             # 外枠（col0, col3）は壁
             if col == 0 or col == 3:
-                new_state = ("█", 40, (100, 100, 100))
+                specs[key] = ("█", 40, (100, 100, 100))
             # ドアエリア：ここでは (0,1) をドアとする
             elif row == 0 and col == 2:
                 if door_open:
-                    new_state = ("🚪", 40, (0, 128, 0))
+                    specs[key] = ("🚪", 40, (0, 128, 0))
                 else:
-                    new_state = ("🚪", 40, (0, 0, 255))
+                    specs[key] = ("🚪", 40, (0, 0, 255))
             else:
                 # 中央セル：蛇があるか？
                 if (row, col) in snake_body:
                     if (row, col) == snake_body[-1]:
-                        new_state = ("🐍", 40, (255, 0, 0))  # ヘッド
+                        specs[key] = ("🐍", 40, (255, 0, 0))  # ヘッド
                     else:
-                        new_state = ("🐍", 40, (0, 255, 0))
+                        specs[key] = ("🐍", 40, (0, 255, 0))
                 else:
-                    new_state = ("", 40, (200, 200, 200))
-            update_key(deck, key, new_state, key_width, key_height)
-
-    # 操作キーの更新
-    update_key(deck, LEFT_KEY, ("←", 40, (0, 0, 0)), key_width, key_height)
-    update_key(deck, RIGHT_KEY, ("→", 40, (0, 0, 0)), key_width, key_height)
-    update_key(deck, OPEN_KEY, ("Open", 30, (255, 165, 0)), key_width, key_height)
-    update_key(deck, RESET_KEY, ("Reset", 30, (255, 69, 0)), key_width, key_height)
+                    specs[key] = ("", 40, (200, 200, 200))
+    return specs
 
 
-# --- キー操作コールバック ---
-def key_callback(deck, key, state_pressed) -> None:
+# --- キー操作 ---
+def on_key(key: int) -> None:
     global next_col, door_open, win
-    if not state_pressed:
-        return
     # リセットキー
     if key == RESET_KEY:
         init_game()
-        update_display(deck, w, h)
         return
     # 左操作キー
     if key == LEFT_KEY:
         if next_col == 2:
             next_col = 1
-        update_display(deck, w, h)
         return
     # 右操作キー
     if key == RIGHT_KEY:
         if next_col == 1:
             next_col = 2
-        update_display(deck, w, h)
         return
     # ドアオープンキー
     if key == OPEN_KEY:
@@ -262,7 +246,6 @@ def key_callback(deck, key, state_pressed) -> None:
             # ヘッドがドアセル (0,1) にある場合は勝利
             if (head_row, head_col) == (0, 2):
                 win = True
-        update_display(deck, w, h)
         return
 
 
@@ -271,19 +254,13 @@ def main() -> None:
     deck = DeviceManager().enumerate()[0]
     deck.open()
     deck.reset()
-    global w, h
-    key_format = deck.key_image_format()
-    w, h = key_format["size"]
+    render_cache = DiskRenderCache.from_env(deck, code_version(os.path.abspath(__file__)))
 
     init_game()
-    update_display(deck, w, h)
-    deck.set_key_callback(key_callback)
-
+    atlas = SpriteAtlas(deck, render_spec, cache=render_cache).build(SPRITES)
+    engine = GameEngine(deck, render_spec, step=update_interval, cache=render_cache, atlas=atlas)
     try:
-        while True:
-            update_game_state()
-            update_display(deck, w, h)
-            time.sleep(0.1)
+        engine.run(frame, on_key=on_key, update=update_game_state)
     except KeyboardInterrupt:
         deck.reset()
         deck.close()
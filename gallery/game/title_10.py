@@ -7,25 +7,36 @@
 - ゲーム画面は 4×4 グリッドで、下段 (row3) が海面（🌊）として描画されます。
 - 初期状態では魚（🐟）は海中（水面上）にいます。
 - 矢印キー（ここではキー 4 および 5）を押すとジャンプ開始し、魚は最大高度（3）から飛び出します。
-- 更新ごとに魚は自動で前進し（水平距離が増加）、重力により高度が 1 ずつ低下します。
-- 空中にいる間、スペースキー（キー 13）を押すとグライド状態となり、高度低下が抑えられます。
-- 魚が海面（高度 0）に落下するとゲームオーバー。得点は進んだ距離（fish_x）です。
+- 魚は 25 FPS で連続的に動き、毎秒 FISH_SPEED キー分前進しながら、重力で毎秒 SINK_SPEED キー分ずつ高度が下がります。
+  位置はキーの途中（ピクセル単位）でも表示され、魚が 1 キー分より右へ進むと画面が横にスクロールします。
+- 空中にいる間、スペースキー（キー 13）を押すとグライド状態となり、その後 GLIDE_SECONDS 秒は高度が下がりません。
+- 魚が海面（高度 0）に落下するとゲームオーバー。得点は進んだ距離（fish_x のキー数）です。
 - リセットキー（キー 31）でゲームを初期化します。
+
+【描画】
+- 空（グラデーションと雲）と海面（🌊）は、キーサイズに合わせた横長の帯画像（NumPy 配列）として起動後に一度だけ作ります。
+  空の層は海面より遅く流れ（パララックス）、どちらも一周したところで途切れないよう先頭の 1 キー分を末尾に付けています。
+- 魚はピクセル単位で進み・沈み、画面はその帯を 1 ピクセル単位の位置で切り出した窓として 25 FPS で描きます。
+  魚の絵文字は黒背景と白背景で描いた差から透明度を求めたスプライトで、各キーの切り出しに NumPy で重ねます。
+- 各キーの spec は（層, 帯の切り出し位置, キー内の魚の位置）なので、見た目の変わらないキー（雲のない空など）は
+  spec も変わらず、エンジンは変化したキーだけを書き込みます。
 """
 
-import time
+import functools
+import os
+import sys
 import io
 
-import gi
-
-gi.require_version("Pango", "1.0")
-gi.require_version("PangoCairo", "1.0")
-from gi.repository import Pango, PangoCairo
-
-import cairo
+import numpy as np
 from PIL import Image
 from StreamDeck.DeviceManager import DeviceManager
-from StreamDeck.ImageHelpers import PILHelper
+
+from engine import GameEngine
+from sprites import SpriteAtlas
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from deckkit.render_cache import DiskRenderCache, code_version
+from deckkit.rendering import Pango, PangoCairo, cairo
 
 # --- キー定義 ---
 # ゲーム盤（4×4グリッド）のキー番号
@@ -55,19 +66,40 @@ JUMP_KEYS = [4, 5]  # 矢印キーとしてジャンプ開始に使用
 GLIDE_KEY = 13  # スペースキーとしてグライド操作に使用
 RESET_KEY = 31  # ゲームリセット
 
+# 起動時にまとめて描画しておく表示内容（text, font_size, background_color）
+# スコア表示（Score:N）は値ごとに異なるため、表示時に描画します。
+# 空・海面・魚のキーは帯画像の切り出しなので render_spec() で合成します。
+SPRITES = [
+    ("💦", 40, (0, 0, 255)),  # 着水
+    ("Jump", 15, (0, 0, 0)),
+    ("Glide", 15, (255, 165, 0)),
+    ("Reset", 15, (255, 69, 0)),
+]
+
+# --- 背景の層 ---
+SKY_TOP = (90, 160, 235)  # 空の上端の色
+SKY_BOTTOM = (175, 225, 250)  # 空の下端（水平線）の色
+SEA_COLOR = (0, 0, 255)
+SKY_PERIOD = 8  # 空の層の帯の長さ（キー数）。この長さで繰り返します
+SKY_PARALLAX = 0.4  # 空の層が流れる速さ（海面に対する比）
+# 雲の位置（帯の左端からのキー数, 行）。帯の長さを超えないように置きます
+CLOUDS = [(0.6, 0), (2.5, 1), (4.2, 0), (6.3, 1)]
+
+# --- 魚の動き（キー数/秒） ---
+FISH_SPEED = 2.0  # 前進の速さ
+SINK_SPEED = 2.0  # 重力で高度が下がる速さ
+GLIDE_SECONDS = 0.5  # グライド操作 1 回で高度を保つ時間
+
 # --- ゲーム状態のグローバル変数 ---
-# fish_x: 水平距離（進行状況）; fish_alt: 高度（0:海面、1〜3:空中の高さ）
-fish_x = 0
-fish_alt = 0  # 0 = 海面、3 = 最高高度
+# fish_x: 水平距離（キー数、進行状況）; fish_alt: 高度（0:海面、3:最高高度。キー数）
+fish_x = 0.0
+fish_alt = 0.0
 game_active = False  # ゲーム中かどうか（ジャンプ後は True）
-glide_flag = False  # 現在の更新でグライド操作が有効かどうか
-
-# 自動更新の間隔（秒）
-update_interval = 0.5
-last_update_time = 0
+glide_until = 0.0  # この時刻まではグライド中（高度が下がらない）
+engine = None
 
-# 差分更新用キャッシュ（key 番号 → (text, font_size, background_color)）
-last_key_state = {}
+# ゲームエンジンの tick 間隔（秒）。魚の移動と画面のスクロールは 25 FPS で進めます。
+FRAME_INTERVAL = 1 / 25
 
 
 # --- 画像生成ヘルパー ---
@@ -106,143 +138,215 @@ def create_text_image(
     return Image.open(output)
 
 
-# --- 差分更新用ヘルパー ---
-def update_key(deck, key, new_state, key_width, key_height):
+# --- 背景の帯画像とスプライト ---
+def matte_sprite(text: str, width: int, height: int, font_size: int = 40) -> tuple:
+    """
+    絵文字を黒背景と白背景で描き、その差から透明度を求めます。
+    (乗算済みの色, 透明度) を返します（どちらも uint16 の配列、透明度は 0〜255）。
+    """
+    black = np.asarray(create_text_image(text, width, height, font_size=font_size,
+                                         background_color=(0, 0, 0)).convert("RGB"), dtype=np.uint16)
+    white = np.asarray(create_text_image(text, width, height, font_size=font_size,
+                                         background_color=(255, 255, 255)).convert("RGB"), dtype=np.uint16)
+    alpha = 255 - (white - np.minimum(black, white)).max(axis=2, keepdims=True)
+    return black, alpha
+
+
+def blend(base: np.ndarray, sprite: tuple, dx: int, dy: int) -> None:
+    """
+    base（height × width × 3 の uint8 配列）の (dx, dy) の位置にスプライトを重ねます（はみ出た部分は切り捨てます）。
+    """
+    premultiplied, alpha = sprite
+    height, width = base.shape[:2]
+    x0, y0 = max(dx, 0), max(dy, 0)
+    x1, y1 = min(dx + width, width), min(dy + height, height)
+    if x0 >= x1 or y0 >= y1:
+        return
+    region = base[y0:y1, x0:x1].astype(np.uint16)
+    part = (slice(y0 - dy, y1 - dy), slice(x0 - dx, x1 - dx))
+    region = premultiplied[part] + (region * (255 - alpha[part]) + 127) // 255
+    base[y0:y1, x0:x1] = np.minimum(region, 255)
+
+
+@functools.lru_cache(maxsize=None)
+def sky_gradient(width: int, height: int) -> np.ndarray:
+    """ 空（3 行分）の縦グラデーション 1 キー幅分（(3 × height) × width × 3 の配列）。 """
+    t = np.linspace(0.0, 1.0, 3 * height)[:, None, None]
+    colors = (1 - t) * np.array(SKY_TOP) + t * np.array(SKY_BOTTOM)
+    return np.repeat(colors, width, axis=1).round().astype(np.uint8)
+
+
+@functools.lru_cache(maxsize=None)
+def sky_layer(width: int, height: int) -> np.ndarray:
     """
-    指定キーの表示状態が前回と異なる場合のみ再描画します。
-    new_state: (text, font_size, background_color)
+    雲を重ねた空の帯画像（(3 × height) × ((SKY_PERIOD + 1) × width) × 3 の配列）。
+    末尾には先頭の 1 キー分を付け、どの切り出し位置でも 1 キー幅を切り出せるようにします。
     """
-    global last_key_state
-    if last_key_state.get(key) == new_state:
-        return  # 変化がなければ更新不要
-    text, font_size, background_color = new_state
-    img = create_text_image(
-        text,
-        key_width,
-        key_height,
-        font_size=font_size,
-        background_color=background_color,
-    )
-    deck.set_key_image(key, PILHelper.to_native_format(deck, img))
-    last_key_state[key] = new_state
+    layer = np.tile(sky_gradient(width, height), (1, SKY_PERIOD, 1))
+    cloud = matte_sprite("☁️", width, height, font_size=30)
+    for x, row in CLOUDS:
+        left = int(round(x * width))
+        blend(layer[row * height:(row + 1) * height, left:left + width], cloud, 0, 0)
+    return np.concatenate([layer, layer[:, :width]], axis=1)
+
+
+@functools.lru_cache(maxsize=None)
+def sea_layer(width: int, height: int) -> np.ndarray:
+    """ 海面の帯画像（1 キー分の 🌊 を 2 つ並べたもの。height × (2 × width) × 3 の配列）。 """
+    tile = np.asarray(create_text_image("🌊", width, height, font_size=40,
+                                        background_color=SEA_COLOR).convert("RGB"))
+    return np.concatenate([tile, tile], axis=1)
+
+
+@functools.lru_cache(maxsize=None)
+def fish_sprite(width: int, height: int) -> tuple:
+    return matte_sprite("🐟", width, height, font_size=40)
+
+
+# --- 描画指定（spec）から画像を生成 ---
+def render_spec(spec: tuple, width: int, height: int) -> Image.Image:
+    """
+    spec: (text, font_size, background_color)
+    ("sky", 行, 切り出し位置, 魚の位置) は空の帯画像（切り出し位置が None なら雲のない空）、
+    ("sea", 切り出し位置, 魚の位置) は海面の帯画像を切り出したキー画像です。
+    魚の位置はキーの左上から見た魚の画像の左上（ピクセル）で、キーにかからなければ None です。
+    """
+    if spec[0] == "sky":
+        _, row, offset, fish = spec
+        rows = slice(row * height, (row + 1) * height)
+        if offset is None:
+            tile = sky_gradient(width, height)[rows].copy()
+        else:
+            tile = sky_layer(width, height)[rows, offset:offset + width].copy()
+    elif spec[0] == "sea":
+        _, offset, fish = spec
+        tile = sea_layer(width, height)[:, offset:offset + width].copy()
+    else:
+        text, font_size, background_color = spec
+        return create_text_image(text, width, height, font_size=font_size, background_color=background_color)
+    if fish is not None:
+        blend(tile, fish_sprite(width, height), *fish)
+    return Image.fromarray(tile)
+
+
+def sky_offset(row: int, left: int, width: int):
+    """
+    空の層の切り出し位置（帯の左端からのピクセル）を返します。切り出す範囲に雲がなければ None を返します。
+    """
+    period = SKY_PERIOD * width
+    offset = left % period
+    for x, cloud_row in CLOUDS:
+        if cloud_row != row:
+            continue
+        cloud_left = int(round(x * width))
+        # 帯の末尾に付けた先頭の 1 キー分にかかる雲も調べる
+        for start in (cloud_left, cloud_left + period):
+            if start < offset + width and offset < start + width:
+                return offset
+    return None
 
 
 # --- ゲーム初期化 ---
 def init_game() -> None:
-    global fish_x, fish_alt, game_active, glide_flag, last_update_time, last_key_state
-    fish_x = 0
-    fish_alt = 0
+    global fish_x, fish_alt, game_active, glide_until
+    fish_x = 0.0
+    fish_alt = 0.0
     game_active = False
-    glide_flag = False
-    last_update_time = time.time()
-    last_key_state = {}
+    glide_until = 0.0
 
 
-# --- ゲーム状態更新 ---
-def update_game_state() -> None:
-    global fish_x, fish_alt, game_active, glide_flag, last_update_time
+# --- ゲーム状態更新（FRAME_INTERVAL ごと） ---
+def update_game_state(now: float) -> bool:
+    """
+    魚を 1 フレーム分進めます。ゲーム中（着水前）なら True を返します。
+    """
+    global fish_x, fish_alt, game_active
     if not game_active:
-        return
-    current_time = time.time()
-    if current_time - last_update_time >= update_interval:
-        last_update_time = current_time
-        fish_x += 1  # 前進
-        # グライド操作がなければ高度低下（重力）
-        if not glide_flag:
-            if fish_alt > 0:
-                fish_alt -= 1
-        # 今回のグライド操作は消費済み
-        glide_flag = False
-        # 着水（高度 0 になったら）でゲームオーバー
-        if fish_alt == 0:
-            game_active = False
-
-
-# --- 画面更新 ---
-def update_display(deck, key_width: int, key_height: int) -> None:
+        return False
+    fish_x += FISH_SPEED * FRAME_INTERVAL  # 前進
+    # グライド中でなければ高度低下（重力）
+    if now >= glide_until:
+        fish_alt = max(fish_alt - SINK_SPEED * FRAME_INTERVAL, 0.0)
+    # 着水（高度 0 になったら）でゲームオーバー
+    if fish_alt == 0:
+        game_active = False
+    return game_active
+
+
+# --- 画面（各キーの spec） ---
+def frame() -> dict:
+    specs = {}
     # ゲームオーバーの場合（ジャンプ後に着水したら）は全体に「💦」を表示
     if not game_active and fish_x > 0:
         for key in GRID_KEYS.values():
-            update_key(deck, key, ("💦", 40, (0, 0, 255)), key_width, key_height)
-        update_key(deck, JUMP_KEYS[0], ("Jump", 15, (0, 0, 0)), key_width, key_height)
-        update_key(deck, GLIDE_KEY, ("Glide", 15, (255, 165, 0)), key_width, key_height)
-        update_key(
-            deck, RESET_KEY, (f"Score:{fish_x}", 15, (255, 0, 0)), key_width, key_height
-        )
-        return
-
-    # 通常のゲーム盤描画（水平スクロール表示）
-    # 表示するウィンドウの開始 x 座標：魚が右へ進んだら右シフト
-    window_start = 0 if fish_x < 2 else fish_x - 1
-    # 魚の表示位置（ウィンドウ内の相対座標）
-    fish_rel_x = fish_x - window_start
-    # 高度に応じた表示行: 高度 3 → row0, 高度 2 → row1, 高度 1 → row2, 0 → row3（海面）
-    fish_disp_row = 3 - fish_alt if fish_alt <= 3 else 0
-
-    for row in range(4):
-        for col in range(4):
-            key = GRID_KEYS[(row, col)]
-            # 下段は海面（青）
-            if row == 3:
-                cell_state = ("🌊", 40, (0, 0, 255))
-            else:
-                # 空中は青空
-                cell_state = ("", 40, (135, 206, 250))
-            # 魚の表示位置と一致する場合は魚の絵文字を表示
-            if col == fish_rel_x and row == fish_disp_row:
-                cell_state = ("🐟", 40, (255, 215, 0))
-            update_key(deck, key, cell_state, key_width, key_height)
-
-    # 操作キーの更新
-    update_key(deck, JUMP_KEYS[0], ("Jump", 15, (0, 0, 0)), key_width, key_height)
-    update_key(deck, JUMP_KEYS[1], ("Jump", 15, (0, 0, 0)), key_width, key_height)
-    update_key(deck, GLIDE_KEY, ("Glide", 15, (255, 165, 0)), key_width, key_height)
-    update_key(deck, RESET_KEY, ("Reset", 15, (255, 69, 0)), key_width, key_height)
-
-
-# --- キー操作コールバック ---
-def key_callback(deck, key, state_pressed) -> None:
-    global game_active, fish_alt, glide_flag, fish_x
-    if not state_pressed:
-        return
+            specs[key] = ("💦", 40, (0, 0, 255))
+        specs[JUMP_KEYS[0]] = ("Jump", 15, (0, 0, 0))
+        specs[JUMP_KEYS[1]] = ("Jump", 15, (0, 0, 0))
+        specs[GLIDE_KEY] = ("Glide", 15, (255, 165, 0))
+        specs[RESET_KEY] = (f"Score:{int(fish_x)}", 15, (255, 0, 0))
+        return specs
+
+    # 通常のゲーム盤描画（水平スクロール表示、ピクセル単位）
+    width, height = engine.width, engine.height
+    # 表示する窓の左端：魚が 1 キー分より右へ進んだら、魚が左から 2 列目に留まるようにスクロール
+    camera = int(round(max(fish_x - 1, 0.0) * width))
+    # 魚の画像の左上（窓の左上から）。高度 3 → row0, 高度 0 → row3（海面）
+    fish_left = int(round(fish_x * width)) - camera
+    fish_top = int(round((3 - min(fish_alt, 3.0)) * height))
+    sky_left = int(camera * SKY_PARALLAX)
+
+    for (row, col), key in GRID_KEYS.items():
+        dx, dy = fish_left - col * width, fish_top - row * height
+        fish = (dx, dy) if -width < dx < width and -height < dy < height else None
+        if row == 3:
+            # 下段は海面（魚と同じ速さで流れる）
+            specs[key] = ("sea", (camera + col * width) % width, fish)
+        else:
+            # 空中は青空（ゆっくり流れる）
+            specs[key] = ("sky", row, sky_offset(row, sky_left + col * width, width), fish)
+
+    # 操作キー
+    specs[JUMP_KEYS[0]] = ("Jump", 15, (0, 0, 0))
+    specs[JUMP_KEYS[1]] = ("Jump", 15, (0, 0, 0))
+    specs[GLIDE_KEY] = ("Glide", 15, (255, 165, 0))
+    specs[RESET_KEY] = ("Reset", 15, (255, 69, 0))
+    return specs
+
+
+# --- キー操作 ---
+def on_key(key: int) -> None:
+    global game_active, fish_alt, glide_until
     # リセットキーでゲーム初期化
     if key == RESET_KEY:
         init_game()
-        update_display(deck, w, h)
         return
     # ジャンプキー（矢印キー）：ゲーム未開始の場合にジャンプ開始
     if key in JUMP_KEYS:
         if not game_active and fish_x == 0:
             game_active = True
-            fish_alt = 3  # 最大高度からスタート
-        update_display(deck, w, h)
+            fish_alt = 3.0  # 最大高度からスタート
         return
     # スペースキー（グライド操作）
     if key == GLIDE_KEY:
         if game_active:
-            glide_flag = True
-        update_display(deck, w, h)
+            glide_until = engine.now + GLIDE_SECONDS
         return
 
 
 # --- メインループ ---
 def main() -> None:
+    global engine
     deck = DeviceManager().enumerate()[0]
     deck.open()
     deck.reset()
-    global w, h
-    key_format = deck.key_image_format()
-    w, h = key_format["size"]
+    render_cache = DiskRenderCache.from_env(deck, code_version(os.path.abspath(__file__)))
 
     init_game()
-    update_display(deck, w, h)
-    deck.set_key_callback(key_callback)
-
+    atlas = SpriteAtlas(deck, render_spec, cache=render_cache).build(SPRITES)
+    # 帯画像の切り出しは組み合わせが多いのでディスクにはキャッシュしない（メモリの LRU のみ）
+    engine = GameEngine(deck, render_spec, step=FRAME_INTERVAL, atlas=atlas)
     try:
-        while True:
-            update_game_state()
-            update_display(deck, w, h)
-            time.sleep(0.1)
+        engine.run(frame, on_key=on_key, update=update_game_state)
     except KeyboardInterrupt:
         deck.reset()
         deck.close()
@@ -4,79 +4,77 @@
 Stream Deck を利用した簡易版テトリス風ゲーム
 
 【操作方法】
-- ゲーム画面は 4×4 グリッドで遊ぶシンプルな落ちものパズルです。
-- 上部からブロック（🟥🟦🟩🟨）がランダムに落ちてきます。
-- 矢印キー（キー 4, 5）で左右に移動、スペースキー（キー 13）で回転します。
+- ゲーム画面は 4×4 グリッド（環境変数 STREAMDECK_BOARD で変更可）で遊ぶ落ちものパズルです。
+- 上部から 7 種類のテトロミノ（I, O, T, S, Z, J, L）がランダムに落ちてきます。
+- 矢印キー（盤面の右隣のキー）で左右に移動、回転キー（その下）で回転します。
 - 横一列が揃うと消えて得点が入ります。
 - 積み上がったブロックが上端に達するとゲームオーバーです。
-- リセットキー（キー 31）でゲームをいつでも初期化できます。
+- リセットキー（右下のキー）でゲームをいつでも初期化できます。
+
+盤面の判定はビットボードエンジン（tetromino.py）で行います。
+盤面の右に操作キーを 2 列置くので、XL 1 台で遊べるのは 6×4 までです。
+STREAMDECK_BOARD=8x4 のようにそれより広げると、操作キーの列が収まるだけの台数のデッキを横に並べて使います（deckspan.py）。
 """
 
-import time
-import io
+import math
+import os
 import random
+import sys
+import io
 
-import gi
-
-gi.require_version("Pango", "1.0")
-gi.require_version("PangoCairo", "1.0")
-from gi.repository import Pango, PangoCairo
-
-import cairo
 from PIL import Image
 from StreamDeck.DeviceManager import DeviceManager
-from StreamDeck.ImageHelpers import PILHelper
+
+from deckspan import DeckSpan
+from engine import GameEngine
+from sprites import SpriteAtlas
+from tetromino import Board
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from deckkit.render_cache import DiskRenderCache, code_version
+from deckkit.rendering import Pango, PangoCairo, cairo
+
+# --- 盤面の大きさ（列×行） ---
+BOARD_SIZE = os.environ.get("STREAMDECK_BOARD", "4x4")
 
 # --- キー定義 ---
-# ゲーム盤（4×4グリッド）のキー番号
-MEMORY_KEYS = [0, 1, 2, 3, 8, 9, 10, 11, 16, 17, 18, 19, 24, 25, 26, 27]
-
-GRID_KEYS = {
-    (0, 0): 0,
-    (0, 1): 1,
-    (0, 2): 2,
-    (0, 3): 3,
-    (1, 0): 8,
-    (1, 1): 9,
-    (1, 2): 10,
-    (1, 3): 11,
-    (2, 0): 16,
-    (2, 1): 17,
-    (2, 2): 18,
-    (2, 3): 19,
-    (3, 0): 24,
-    (3, 1): 25,
-    (3, 2): 26,
-    (3, 3): 27,
+# ゲーム盤のキー番号（(行, 列) -> キー番号）と操作キー。デッキの列数に合わせて main() で決めます。
+# 4×4 の盤面を XL 1 台で遊ぶ場合は従来どおり 左:4、右:5、回転:13、リセット:31 になります。
+GRID_KEYS = {}
+LEFT_KEY = None     # 左移動
+RIGHT_KEY = None    # 右移動
+ROTATE_KEY = None   # 回転
+RESET_KEY = None    # ゲームリセット
+
+# ブロックの種類ごとのテキスト表現
+BLOCK_TEXTS = {
+    "I": "🟦",
+    "O": "🟨",
+    "T": "🟪",
+    "S": "🟩",
+    "Z": "🟥",
+    "J": "🟫",
+    "L": "🟧",
 }
 
-# 操作キー
-LEFT_KEY = 4      # 左移動
-RIGHT_KEY = 5     # 右移動
-ROTATE_KEY = 13   # 回転（スペースキー）
-RESET_KEY = 31    # ゲームリセット
-
-# ブロックの色とテキスト表現
-BLOCK_TYPES = [
-    ("🟥", (255, 0, 0)),     # 赤
-    ("🟦", (0, 0, 255)),     # 青
-    ("🟩", (0, 255, 0)),     # 緑
-    ("🟨", (255, 255, 0)),   # 黄
+# 起動時にまとめて描画しておく表示内容（text, font_size, background_color）
+# スコア表示（Score:N）は値ごとに異なるため、表示時に描画します。
+SPRITES = [(block_text, 40, (30, 30, 30)) for block_text in BLOCK_TEXTS.values()] + [
+    ("", 40, (0, 0, 0)),  # 空きマス
+    ("🔴", 40, (0, 0, 0)),  # ゲームオーバー
+    ("←", 25, (0, 0, 0)),
+    ("→", 25, (0, 0, 0)),
+    ("⟳", 25, (255, 165, 0)),
+    ("←", 25, (50, 50, 50)),
+    ("→", 25, (50, 50, 50)),
+    ("⟳", 25, (50, 50, 50)),
 ]
 
 # --- ゲーム状態のグローバル変数 ---
-game_board = []           # ゲームボード
-current_block = None      # 現在操作中のブロックの種類
-current_pos = [0, 0]      # 操作中ブロックの座標 [行, 列]
-game_active = True        # ゲーム進行中フラグ
-score = 0                 # スコア
+board = None              # 盤面（tetromino.Board）
 
-# 自動更新の間隔（秒）
+# 自動落下の間隔（秒）。ゲームエンジンの tick 間隔として使います。
 update_interval = 0.5
-last_update_time = 0
-
-# 差分更新用キャッシュ（key 番号 → (text, font_size, background_color)）
-last_key_state = {}
 
 
 # --- 画像生成ヘルパー ---
@@ -115,237 +113,141 @@ def create_text_image(
     return Image.open(output)
 
 
-# --- 差分更新用ヘルパー ---
-def update_key(deck, key, new_state, key_width, key_height):
+# --- 描画指定（spec）から画像を生成 ---
+def render_spec(spec: tuple, width: int, height: int) -> Image.Image:
     """
-    指定キーの表示状態が前回と異なる場合のみ再描画します。
-    new_state: (text, font_size, background_color)
+    spec: (text, font_size, background_color)
     """
-    global last_key_state
-    if last_key_state.get(key) == new_state:
-        return  # 変化がなければ更新不要
-    text, font_size, background_color = new_state
-    img = create_text_image(
-        text,
-        key_width,
-        key_height,
-        font_size=font_size,
-        background_color=background_color,
-    )
-    deck.set_key_image(key, PILHelper.to_native_format(deck, img))
-    last_key_state[key] = new_state
+    text, font_size, background_color = spec
+    return create_text_image(text, width, height, font_size=font_size, background_color=background_color)
+
+
+# --- 盤面の大きさ ---
+def parse_board_size(value: str) -> tuple:
+    """
+    "列x行"（例: "4x4"、"8x4"）を (列数, 行数) に変換します。
+    """
+    try:
+        columns, rows = (int(part) for part in value.lower().split("x"))
+    except ValueError:
+        raise ValueError(f"STREAMDECK_BOARD must look like '4x4' (got {value!r})") from None
+    return columns, rows
+
+
+# --- キー配置 ---
+def init_layout(columns: int, rows: int, deck_columns: int, deck_rows: int) -> None:
+    """
+    盤面を左上に置き、盤面の右隣に ← →、→ の下に回転、右下にリセットを配置します。
+    deck_columns はデッキ（DeckSpan の場合は全デッキの合計）の列数です。
+    """
+    global GRID_KEYS, LEFT_KEY, RIGHT_KEY, ROTATE_KEY, RESET_KEY
+    GRID_KEYS = {(row, col): row * deck_columns + col for row in range(rows) for col in range(columns)}
+    LEFT_KEY = columns
+    RIGHT_KEY = columns + 1
+    ROTATE_KEY = deck_columns + columns + 1
+    RESET_KEY = deck_rows * deck_columns - 1
 
 
 # --- ゲーム初期化 ---
 def init_game() -> None:
-    global game_board, current_block, current_pos, game_active, score, last_update_time, last_key_state
-    # 空のゲームボードを作成（4×4）
-    game_board = [[None for _ in range(4)] for _ in range(4)]
-    # 新しいブロックを生成
-    spawn_new_block()
-    game_active = True
-    score = 0
-    last_update_time = time.time()
-    last_key_state = {}
-
-
-# --- 新しいブロックの生成 ---
-def spawn_new_block() -> None:
-    global current_block, current_pos
-    # ランダムなブロックタイプを選択
-    current_block = random.choice(BLOCK_TYPES)
-    # 最上段の中央から開始
-    current_pos = [0, 1]
-
-
-# --- ブロックの移動 ---
-def move_block(direction):
-    global current_pos
-    new_pos = current_pos.copy()
-    
-    if direction == "left":
-        new_pos[1] = max(0, current_pos[1] - 1)
-    elif direction == "right":
-        new_pos[1] = min(3, current_pos[1] + 1)
-    
-    # 移動先が空いているか確認
-    if is_valid_position(new_pos):
-        current_pos = new_pos
-        return True
-    return False
-
-
-# --- ブロックの回転（簡易実装、回転による変形なし） ---
-def rotate_block():
-    # この単純なバージョンでは回転効果はありません（ただ見栄えのため）
-    return True
-
-
-# --- 位置の有効性チェック ---
-def is_valid_position(pos):
-    row, col = pos
-    # 範囲内かチェック
-    if not (0 <= row < 4 and 0 <= col < 4):
-        return False
-    # 既存ブロックとの衝突チェック
-    if game_board[row][col] is not None:
+    board.reset()
+
+
+# --- ゲーム状態更新（update_interval ごと） ---
+def update_game_state(now: float) -> bool:
+    """
+    ブロックを 1 段落とします（落とせなければ固定）。ゲーム中なら True を返します。
+    """
+    if board.over:
         return False
-    return True
-
-
-# --- ブロックの固定 ---
-def lock_block():
-    global game_board, current_block
-    row, col = current_pos
-    game_board[row][col] = current_block
-    # ライン消去チェック
-    check_lines()
-    # ゲームオーバーチェック
-    if check_game_over():
-        return
-    # 新しいブロックを生成
-    spawn_new_block()
-
-
-# --- ラインが揃ったかチェック ---
-def check_lines():
-    global game_board, score
-    for row in range(4):
-        if all(cell is not None for cell in game_board[row]):
-            # ラインが揃った場合、その行を削除
-            score += 10
-            # 上の行を全て1つ下に移動
-            for r in range(row, 0, -1):
-                game_board[r] = game_board[r-1].copy()
-            # 最上段は空に
-            game_board[0] = [None for _ in range(4)]
-
-
-# --- ゲームオーバーチェック ---
-def check_game_over():
-    global game_active
-    # 最上段にブロックがあればゲームオーバー
-    if any(cell is not None for cell in game_board[0]):
-        game_active = False
-        return True
-    return False
-
-
-# --- ゲーム状態更新 ---
-def update_game_state() -> None:
-    global last_update_time, current_pos
-    if not game_active:
-        return
-        
-    current_time = time.time()
-    if current_time - last_update_time >= update_interval:
-        last_update_time = current_time
-        
-        # ブロックを下に移動
-        new_pos = [current_pos[0] + 1, current_pos[1]]
-        
-        # 移動先が有効なら移動
-        if current_pos[0] < 3 and is_valid_position(new_pos):
-            current_pos = new_pos
-        else:
-            # 移動できない場合は固定
-            lock_block()
+    return board.tick()
 
 
-# --- 画面更新 ---
-def update_display(deck, key_width: int, key_height: int) -> None:
+# --- 画面（各キーの spec） ---
+def frame() -> dict:
+    specs = {}
     # ゲームオーバーの場合は全体に「🔴」を表示
-    if not game_active:
+    if board.over:
         for key in GRID_KEYS.values():
-            update_key(deck, key, ("🔴", 40, (0, 0, 0)), key_width, key_height)
-        update_key(deck, LEFT_KEY, ("←", 25, (50, 50, 50)), key_width, key_height)
-        update_key(deck, RIGHT_KEY, ("→", 25, (50, 50, 50)), key_width, key_height)
-        update_key(deck, ROTATE_KEY, ("⟳", 25, (50, 50, 50)), key_width, key_height)
-        update_key(
-            deck, RESET_KEY, (f"Score:{score}", 15, (255, 0, 0)), key_width, key_height
-        )
-        return
+            specs[key] = ("🔴", 40, (0, 0, 0))
+        specs[LEFT_KEY] = ("←", 25, (50, 50, 50))
+        specs[RIGHT_KEY] = ("→", 25, (50, 50, 50))
+        specs[ROTATE_KEY] = ("⟳", 25, (50, 50, 50))
+        specs[RESET_KEY] = (f"Score:{board.score}", 15, (255, 0, 0))
+        return specs
+
+    # 現在のゲームボード（操作中のブロックを含む）を表示
+    cells = board.cells()
+    for (row, col), key in GRID_KEYS.items():
+        piece = cells[row][col]
+        if piece is not None:
+            specs[key] = (BLOCK_TEXTS[piece], 40, (30, 30, 30))
+        # 空マスの表示
+        else:
+            specs[key] = ("", 40, (0, 0, 0))
 
-    # 現在のゲームボードを表示
-    for row in range(4):
-        for col in range(4):
-            key = GRID_KEYS[(row, col)]
-            # 固定ブロックの表示
-            if game_board[row][col] is not None:
-                block_text, block_color = game_board[row][col]
-                update_key(deck, key, (block_text, 40, (30, 30, 30)), key_width, key_height)
-            # 現在操作中のブロックの表示
-            elif row == current_pos[0] and col == current_pos[1]:
-                block_text, block_color = current_block
-                update_key(deck, key, (block_text, 40, (30, 30, 30)), key_width, key_height)
-            # 空マスの表示
-            else:
-                update_key(deck, key, ("", 40, (0, 0, 0)), key_width, key_height)
-
-    # 操作キーの更新
-    update_key(deck, LEFT_KEY, ("←", 25, (0, 0, 0)), key_width, key_height)
-    update_key(deck, RIGHT_KEY, ("→", 25, (0, 0, 0)), key_width, key_height)
-    update_key(deck, ROTATE_KEY, ("⟳", 25, (255, 165, 0)), key_width, key_height)
-    update_key(deck, RESET_KEY, (f"Score:{score}", 15, (255, 69, 0)), key_width, key_height)
-
-
-# --- キー操作コールバック ---
-def key_callback(deck, key, state_pressed) -> None:
-    global game_active
-    if not state_pressed:
-        return
-        
+    # 操作キー
+    specs[LEFT_KEY] = ("←", 25, (0, 0, 0))
+    specs[RIGHT_KEY] = ("→", 25, (0, 0, 0))
+    specs[ROTATE_KEY] = ("⟳", 25, (255, 165, 0))
+    specs[RESET_KEY] = (f"Score:{board.score}", 15, (255, 69, 0))
+    return specs
+
+
+# --- キー操作 ---
+def on_key(key: int) -> None:
     # リセットキーでゲーム初期化
     if key == RESET_KEY:
         init_game()
-        update_display(deck, w, h)
         return
-        
+
     # ゲームが終了していたら操作を受け付けない
-    if not game_active:
+    if board.over:
         return
-        
+
     # 左移動
     if key == LEFT_KEY:
-        move_block("left")
-        update_display(deck, w, h)
+        board.move(-1)
         return
-        
+
     # 右移動
     if key == RIGHT_KEY:
-        move_block("right")
-        update_display(deck, w, h)
+        board.move(1)
         return
-        
+
     # 回転
     if key == ROTATE_KEY:
-        rotate_block()
-        update_display(deck, w, h)
+        board.rotate()
         return
 
 
 # --- メインループ ---
 def main() -> None:
-    deck = DeviceManager().enumerate()[0]
+    global board
+    columns, rows = parse_board_size(BOARD_SIZE)
+    decks = DeviceManager().enumerate()
+    deck_rows, deck_columns = decks[0].key_layout()
+    # 盤面の右に操作キー 2 列分が収まるだけのデッキを横に並べる
+    needed = math.ceil((columns + 2) / deck_columns)
+    if rows > deck_rows or rows < 2 or len(decks) < needed:
+        print(f"Board {columns}x{rows} needs {needed} deck(s) with at least {rows} rows "
+              f"({len(decks)} connected, {deck_rows} rows each).")
+        return
+    deck = DeckSpan(decks[:needed]) if needed > 1 else decks[0]
     deck.open()
     deck.reset()
-    global w, h
-    key_format = deck.key_image_format()
-    w, h = key_format["size"]
-
-    init_game()
-    update_display(deck, w, h)
-    deck.set_key_callback(key_callback)
+    render_cache = DiskRenderCache.from_env(deck, code_version(os.path.abspath(__file__)))
 
+    init_layout(columns, rows, deck_columns * needed, deck_rows)
+    board = Board(columns, rows, seed=random.getrandbits(32))
+    atlas = SpriteAtlas(deck, render_spec, cache=render_cache).build(SPRITES)
+    engine = GameEngine(deck, render_spec, step=update_interval, cache=render_cache, atlas=atlas)
     try:
-        while True:
-            update_game_state()
-            update_display(deck, w, h)
-            time.sleep(0.1)
+        engine.run(frame, on_key=on_key, update=update_game_state)
     except KeyboardInterrupt:
         deck.reset()
         deck.close()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
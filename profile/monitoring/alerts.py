@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+しきい値アラート（ヒステリシス付き）とキーの点滅
+
+タイル設定の "alert" でしきい値を指定すると、値がしきい値を超えている間そのキーを点滅させます。
+
+    {"key": 0, "source": "cpu", "template": "CPU:\\n{value}%", "alert": {"above": 90, "clear": 75}}
+
+- above（または below）を超えたら発報し、clear まで戻ったら解除します（しきい値付近でのばたつき防止）。
+- 点滅用の画像（背景を警告色にしたもの）は表示内容ごとに 1 度だけ描画し、ネイティブ形式でキャッシュします。
+- 点滅の切り替えではキャッシュ済みの 2 枚を書き込むだけで、描画は行いません。
+  発報中のキー以外には書き込みません。
+"""
+
+import time
+
+DEFAULT_ALERT_COLOR = (200, 0, 0)
+
+
+class Threshold:
+    """
+    ヒステリシス付きのしきい値。
+
+    Args:
+        above (float): この値以上で発報（below と排他）。
+        below (float): この値以下で発報。
+        clear (float): 解除する値（省略時はしきい値と同じ）。
+        color (tuple): 点滅時の背景色 (R, G, B)。
+    """
+
+    def __init__(self, above: float = None, below: float = None, clear: float = None,
+                 color=DEFAULT_ALERT_COLOR):
+        if (above is None) == (below is None):
+            raise ValueError("alert needs exactly one of 'above' or 'below'")
+        self.above = above
+        self.below = below
+        if clear is None:
+            clear = above if above is not None else below
+        self.clear = clear
+        self.color = tuple(color)
+        self.active = False
+
+    def update(self, value: float) -> bool:
+        """ 値を取り込み、発報中かどうかを返します。 """
+        if self.above is not None:
+            if self.active:
+                self.active = value > self.clear
+            else:
+                self.active = value >= self.above
+        else:
+            if self.active:
+                self.active = value < self.clear
+            else:
+                self.active = value <= self.below
+        return self.active
+
+
+class AlertLayer:
+    """
+    発報中のタイルを管理し、点滅の位相に応じて表示する画像を選びます。
+
+    Args:
+        period (float): 点滅の半周期（秒）。
+    """
+
+    def __init__(self, period: float = 0.5):
+        self.period = period
+        self.phase = 0
+        self.active = {}   # id(tile) -> tile
+        self._flash = {}   # id(tile) -> (state, {key: 点滅用のネイティブ形式の画像})
+
+    def check(self, tile, values: dict) -> bool:
+        """ タイルのしきい値を評価し、発報状態が変わったら True を返します。 """
+        threshold = getattr(tile, "threshold", None)
+        if threshold is None:
+            return False
+        was = id(tile) in self.active
+        if threshold.update(tile.value(values)):
+            self.active[id(tile)] = tile
+        else:
+            self.active.pop(id(tile), None)
+            self._flash.pop(id(tile), None)
+        return was != (id(tile) in self.active)
+
+    def frames(self, tile, state, normal: dict, renderer) -> dict:
+        """ 現在の位相でタイルに表示すべき {キー番号: 画像} を返します。 """
+        if id(tile) not in self.active or self.phase == 0:
+            return normal
+        cached = self._flash.get(id(tile))
+        if cached is None or cached[0] != state:
+            # 表示内容ごとに 1 度だけ描画してキャッシュ
+            cached = (state, tile.render(renderer, state, background=tile.threshold.color))
+            self._flash[id(tile)] = cached
+        return cached[1]
+
+    def advance(self, now: float = None) -> bool:
+        """ 点滅の位相を進め、変わったら True を返します。 """
+        now = time.monotonic() if now is None else now
+        phase = int(now / self.period) % 2
+        if phase == self.phase:
+            return False
+        self.phase = phase
+        return True
+
+    def next_toggle(self, now: float) -> float:
+        """ 次に位相が変わる時刻を返します。 """
+        return (int(now / self.period) + 1) * self.period
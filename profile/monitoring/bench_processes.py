@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+上位プロセス表示のベンチマーク
+
+psutil.process_iter() で毎回全プロセスを取得する方法と、ProcessTable による差分更新の
+1 tick あたりの所要時間を比較します。--spawn で待機するだけの子プロセスを起動し、
+プロセス数の多いホスト（5000 プロセスなど）を再現できます。
+
+例:
+    python profile/monitoring/bench_processes.py --spawn 5000 --ticks 10
+"""
+
+import argparse
+import heapq
+import subprocess
+import sys
+import time
+
+import psutil
+
+from processes import ProcessTable, top
+
+
+def naive_tick(n: int) -> list:
+    """ 比較用: 毎回 process_iter で全プロセスを作り直して上位 n 件を選びます。 """
+    rows = []
+    for proc in psutil.process_iter(["pid", "name", "cpu_percent", "memory_info"]):
+        info = proc.info
+        if info["memory_info"] is None:
+            continue
+        rows.append((info["cpu_percent"] or 0.0, info["pid"], info["name"]))
+    return heapq.nlargest(n, rows)
+
+
+def spawn_idle(count: int) -> list:
+    """ 待機するだけの子プロセスを count 個起動します。 """
+    children = []
+    for _ in range(count):
+        children.append(subprocess.Popen(["sleep", "3600"] if sys.platform != "win32" else
+                                         [sys.executable, "-c", "import time; time.sleep(3600)"]))
+    return children
+
+
+def measure(label: str, func, ticks: int) -> None:
+    func()  # 初回（プロセスの登録など）は別に計測
+    samples = []
+    for _ in range(ticks):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    print(f"{label:<18} median {samples[len(samples) // 2] * 1000:8.2f} ms/tick   "
+          f"max {samples[-1] * 1000:8.2f} ms/tick")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--spawn", type=int, default=0, help="起動する待機用の子プロセス数")
+    parser.add_argument("--ticks", type=int, default=10, help="計測する tick 数")
+    parser.add_argument("-n", type=int, default=3, help="上位何件を選ぶか")
+    args = parser.parse_args()
+
+    children = spawn_idle(args.spawn)
+    try:
+        print(f"processes: {len(psutil.pids())}")
+        measure("process_iter", lambda: naive_tick(args.n), args.ticks)
+        table = ProcessTable()
+        measure("ProcessTable", lambda: top(table.refresh(), args.n), args.ticks)
+        cpu_table = ProcessTable(fields=("cpu",))
+        measure("ProcessTable(cpu)", lambda: top(cpu_table.refresh(), args.n), args.ticks)
+    finally:
+        for child in children:
+            child.kill()
+        for child in children:
+            child.wait()
+
+
+if __name__ == "__main__":
+    main()
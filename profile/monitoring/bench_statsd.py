@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+statsd 受信のベンチマーク
+
+1. 解析・集計のみ: 作成済みのデータグラムを StatsdAggregator.ingest にまとめて渡したときの処理速度。
+2. UDP 経由: 別プロセスから UDP で送信し、StatsdListener が 1 秒あたりに受信・集計できた件数。
+
+例:
+    python profile/monitoring/bench_statsd.py --seconds 5
+"""
+
+import argparse
+import multiprocessing
+import socket
+import time
+
+from statsd_listener import BATCH, StatsdAggregator, StatsdListener
+
+SAMPLE_LINES = [
+    b"jobs.done:1|c",
+    b"jobs.failed:1|c|@0.1",
+    b"queue.depth:42|g",
+    b"api.latency:12.5|ms",
+    b"cache.hit:1|c",
+    b"workers:+1|g",
+]
+
+
+def bench_ingest(count: int) -> None:
+    datagrams = [SAMPLE_LINES[i % len(SAMPLE_LINES)] for i in range(count)]
+    aggregator = StatsdAggregator()
+    start = time.perf_counter()
+    for i in range(0, count, BATCH):
+        aggregator.ingest(b"\n".join(datagrams[i:i + BATCH]))
+    elapsed = time.perf_counter() - start
+    print(f"ingest only : {count / elapsed:12,.0f} datagrams/s")
+
+
+def _sender(port: int, seconds: float) -> None:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    address = ("127.0.0.1", port)
+    deadline = time.monotonic() + seconds
+    i = 0
+    while time.monotonic() < deadline:
+        for _ in range(1000):
+            sock.sendto(SAMPLE_LINES[i % len(SAMPLE_LINES)], address)
+            i += 1
+
+
+def bench_udp(seconds: float, senders: int) -> None:
+    listener = StatsdListener(port=0, flush_interval=0.5)
+    listener.start()
+    processes = [multiprocessing.Process(target=_sender, args=(listener.port, seconds)) for _ in range(senders)]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - start
+    time.sleep(0.2)
+    listener.stop()
+    print(f"udp received: {listener.datagrams / elapsed:12,.0f} datagrams/s "
+          f"({listener.datagrams / max(listener.batches, 1):.1f} per batch, "
+          f"{listener.aggregator.errors} errors)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=1_000_000, help="解析のみの計測で使うデータグラム数")
+    parser.add_argument("--seconds", type=float, default=3.0, help="UDP 計測の送信時間（秒）")
+    parser.add_argument("--senders", type=int, default=2, help="送信プロセス数")
+    args = parser.parse_args()
+    bench_ingest(args.count)
+    bench_udp(args.seconds, args.senders)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+バックグラウンドでのメトリクス取得
+
+取得元（dashboard.SOURCES の source, arg の組）ごとに専用のスレッドを立てて定期的に取得し、
+最新値を不変のタプル（Sample）として属性 1 つに代入して公開します。
+描画側は CollectorPool.snapshot() で最新値を読むだけなので、遅い取得元
+（NFS 上の disk_usage など）があっても描画ループが止まることはありません。
+snapshot() は Sample ごと返すので、描画側はタイムスタンプから新しいサンプルが届いたか・遅れているかを判断できます
+（Readings を参照）。
+
+各取得には所要時間を記録し、間隔を超えた場合はログに出力します。
+recorder（metric_log.MetricRecorder）を渡すと、取得した値をすべてファイルに記録します。
+"""
+
+import threading
+import time
+from collections import namedtuple
+
+Sample = namedtuple("Sample", ["value", "timestamp", "duration"])
+
+
+class Readings(dict):
+    """
+    Dashboard がタイルに渡す {(source, arg): 値}。
+
+    Attributes:
+        timestamps (dict): (source, arg) → その値を取得した時刻（Sample.timestamp と同じ時計）。
+        now (float): 読み出した時刻（timestamps と同じ時計。再生時は仮想時刻）。
+    """
+
+    def __init__(self, values=(), timestamps: dict = None, now: float = None):
+        super().__init__(values)
+        self.timestamps = timestamps if timestamps is not None else {}
+        self.now = time.time() if now is None else now
+
+
+class Collector:
+    """
+    1 つの取得元を一定間隔で取得するスレッド。
+
+    Args:
+        name (str): 表示用の名前。
+        func (callable): 取得関数（引数なし）。
+        interval (float): 取得間隔（秒）。
+        on_sample (callable): 取得するたびに Sample を渡して呼び出す関数（省略可）。
+    """
+
+    def __init__(self, name: str, func, interval: float, on_sample=None):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.on_sample = on_sample
+        self.latest = None      # 最新の Sample（代入のみで更新するためロック不要）
+        self.max_duration = 0.0
+        self.count = 0
+        self.errors = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"collector-{name}", daemon=True)
+
+    def _run(self) -> None:
+        next_due = time.monotonic()
+        while not self._stop.is_set():
+            start = time.monotonic()
+            try:
+                value = self.func()
+            except Exception as e:
+                self.errors += 1
+                print(f"Collector {self.name} failed: {e}")
+            else:
+                duration = time.monotonic() - start
+                self.latest = Sample(value, time.time(), duration)
+                if self.on_sample is not None:
+                    self.on_sample(self.latest)
+                self.count += 1
+                self.max_duration = max(self.max_duration, duration)
+                if duration > self.interval:
+                    print(f"Collector {self.name} is slow: {duration:.3f}s (interval {self.interval}s)")
+            next_due += self.interval
+            now = time.monotonic()
+            if next_due < now:
+                next_due = now
+            self._stop.wait(next_due - now)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+class CollectorPool:
+    """
+    (source, arg) ごとの Collector をまとめて管理します。
+
+    Args:
+        sources (dict): source 名 → 取得関数（dashboard.SOURCES）。
+        intervals (dict): (source, arg) → 取得間隔（秒）。
+        recorder: metric_log.MetricRecorder（省略可）。
+    """
+
+    def __init__(self, sources: dict, intervals: dict, recorder=None):
+        self.collectors = {}
+        for (source, arg), interval in intervals.items():
+            func = sources[source]
+            name = source if arg is None else f"{source}:{arg}"
+            on_sample = None
+            if recorder is not None:
+                on_sample = lambda sample, req=(source, arg): recorder.write(req, sample.value, sample.timestamp)
+            self.collectors[(source, arg)] = Collector(name, lambda f=func, a=arg: f(a), interval, on_sample)
+
+    @classmethod
+    def for_tiles(cls, sources: dict, tiles: list, recorder=None):
+        """ タイルが必要とする取得元ごとに、最も短い更新間隔で取得する Pool を作成します。 """
+        intervals = {}
+        for tile in tiles:
+            for req in tile.requires():
+                intervals[req] = min(intervals.get(req, tile.interval), tile.interval)
+        return cls(sources, intervals, recorder=recorder)
+
+    def start(self) -> None:
+        for collector in self.collectors.values():
+            collector.start()
+
+    def stop(self) -> None:
+        for collector in self.collectors.values():
+            collector.stop()
+
+    def snapshot(self) -> dict:
+        """ 取得済みの最新の Sample を {(source, arg): Sample} で返します。ブロックしません。 """
+        samples = {}
+        for req, collector in self.collectors.items():
+            sample = collector.latest
+            if sample is not None:
+                samples[req] = sample
+        return samples
+
+    def now(self) -> float:
+        """ Sample.timestamp と同じ時計での現在時刻。 """
+        return time.time()
+
+    def timings(self) -> dict:
+        """ 取得元ごとの {"last": 直近の所要時間, "max": 最大, "age": 最終取得からの経過秒数} を返します。 """
+        now = time.time()
+        result = {}
+        for collector in self.collectors.values():
+            sample = collector.latest
+            result[collector.name] = {
+                "last": sample.duration if sample else None,
+                "max": collector.max_duration,
+                "age": now - sample.timestamp if sample else None,
+            }
+        return result
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+設定ファイル駆動のモニタリングダッシュボードエンジン
+
+product-01 から利用します。キーごとに「メトリクスの取得元」「更新間隔」「表示形式」を設定で指定し、
+エンジンが以下のようにまとめて処理します。
+
+- 同じ更新間隔のタイルは 1 回の取得処理（psutil 呼び出し）にまとめ、同じ取得元は 1 度だけ呼び出します。
+- タイルごとに表示内容（フォーマット後の文字列など）を前回と比較し、変化したキーだけを描画・書き込みします。
+- collectors（collectors.CollectorPool）を渡すと、取得は別スレッドで行い、描画側は最新値を読むだけになります。
+
+設定例（JSON の場合も同じ形式）:
+    [
+        {"key": 0, "source": "cpu", "template": "CPU:\\n{value}%", "background": [0, 0, 128]},
+        {"key": 1, "source": "memory", "field": "percent", "template": "Mem:\\n{value}%", "interval": 2},
+        {"key": 2, "source": "disk", "arg": "/", "field": "percent", "template": "Disk:\\n{value}%"},
+        {"key": 3, "type": "sparkline", "source": "cpu", "samples": 120, "template": "CPU {value}%"},
+        {"key": 4, "source": "statsd", "field": "jobs.done", "template": "Jobs/s\\n{value:.0f}", "interval": 0.5}
+    ]
+
+タイル設定に "alert": {"above": 90, "clear": 75} を加えると、しきい値を超えている間そのキーを点滅させます
+（alerts.py を参照）。
+
+"statsd" 取得元は、ローカルの UDP（既定 127.0.0.1:8125、環境変数 STREAMDECK_STATSD_PORT で変更）で
+受信した statsd 形式のメトリクスを表示します（statsd_listener.py を参照）。
+"""
+
+import functools
+import json
+import os
+import time
+
+import numpy as np
+import psutil
+from PIL import Image, ImageDraw, ImageFont
+from StreamDeck.ImageHelpers import PILHelper
+
+from alerts import AlertLayer, Threshold
+from collectors import Readings
+from heatmap import HeatmapTile
+from processes import ProcessTable, TopProcessTile
+from rates import DISK_FIELDS, NET_FIELDS, CounterRates, RateTile
+from statsd_listener import StatsdListener
+from timeseries import MISSING, RingBuffer, render_history
+
+# プロセス一覧（"processes" 取得元で共有し、tick をまたいで保持）
+PROCESS_TABLE = ProcessTable()
+
+# ネットワーク・ディスクの累積カウンタから求めるスループット（"net_rate" / "disk_rate" 取得元で共有）
+NET_RATES = CounterRates(NET_FIELDS)
+DISK_RATES = CounterRates(DISK_FIELDS)
+
+# statsd 形式の UDP 受信（"statsd" 取得元を使うタイルがあれば product-01 の main() で待ち受けを開始）
+STATSD = StatsdListener(port=int(os.environ.get("STREAMDECK_STATSD_PORT", "8125")))
+
+# --- 取得元（source 名 → 取得関数）---
+# 各関数は arg（設定の "arg"、省略時は None）を受け取ります。
+SOURCES = {
+    "cpu": lambda arg: psutil.cpu_percent(interval=None),
+    "cpu_percpu": lambda arg: psutil.cpu_percent(interval=None, percpu=True),
+    "memory": lambda arg: psutil.virtual_memory(),
+    "swap": lambda arg: psutil.swap_memory(),
+    "disk": lambda arg: psutil.disk_usage(arg or "/"),
+    "load": lambda arg: os.getloadavg(),
+    "processes": lambda arg: PROCESS_TABLE.refresh(),
+    "net_rate": lambda arg: NET_RATES.update(psutil.net_io_counters(pernic=True)),
+    "disk_rate": lambda arg: DISK_RATES.update(psutil.disk_io_counters(perdisk=True) or {}),
+    "statsd": lambda arg: STATSD.snapshot(),
+}
+
+
+def extract(result, field):
+    """ 取得結果から field（属性名・キー・インデックス）の値を取り出します。 """
+    if field is None:
+        return result
+    if isinstance(field, int):
+        return result[field]
+    if isinstance(result, dict):
+        return result[field]
+    return getattr(result, field)
+
+
+class Renderer:
+    """
+    タイルから使う描画ヘルパー。キー画像のサイズとネイティブ形式への変換をまとめます。
+
+    Args:
+        deck: Stream Deck オブジェクト。
+        text_image (callable): text_image(text, width, height, background_color=...) -> PIL.Image
+        cache: deckkit.render_cache.DiskRenderCache（省略可）。
+    """
+
+    def __init__(self, deck, text_image, cache=None):
+        self.deck = deck
+        self.width, self.height = deck.key_image_format()["size"]
+        self.text_image = text_image
+        self.cache = cache
+
+    def text(self, text: str, background_color: tuple) -> bytes:
+        """ テキストのキー画像をネイティブ形式で返します。 """
+        def render():
+            img = self.text_image(text, self.width, self.height, background_color=background_color)
+            return PILHelper.to_native_format(self.deck, img)
+
+        if self.cache is None:
+            return render()
+        return self.cache.get_or_render((text, self.width, self.height, background_color), render)
+
+    def image(self, img) -> bytes:
+        """ PIL 画像をネイティブ形式に変換します。 """
+        return PILHelper.to_native_format(self.deck, img)
+
+
+class TextTile:
+    """
+    1 つのメトリクスをフォーマットしてテキスト表示するタイル。
+
+    Args:
+        key (int): 表示するキー番号。
+        source (str): SOURCES の名前。
+        field: 取得結果から取り出す属性名など（省略時は結果そのもの）。
+        arg: 取得関数に渡す引数（disk のパスなど）。
+        interval (float): 更新間隔（秒）。
+        template (str): 表示形式。{value} に値が入ります。
+        background (tuple): 背景色 (R, G, B)。
+        alert (dict): しきい値アラートの設定（alerts.Threshold の引数、省略可）。
+    """
+
+    def __init__(self, key: int, source: str, field=None, arg=None, interval: float = 1.0,
+                 template: str = "{value}", background=(0, 0, 0), alert: dict = None):
+        if source not in SOURCES:
+            raise ValueError(f"unknown metric source: {source}")
+        if not float(interval) > 0:
+            raise ValueError(f"interval must be positive: {interval}")
+        self.key = key
+        self.keys = [key]
+        self.source = source
+        self.field = field
+        self.arg = arg
+        self.interval = float(interval)
+        self.template = template
+        self.background = tuple(background)
+        self.threshold = Threshold(**alert) if alert else None
+
+    def requires(self) -> list:
+        """ このタイルが必要とする (source, arg) の一覧。 """
+        return [(self.source, self.arg)]
+
+    def value(self, values: dict):
+        """ 取得結果からこのタイルの値を取り出します。 """
+        return extract(values[(self.source, self.arg)], self.field)
+
+    def state(self, values: dict):
+        """ 取得結果から表示内容を求めます。前回と同じならエンジンは描画を省略します。 """
+        return self.template.format(value=self.value(values))
+
+    def render(self, renderer: Renderer, state, background=None) -> dict:
+        """ {キー番号: ネイティブ形式の画像} を返します。background で背景色を差し替えられます。 """
+        return {self.key: renderer.text(state, background or self.background)}
+
+
+# 履歴タイルで、最後のサンプルから更新間隔の何倍経ったら取得の遅れとして隙間を空けるか
+OVERDUE = 2.0
+
+
+class HistoryTile(TextTile):
+    """
+    メトリクスの履歴をスパークライン（折れ線）または棒グラフで表示するタイル。
+    履歴はタイルごとの RingBuffer に保持し、グラフは列単位の塗りつぶしでまとめて描画します。
+    履歴に追加するのは新しいサンプルが届いたとき（タイムスタンプが変わったとき）だけです。
+    取得が更新間隔の OVERDUE 倍以上遅れている間は、更新のたびに MISSING を追加してグラフに隙間を空けます。
+
+    Args:
+        samples (int): 保持・表示するサンプル数（60～600 程度）。
+        style (str): "sparkline" または "bars"。
+        color (tuple): グラフの色 (R, G, B)。
+        vmax (float): 上端に対応する値（0 以下なら表示範囲内の最大値）。
+        template (str): 左上に重ねるラベル（空なら表示しない）。{value} に最新値が入ります。
+    """
+
+    def __init__(self, key: int, source: str, field=None, arg=None, interval: float = 1.0,
+                 template: str = "", background=(0, 0, 0), samples: int = 120,
+                 style: str = "sparkline", color=(0, 255, 0), vmax: float = 100.0, alert: dict = None):
+        super().__init__(key, source, field=field, arg=arg, interval=interval,
+                         template=template, background=background, alert=alert)
+        self.history = RingBuffer(int(samples))
+        self.style = style
+        self.color = tuple(color)
+        self.vmax = float(vmax)
+        self._last_timestamp = None  # 最後に履歴に追加したサンプルの取得時刻
+
+    def state(self, values: Readings):
+        value = self.value(values)
+        timestamp = values.timestamps.get((self.source, self.arg))
+        if timestamp is None or timestamp != self._last_timestamp:
+            self.history.append(value)
+            self._last_timestamp = timestamp
+        elif values.now - timestamp >= OVERDUE * self.interval:
+            self.history.append(MISSING)
+        label = self.template.format(value=value) if self.template else ""
+        return label, self.history.window().tobytes()
+
+    def render(self, renderer: Renderer, state, background=None) -> dict:
+        label, window = state
+        frame = render_history(np.frombuffer(window, dtype=np.float32), renderer.width, renderer.height,
+                               vmax=self.vmax, style=self.style, color=self.color,
+                               background_color=background or self.background)
+        img = Image.fromarray(frame, "RGB")
+        if label:
+            ImageDraw.Draw(img).text((2, 2), label, fill=(255, 255, 255), font=_label_font())
+        return {self.key: renderer.image(img)}
+
+
+@functools.lru_cache(maxsize=1)
+def _label_font():
+    """ グラフに重ねるラベル用のフォント（初回のみ読み込み）。 """
+    return ImageFont.load_default()
+
+
+class SparklineTile(HistoryTile):
+    """ 折れ線表示の HistoryTile（設定の "type": "sparkline"）。 """
+
+    def __init__(self, key: int, source: str, **options):
+        options.setdefault("style", "sparkline")
+        super().__init__(key, source, **options)
+
+
+class BarHistoryTile(HistoryTile):
+    """ 棒グラフ表示の HistoryTile（設定の "type": "bars"）。 """
+
+    def __init__(self, key: int, source: str, **options):
+        options.setdefault("style", "bars")
+        super().__init__(key, source, **options)
+
+
+TILE_TYPES = {
+    "text": TextTile,
+    "sparkline": SparklineTile,
+    "bars": BarHistoryTile,
+    "heatmap": HeatmapTile,
+    "top": TopProcessTile,
+    "rate": RateTile,
+}
+
+
+def build_tiles(config: list) -> list:
+    """ 設定（dict のリスト）からタイルを作成します。"type" の既定は "text" です。 """
+    tiles = []
+    for entry in config:
+        options = dict(entry)
+        tile_type = options.pop("type", "text")
+        if tile_type not in TILE_TYPES:
+            raise ValueError(f"unknown tile type: {tile_type}")
+        tiles.append(TILE_TYPES[tile_type](**options))
+    # 上位プロセス表示で使うフィールドだけを毎回読むようにする
+    PROCESS_TABLE.fields = {tile.by for tile in tiles if isinstance(tile, TopProcessTile)}
+    return tiles
+
+
+def load_config(path: str) -> list:
+    """ JSON 形式の設定ファイルを読み込みます。 """
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class Dashboard:
+    """
+    タイルを更新間隔ごとにまとめてスケジューリングするエンジン。
+
+    Args:
+        deck: Stream Deck オブジェクト。
+        tiles (list): build_tiles() で作成したタイル。
+        renderer (Renderer): 描画ヘルパー。
+        collectors: collectors.CollectorPool（省略時は描画ループ内で取得します）。
+        alerts (AlertLayer): しきい値アラートの点滅管理（省略時は 0.5 秒周期）。
+    """
+
+    def __init__(self, deck, tiles: list, renderer: Renderer, collectors=None, alerts: AlertLayer = None):
+        self.deck = deck
+        self.tiles = tiles
+        self.renderer = renderer
+        self.collectors = collectors
+        self.alerts = alerts or AlertLayer()
+        self.groups = {}  # interval -> [tile, ...]
+        for tile in tiles:
+            self.groups.setdefault(tile.interval, []).append(tile)
+        self._next_due = {interval: 0.0 for interval in self.groups}
+        self._last_state = {}   # id(tile) -> state
+        self._frames = {}       # id(tile) -> 直近に描画した {key: ネイティブ形式の画像}
+        self._last_image = {}   # key -> ネイティブ形式の画像
+        self.renders = 0
+        self.writes = 0
+
+    def collect(self, requirements) -> dict:
+        """
+        (source, arg) ごとの値を Readings（取得時刻つき）で返します。
+        collectors があればその最新値（未取得のものは含まない）、なければ取得関数を 1 回ずつ呼び出します。
+        """
+        if self.collectors is not None:
+            snapshot = self.collectors.snapshot()
+            samples = {req: snapshot[req] for req in requirements if req in snapshot}
+            return Readings({req: sample.value for req, sample in samples.items()},
+                            {req: sample.timestamp for req, sample in samples.items()}, self.collectors.now())
+        now = time.time()
+        return Readings({(source, arg): SOURCES[source](arg) for source, arg in requirements},
+                        dict.fromkeys(requirements, now), now)
+
+    def update(self, tiles: list) -> int:
+        """ タイルの表示内容を更新し、書き込んだキー数を返します。 """
+        requirements = {req for tile in tiles for req in tile.requires()}
+        values = self.collect(requirements)
+        written = 0
+        for tile in tiles:
+            if any(req not in values for req in tile.requires()):
+                continue  # まだ取得されていない
+            state = tile.state(values)
+            changed = self._last_state.get(id(tile)) != state
+            if changed:
+                self._last_state[id(tile)] = state
+                self.renders += 1
+                self._frames[id(tile)] = tile.render(self.renderer, state)
+            if self.alerts.check(tile, values) or changed:
+                written += self._show(tile)
+        return written
+
+    def _show(self, tile) -> int:
+        """ タイルの現在の画像（発報中なら点滅の位相に応じた画像）のうち、変わったキーだけを書き込みます。 """
+        state = self._last_state[id(tile)]
+        images = self.alerts.frames(tile, state, self._frames[id(tile)], self.renderer)
+        written = 0
+        for key, image in images.items():
+            if self._last_image.get(key) == image:
+                continue
+            self._last_image[key] = image
+            self.deck.set_key_image(key, image)
+            written += 1
+        self.writes += written
+        return written
+
+    def tick(self, now: float = None) -> float:
+        """
+        期限の来た更新間隔グループを処理し、次の期限までの秒数を返します。
+        """
+        now = time.monotonic() if now is None else now
+        due = [interval for interval, next_due in self._next_due.items() if next_due <= now]
+        if due:
+            self.update([tile for interval in due for tile in self.groups[interval]])
+            for interval in due:
+                # 処理が遅れても周期がずれないよう、前回の期限を基準に進める
+                next_due = self._next_due[interval] + interval
+                self._next_due[interval] = next_due if next_due > now else now + interval
+        # 点滅: 発報中のキーだけ、キャッシュ済みの画像に切り替える
+        if self.alerts.advance(now):
+            for tile in list(self.alerts.active.values()):
+                self._show(tile)
+        return max(0.0, self.next_deadline(now) - time.monotonic())
+
+    def next_deadline(self, now: float) -> float:
+        """ 次に tick が必要になる時刻（更新間隔の期限、または点滅の切り替え）を返します。 """
+        deadlines = list(self._next_due.values())
+        if self.alerts.active:
+            deadlines.append(self.alerts.next_toggle(now))
+        return min(deadlines) if deadlines else now + 1.0
+
+    def run(self) -> None:
+        """ Ctrl+C まで更新を続けます。 """
+        while True:
+            time.sleep(self.tick())
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+コアごとの CPU 使用率ヒートマップ
+
+psutil.cpu_percent(percpu=True) の値をカラーマップで色に変換し、デッキ全体を 1 枚のキャンバスとして
+コア数ぶんのセルを敷き詰めて表示します。
+
+- 画素 → セル番号の対応表は最初に 1 度だけ作成し、毎回の描画は「使用率の量子化」と
+  「カラーマップ表の参照（NumPy の配列インデックス）」だけで 1 枚のフレームを作ります。
+- フレームをキーごとに切り出し、セルの色が変わったキーだけを変換・送信します。
+"""
+
+import numpy as np
+from PIL import Image
+
+LEVELS = 32  # 使用率を何段階の色に量子化するか
+BLANK = LEVELS          # コアのないセル
+BORDER = LEVELS + 1     # セルの境界線
+
+# 使用率 0% → 100% の色の基準点（紺 → 青 → 緑 → 黄 → 赤）
+COLOR_STOPS = [
+    (0.0, (10, 10, 40)),
+    (0.25, (0, 90, 200)),
+    (0.5, (0, 190, 80)),
+    (0.75, (240, 200, 0)),
+    (1.0, (230, 20, 20)),
+]
+
+
+def build_colormap(stops=COLOR_STOPS, levels: int = LEVELS) -> np.ndarray:
+    """ (levels + 2) × 3 の色表を作成します。末尾の 2 つは BLANK と BORDER 用です。 """
+    positions = np.linspace(0.0, 1.0, levels)
+    xs = [p for p, _ in stops]
+    table = np.empty((levels + 2, 3), dtype=np.uint8)
+    for channel in range(3):
+        table[:levels, channel] = np.rint(np.interp(positions, xs, [c[channel] for _, c in stops]))
+    table[BLANK] = (25, 25, 25)
+    table[BORDER] = (0, 0, 0)
+    return table
+
+
+def grid_shape(cells: int, width: int, height: int) -> tuple:
+    """ width × height のキャンバスに cells 個のセルを、なるべく正方形に近く並べる (行数, 列数) を返します。 """
+    cols = max(1, int(np.ceil(np.sqrt(cells * width / height))))
+    rows = max(1, int(np.ceil(cells / cols)))
+    return rows, cols
+
+
+def build_cell_map(cells: int, width: int, height: int) -> np.ndarray:
+    """
+    キャンバスの各画素がどのセルに属するかの対応表（height × width）を作成します。
+    境界の画素は値 cells、コアのないセルは値 cells + 1 になります。
+    """
+    rows, cols = grid_shape(cells, width, height)
+    row_of = (np.arange(height) * rows) // height
+    col_of = (np.arange(width) * cols) // width
+    cell_map = row_of[:, None] * cols + col_of[None, :]
+    # 右端・下端以外の、隣とセルが変わる画素を境界にする
+    border = np.zeros((height, width), dtype=bool)
+    border[:, :-1] |= col_of[None, :-1] != col_of[None, 1:]
+    border[:-1, :] |= row_of[:-1, None] != row_of[1:, None]
+    cell_map[cell_map >= cells] = cells + 1  # コアのないセル
+    cell_map[border] = cells
+    return cell_map.astype(np.int32)
+
+
+class HeatmapTile:
+    """
+    デッキ全体を 1 枚のキャンバスとして、コアごとの使用率を表示するタイル。
+
+    Args:
+        interval (float): 更新間隔（秒）。2～5 Hz なら 0.2～0.5。
+        source (str): 取得元（既定 "cpu_percpu"）。
+    """
+
+    def __init__(self, interval: float = 0.5, source: str = "cpu_percpu", arg=None):
+        if not float(interval) > 0:
+            raise ValueError(f"interval must be positive: {interval}")
+        self.interval = float(interval)
+        self.source = source
+        self.arg = arg
+        self.keys = []
+        self._colormap = build_colormap()
+        self._cell_map = None     # 画素 → セル（キャンバスの大きさが決まってから作成）
+        self._cells = None
+        self._key_cells = {}      # key -> そのキーに含まれるセル番号の配列
+        self._key_slices = {}     # key -> キャンバス上の (y, x) スライス
+        self._last_levels = {}    # key -> 前回送信したセルの色の段階（bytes）
+
+    def requires(self) -> list:
+        return [(self.source, self.arg)]
+
+    def state(self, values: dict):
+        percents = np.asarray(values[(self.source, self.arg)], dtype=np.float32)
+        levels = np.clip((percents * (LEVELS - 1) + 50) // 100, 0, LEVELS - 1).astype(np.uint8)
+        return levels.tobytes()
+
+    def _layout(self, renderer, cells: int) -> None:
+        rows, cols = renderer.deck.key_layout()
+        width, height = renderer.width, renderer.height
+        self._cell_map = build_cell_map(cells, cols * width, rows * height)
+        self.keys = list(range(rows * cols))
+        for key in self.keys:
+            y, x = divmod(key, cols)
+            area = (slice(y * height, (y + 1) * height), slice(x * width, (x + 1) * width))
+            self._key_slices[key] = area
+            self._key_cells[key] = np.unique(self._cell_map[area])
+        self._cells = cells
+
+    def render(self, renderer, state) -> dict:
+        levels = np.frombuffer(state, dtype=np.uint8)
+        if self._cell_map is None or self._cells != len(levels):
+            self._layout(renderer, len(levels))
+            self._last_levels = {}
+        # セル番号 → 色段階（末尾 2 つは境界と空きセル）
+        lookup = np.concatenate((levels, np.array([BORDER, BLANK], dtype=np.uint8)))
+        changed = []
+        for key in self.keys:
+            key_levels = lookup[self._key_cells[key]].tobytes()
+            if self._last_levels.get(key) != key_levels:
+                self._last_levels[key] = key_levels
+                changed.append(key)
+        if not changed:
+            return {}
+        frame = self._colormap[lookup[self._cell_map]]
+        images = {}
+        for key in changed:
+            tile = np.ascontiguousarray(frame[self._key_slices[key]])
+            images[key] = renderer.image(Image.fromarray(tile, "RGB"))
+        return images
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+メトリクスの記録と再生
+
+本番で発生した状況（障害時の負荷など）のダッシュボード表示を開発環境で再現するため、
+取得した値をすべてバイナリのログに記録し、あとから任意の速度で描画処理に流し込みます。
+
+ファイル形式:
+    MAGIC (8 バイト) + メタ情報の長さ (uint32) + メタ情報 (JSON: ダッシュボード設定・デッキの種類など)
+    以降はレコードの繰り返し:
+        RECORD (タイムスタンプ float64, ストリーム番号 uint16, ペイロード長 uint32) + ペイロード
+
+- ストリームは (source, arg) ごとに 1 つで、最初のサンプルの前に定義レコード（ストリーム番号 DEFINE、
+  ペイロードは JSON）を書き込みます。
+- 数値・数値のリスト・数値だけの namedtuple（psutil の svmem など）は、定義レコードに記録した
+  struct 形式の固定長バイナリで書き込みます。
+- それ以外（プロセス一覧、スループットの辞書、statsd の集計結果など）は型の情報を添えた JSON で書き込みます。
+  ログは本番ホストからコピーして開発環境で再生するものなので、pickle のように読み込みでコードが実行される形式は使いません。
+  JSON にできない値の取得元は、警告を 1 回表示して記録しません。
+
+再生時は ReplaySource が CollectorPool の代わりになり、Dashboard は記録された値を仮想時刻で読みます。
+"""
+
+import functools
+import json
+import struct
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from collectors import Sample
+from statsd_listener import Snapshot
+
+MAGIC = b"SDMLOG1\n"
+META_LENGTH = struct.Struct("<I")
+RECORD = struct.Struct("<dHI")  # タイムスタンプ、ストリーム番号、ペイロード長
+DEFINE = 0xFFFF                 # ストリーム定義レコードのストリーム番号
+
+KIND_STRUCT = b"s"
+KIND_JSON = b"j"
+
+ReplayReport = namedtuple("ReplayReport", ["samples", "dropped", "ticks", "renders", "writes",
+                                           "elapsed", "duration", "max_lag"])
+
+
+def _number_format(value):
+    """ 数値の struct 形式（整数は q、実数は d）。数値でなければ None。 """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return "q"
+    if isinstance(value, float):
+        return "d"
+    return None
+
+
+def _layout(value):
+    """ 値を固定長で書き込めるなら (shape, struct 形式, フィールド名, 型名) を、できなければ None を返します。 """
+    fmt = _number_format(value)
+    if fmt is not None:
+        return "scalar", "<" + fmt, None, None
+    if not isinstance(value, (list, tuple)) or not value:
+        return None
+    formats = [_number_format(item) for item in value]
+    if None in formats:
+        return None
+    fmt = "<" + "".join(formats)
+    if hasattr(value, "_fields"):
+        return "namedtuple", fmt, list(value._fields), type(value).__name__
+    return "list", fmt, None, None
+
+
+def _to_json(value):
+    """
+    値を JSON にできる形に変換します。list・str・数値・None 以外は {"t": 型, ...} で型を残します。
+    対応していない型は TypeError です。
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, np.generic) and value.dtype.kind in "biuf":
+        return value.item()
+    if isinstance(value, np.ndarray) and value.dtype.kind in "biuf":
+        return {"t": "ndarray", "dtype": value.dtype.str, "shape": list(value.shape), "v": value.ravel().tolist()}
+    if isinstance(value, list):
+        return [_to_json(item) for item in value]
+    if isinstance(value, tuple) and hasattr(value, "_fields"):
+        return {"t": "namedtuple", "name": type(value).__name__, "fields": list(value._fields),
+                "v": [_to_json(item) for item in value]}
+    if isinstance(value, tuple):
+        return {"t": "tuple", "v": [_to_json(item) for item in value]}
+    if isinstance(value, dict) and type(value) in (dict, Snapshot):
+        return {"t": "statsd" if isinstance(value, Snapshot) else "dict",
+                "v": [[_to_json(k), _to_json(v)] for k, v in value.items()]}
+    raise TypeError(f"cannot record {type(value).__name__} values")
+
+
+@functools.lru_cache(maxsize=64)
+def _namedtuple_type(name: str, fields: tuple):
+    return namedtuple(name, fields)
+
+
+def _from_json(data):
+    """ _to_json() の逆変換。 """
+    if isinstance(data, list):
+        return [_from_json(item) for item in data]
+    if not isinstance(data, dict):
+        return data
+    kind = data["t"]
+    if kind == "ndarray":
+        dtype = np.dtype(data["dtype"])
+        if dtype.kind not in "biuf":
+            raise ValueError(f"unsupported array dtype in metric log: {dtype}")
+        return np.array(data["v"], dtype=dtype).reshape(data["shape"])
+    items = [_from_json(item) for item in data["v"]]
+    if kind == "namedtuple":
+        return _namedtuple_type(data["name"], tuple(data["fields"]))(*items)
+    if kind == "tuple":
+        return tuple(items)
+    if kind == "dict":
+        return {_hashable(k): v for k, v in items}
+    if kind == "statsd":
+        return Snapshot((_hashable(k), v) for k, v in items)
+    raise ValueError(f"unknown value type in metric log: {kind}")
+
+
+def _hashable(key):
+    """ 辞書のキーに戻すため、JSON の配列になったタプルのキーをタプルにします。 """
+    return tuple(key) if isinstance(key, list) else key
+
+
+class _Stream:
+    """ 1 つの (source, arg) の値の書き込み・読み込み形式。 """
+
+    def __init__(self, number: int, source: str, arg, shape=None, fmt=None, fields=None, name=None):
+        self.number = number
+        self.source = source
+        self.arg = arg
+        self.shape = shape
+        self.format = fmt
+        self.fields = fields
+        self.name = name
+        self.struct = struct.Struct(fmt) if fmt else None
+        self.type = namedtuple(name, fields) if shape == "namedtuple" else None
+
+    def definition(self) -> bytes:
+        return json.dumps({"id": self.number, "source": self.source, "arg": self.arg, "shape": self.shape,
+                           "format": self.format, "fields": self.fields, "name": self.name}).encode("utf-8")
+
+    @classmethod
+    def from_definition(cls, payload: bytes):
+        d = json.loads(payload)
+        return cls(d["id"], d["source"], d["arg"], d["shape"], d["format"], d["fields"], d["name"])
+
+    def encode(self, value) -> bytes:
+        if self.struct is not None:
+            try:
+                if self.shape == "scalar":
+                    return KIND_STRUCT + self.struct.pack(value)
+                if self.shape == "list" or type(value).__name__ == self.name:
+                    return KIND_STRUCT + self.struct.pack(*value)
+            except (struct.error, TypeError):
+                pass  # 形式が変わった（要素数・型の違い）ものは JSON で書き込む
+        return KIND_JSON + json.dumps(_to_json(value), separators=(",", ":")).encode("utf-8")
+
+    def decode(self, payload: bytes):
+        kind = payload[:1]
+        if kind == KIND_JSON:
+            return _from_json(json.loads(payload[1:]))
+        if kind != KIND_STRUCT or self.struct is None:
+            raise ValueError(f"unsupported payload in metric log (stream {self.number}, kind {kind!r})")
+        values = self.struct.unpack(payload[1:])
+        if self.shape == "scalar":
+            return values[0]
+        if self.shape == "namedtuple":
+            return self.type(*values)
+        return list(values)
+
+
+class MetricRecorder:
+    """
+    取得した値をログファイルに書き込みます。複数の Collector スレッドから呼び出せます。
+
+    Args:
+        path (str): 書き込み先のファイル。
+        meta (dict): ヘッダーに記録するメタ情報（ダッシュボード設定など、JSON にできるもの）。
+    """
+
+    def __init__(self, path: str, meta: dict = None):
+        self.path = path
+        self.records = 0
+        self._streams = {}  # (source, arg) -> _Stream
+        self._skipped = set()  # JSON にできない値で記録を諦めた (source, arg)
+        self._lock = threading.Lock()
+        self._file = open(path, "wb")
+        header = json.dumps(meta or {}).encode("utf-8")
+        self._file.write(MAGIC + META_LENGTH.pack(len(header)) + header)
+
+    def write(self, req: tuple, value, timestamp: float = None) -> None:
+        """ (source, arg) の値を 1 件記録します。 """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            if self._file.closed:
+                return  # 停止処理中の Collector からの書き込み
+            stream = self._streams.get(req)
+            if stream is None:
+                layout = _layout(value) or (None, None, None, None)
+                stream = _Stream(len(self._streams), req[0], req[1], *layout)
+                self._streams[req] = stream
+                definition = stream.definition()
+                self._file.write(RECORD.pack(timestamp, DEFINE, len(definition)) + definition)
+            try:
+                payload = stream.encode(value)
+            except TypeError as e:
+                if req not in self._skipped:
+                    self._skipped.add(req)
+                    print(f"Not recording {req[0]}: {e}")
+                return
+            self._file.write(RECORD.pack(timestamp, stream.number, len(payload)) + payload)
+            self.records += 1
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class MetricLog:
+    """
+    MetricRecorder で書き込んだログを読み込みます。
+
+    Args:
+        path (str): ログファイル。
+
+    Attributes:
+        meta (dict): ヘッダーのメタ情報。
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._data = f.read()
+        if not self._data.startswith(MAGIC):
+            raise ValueError(f"{path} is not a metric log")
+        offset = len(MAGIC)
+        (length,) = META_LENGTH.unpack_from(self._data, offset)
+        offset += META_LENGTH.size
+        self.meta = json.loads(self._data[offset:offset + length])
+        self._start = offset + length
+
+    def __iter__(self):
+        """ (タイムスタンプ, (source, arg), 値) を記録順に返します。 """
+        data = self._data
+        view = memoryview(data)
+        streams = {}
+        offset = self._start
+        end = len(data)
+        while offset + RECORD.size <= end:
+            timestamp, number, length = RECORD.unpack_from(data, offset)
+            offset += RECORD.size
+            payload = view[offset:offset + length]
+            offset += length
+            if len(payload) < length:
+                break  # 書き込み途中で終了したログ
+            if number == DEFINE:
+                stream = _Stream.from_definition(bytes(payload))
+                streams[stream.number] = stream
+                continue
+            stream = streams[number]
+            yield timestamp, (stream.source, stream.arg), stream.decode(bytes(payload))
+
+
+class _ReadTracker(dict):
+    """ Dashboard が読み出したキーを記録する辞書（読まれずに上書きされた値を数えるため）。 """
+
+    def __init__(self, values: dict, unread: set):
+        super().__init__(values)
+        self._unread = unread
+
+    def __getitem__(self, key):
+        self._unread.discard(key)
+        return super().__getitem__(key)
+
+
+class ReplaySource:
+    """
+    記録した値を仮想時刻に合わせて公開します。CollectorPool の代わりに Dashboard に渡します。
+
+    Args:
+        log (MetricLog): 再生するログ。
+
+    Attributes:
+        samples (int): 公開したサンプル数。
+        dropped (int): 表示に使われる前に次のサンプルで上書きされたサンプル数（取りこぼしたフレーム）。
+        last_time (float): 最後に公開したサンプルのタイムスタンプ。
+    """
+
+    def __init__(self, log: MetricLog):
+        self._records = iter(log)
+        self._pending = next(self._records, None)
+        self._latest = {}  # (source, arg) -> Sample
+        self._unread = set()
+        self._now = None
+        self.samples = 0
+        self.dropped = 0
+        self.last_time = None  # 最後に公開したサンプルのタイムスタンプ
+
+    def next_time(self):
+        """ 次のサンプルのタイムスタンプ（最後まで再生したら None）。 """
+        return self._pending[0] if self._pending is not None else None
+
+    def advance(self, now: float) -> None:
+        """ タイムスタンプが now 以前のサンプルをすべて公開します。 """
+        self._now = now
+        while self._pending is not None and self._pending[0] <= now:
+            self.last_time, req, value = self._pending
+            if req in self._unread:
+                self.dropped += 1
+            self._latest[req] = Sample(value, self.last_time, 0.0)
+            self._unread.add(req)
+            self.samples += 1
+            self._pending = next(self._records, None)
+
+    def snapshot(self) -> dict:
+        """ 公開済みの最新の Sample を {(source, arg): Sample} で返します（CollectorPool.snapshot() と同じ形式）。 """
+        return _ReadTracker(self._latest, self._unread)
+
+    def now(self) -> float:
+        """ 仮想時刻（最後に advance() に渡した時刻）。 """
+        return self._now if self._now is not None else (self.last_time or 0.0)
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+
+def replay(dashboard, source: ReplaySource, speed: float = 1.0) -> ReplayReport:
+    """
+    ログを speed 倍速で Dashboard に流し込み、最後まで再生したら結果を返します。
+    speed が 0 のときは待たずに（描画処理が追いつく最大の速度で）再生します。
+
+    Dashboard には記録時のタイムスタンプを仮想時刻として渡すため、更新間隔や点滅も speed 倍速になります。
+    描画が追いつかない場合は仮想時刻が先に進み、表示されないまま上書きされたサンプルが dropped に数えられます。
+    """
+    start = source.next_time()
+    if start is None:
+        return ReplayReport(0, 0, 0, 0, 0, 0.0, 0.0, 0.0)
+    wall_start = time.perf_counter()
+    now = start
+    ticks = 0
+    max_lag = 0.0
+    while True:
+        pending = source.next_time()
+        due = dashboard.next_deadline(now)
+        if pending is not None:
+            due = min(due, pending)
+        elif due > now:
+            break  # すべてのサンプルを公開し、期限の来た更新も済んだ
+        due = max(due, now)
+        if speed > 0:
+            delay = wall_start + (due - start) / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                max_lag = max(max_lag, -delay)
+            now = max(due, start + (time.perf_counter() - wall_start) * speed)
+        else:
+            now = due
+        source.advance(now)
+        dashboard.tick(now)
+        ticks += 1
+    return ReplayReport(source.samples, source.dropped, ticks, dashboard.renders, dashboard.writes,
+                        time.perf_counter() - wall_start, source.last_time - start, max_lag)
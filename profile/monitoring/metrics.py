@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Prometheus テキスト形式のメトリクス出力ヘルパー
+
+product-02 などのスクリプトから利用する、依存ライブラリなしの小さなメトリクス実装です。
+
+- Counter: 単調増加するカウンタ（ラベル付き）
+- Gauge: 任意の値（関数で遅延評価も可能）
+- Histogram: 固定バケットのヒストグラム（ラベル付き）
+- Registry: 登録したメトリクスを Prometheus テキスト形式（/metrics）に書き出します。
+
+例:
+    registry = Registry()
+    render_seconds = registry.register(Histogram("render_seconds", "描画時間", labelnames=("stage",)))
+    with render_seconds.time("draw"):
+        ...
+    print(registry.render())
+"""
+
+import abc
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# 1ms 未満の処理から USB 書き込みの数百 ms まで拾えるバケット（秒）
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    """ ラベル値をエスケープします。 """
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames: tuple, labels: tuple, extra: str = "") -> str:
+    """ {name="value",...} 形式のラベル文字列を作成します。 """
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(labelnames, labels)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric(abc.ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _check_labels(self, labels: tuple) -> tuple:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {labels}")
+        return tuple(str(v) for v in labels)
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+    @abc.abstractmethod
+    def samples(self) -> list:
+        """ Prometheus テキスト形式のサンプル行を返します。 """
+
+
+class Counter(_Metric):
+    """ ラベルごとに単調増加する値を保持するカウンタ。 """
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values = {}
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        key = self._check_labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, *labels) -> float:
+        with self._lock:
+            return self._values.get(self._check_labels(labels), 0)
+
+    def samples(self) -> list:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """
+    任意の値を保持するゲージ。
+    set_function() で関数を登録すると、出力時に呼び出して値を取得します。
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values = {}
+        self._functions = {}
+
+    def set(self, value: float, *labels) -> None:
+        key = self._check_labels(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, func, *labels) -> None:
+        key = self._check_labels(labels)
+        with self._lock:
+            self._functions[key] = func
+
+    def samples(self) -> list:
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for key, func in functions.items():
+            values[key] = func()
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}"
+                for k, v in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    """
+    固定バケットのヒストグラム。
+    観測ごとのコストは bisect 1 回とカウンタ加算のみで、メモリはラベル数 × バケット数に固定されます。
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: tuple = DEFAULT_BUCKETS,
+                 labelnames: tuple = ()):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [バケットごとの件数..., +Inf の件数, 合計値]
+        self._series = {}
+
+    def observe(self, value: float, *labels) -> None:
+        key = self._check_labels(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = [0] * (len(self.buckets) + 2)
+                self._series[key] = series
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        """ with ブロックの実行時間（秒）を観測します。 """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def count(self, *labels) -> int:
+        with self._lock:
+            series = self._series.get(self._check_labels(labels))
+            return sum(series[:-1]) if series else 0
+
+    def samples(self) -> list:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """ メトリクスをまとめて Prometheus テキスト形式で出力します。 """
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if any(m.name == metric.name for m in self._metrics):
+                raise ValueError(f"metric {metric.name} is already registered")
+            self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+CPU・メモリ使用量の上位プロセス表示
+
+毎回 psutil.process_iter() で全プロセスを作り直すと、数千プロセスのホストでは重くなります。
+ProcessTable は psutil.Process を tick をまたいで保持し、以下のように差分だけを処理します。
+
+- psutil.pids() と前回の PID 集合の差分で、新しいプロセスの追加・終了したプロセスの削除だけを行います。
+- 名前など変わらない属性は追加時に 1 度だけ取得し、毎回は必要なフィールド（CPU・メモリ）だけを読みます。
+  両方必要な場合は oneshot() でまとめて読みます。
+- 上位 N 件は heapq.nlargest で選びます（全件のソートはしません）。
+"""
+
+import heapq
+from collections import namedtuple
+
+import psutil
+
+ProcInfo = namedtuple("ProcInfo", ["pid", "name", "cpu", "memory"])
+
+_GONE = (psutil.NoSuchProcess, psutil.ZombieProcess, psutil.AccessDenied)
+
+
+class ProcessTable:
+    """
+    プロセス一覧を tick をまたいで保持し、差分で更新するテーブル。
+
+    Args:
+        fields: 毎回更新するフィールド（"cpu" / "memory"）。含まれないフィールドは 0 になります。
+    """
+
+    def __init__(self, fields=("cpu", "memory")):
+        self.fields = set(fields)
+        self._procs = {}   # pid -> psutil.Process
+        self._names = {}   # pid -> 名前（追加時に 1 度だけ取得）
+        self.added = 0
+        self.removed = 0
+
+    def _add(self, pid: int) -> None:
+        try:
+            proc = psutil.Process(pid)
+            name = proc.name()
+            proc.cpu_percent(None)  # 次回からの CPU 使用率計算の基準点
+        except _GONE:
+            return
+        self._procs[pid] = proc
+        self._names[pid] = name
+        self.added += 1
+
+    def _remove(self, pid: int) -> None:
+        self._procs.pop(pid, None)
+        self._names.pop(pid, None)
+        self.removed += 1
+
+    def refresh(self) -> list:
+        """ プロセスの増減を反映し、全プロセスの ProcInfo のリストを返します。 """
+        pids = set(psutil.pids())
+        known = self._procs.keys()
+        for pid in known - pids:
+            self._remove(pid)
+        for pid in pids - known:
+            self._add(pid)
+
+        want_cpu = "cpu" in self.fields
+        want_memory = "memory" in self.fields
+        rows = []
+        gone = []
+        for pid, proc in self._procs.items():
+            try:
+                if want_cpu and want_memory:
+                    with proc.oneshot():
+                        cpu = proc.cpu_percent(None)
+                        memory = proc.memory_info().rss
+                else:
+                    cpu = proc.cpu_percent(None) if want_cpu else 0.0
+                    memory = proc.memory_info().rss if want_memory else 0
+            except _GONE:
+                gone.append(pid)
+                continue
+            rows.append(ProcInfo(pid, self._names[pid], cpu, memory))
+        for pid in gone:
+            self._remove(pid)
+        return rows
+
+
+def top(rows: list, n: int, by: str = "cpu") -> list:
+    """ rows から by（"cpu" または "memory"）の大きい順に n 件を返します。 """
+    return heapq.nlargest(n, rows, key=lambda row: getattr(row, by))
+
+
+class TopProcessTile:
+    """
+    上位 N 件のプロセスを 1 つのキーに複数行で表示するタイル。
+
+    Args:
+        key (int): 表示するキー番号。
+        n (int): 表示件数。
+        by (str): 並べ替えの基準（"cpu" または "memory"）。
+        interval (float): 更新間隔（秒）。
+        template (str): 1 行の表示形式。{name}, {pid}, {value} が使えます（memory の値は MB）。
+        background (tuple): 背景色 (R, G, B)。
+    """
+
+    def __init__(self, key: int, n: int = 3, by: str = "cpu", interval: float = 2.0,
+                 template: str = None, background=(40, 40, 40), source: str = "processes", arg=None):
+        if by not in ("cpu", "memory"):
+            raise ValueError(f"unknown sort key: {by}")
+        if not float(interval) > 0:
+            raise ValueError(f"interval must be positive: {interval}")
+        self.key = key
+        self.keys = [key]
+        self.n = int(n)
+        self.by = by
+        self.interval = float(interval)
+        self.template = template or ("{name:.6} {value:.0f}%" if by == "cpu" else "{name:.6} {value:.0f}M")
+        self.background = tuple(background)
+        self.source = source
+        self.arg = arg
+
+    def requires(self) -> list:
+        return [(self.source, self.arg)]
+
+    def state(self, values: dict):
+        lines = []
+        for row in top(values[(self.source, self.arg)], self.n, self.by):
+            value = row.cpu if self.by == "cpu" else row.memory / (1024 * 1024)
+            lines.append(self.template.format(name=row.name, pid=row.pid, value=value))
+        return "\n".join(lines)
+
+    def render(self, renderer, state) -> dict:
+        return {self.key: renderer.text(state, self.background)}
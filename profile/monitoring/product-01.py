@@ -5,19 +5,46 @@ System Monitoring Dashboard for Stream Deck XL
 このスクリプトは、psutil を使用してシステムの主要なモニタリング項目（CPU使用率、メモリ使用率、ディスク使用率）を取得し、
 Stream Deck XL のキー 0, 1, 2 に、2行で情報を表示します。
 
-- キー 0: CPU 使用率 ("CPU:" と使用率)
+- キー 0: CPU 使用率 ("CPU:" と使用率)。90% 以上で赤く点滅し、75% まで下がると解除します。
 - キー 1: メモリ 使用率 ("Mem:" と使用率)
 - キー 2: ディスク 使用率 ("Disk:" と使用率)
+- キー 3, 4: ネットワークの受信・送信速度（全インターフェースの合計）
+- キー 8～10: 上記の直近 120 秒の履歴グラフ
+- キー 11, 12: ディスクの読み込み・書き込み速度（全ディスクの合計）
+- キー 16, 17: CPU・メモリ使用量の上位 3 プロセス
 
-1秒ごとに更新されます。
+1秒ごとに更新されます。値が変わったキーだけを描画し直します。
+
+表示内容は DEFAULT_DASHBOARD、または環境変数 STREAMDECK_DASHBOARD で指定した JSON ファイルで
+キーごとに設定できます（設定形式は dashboard.py を参照）。
+STREAMDECK_DASHBOARD=heatmap とすると、デッキ全体にコアごとの CPU 使用率ヒートマップを表示します。
+
+メトリクスの取得は取得元ごとのバックグラウンドスレッドで行うため、遅い取得元（NFS 上の / など）があっても
+表示は止まりません。取得に間隔以上の時間がかかった場合はログに出力します。
+
+環境変数 STREAMDECK_RENDER_CACHE=1 を指定すると、描画結果をディスクにキャッシュします（deckkit/render_cache.py を参照）。
+
+記録と再生（metric_log.py を参照）:
+    STREAMDECK_RECORD=metrics.log python product-01.py
+        取得した値をすべて metrics.log に記録します（ダッシュボード設定も一緒に記録します）。
+    STREAMDECK_REPLAY=metrics.log STREAMDECK_REPLAY_SPEED=100 python product-01.py
+        実機の代わりに仮想デバイスを使い、記録を 100 倍速（1～1000、0 で最大速度）で再生して
+        描画のスループットと取りこぼしたフレーム数を表示します。
 """
 
-import time
-import psutil
+import functools
+import os
+import sys
 
 from PIL import Image, ImageDraw, ImageFont
 from StreamDeck.DeviceManager import DeviceManager
-from StreamDeck.ImageHelpers import PILHelper
+
+from collectors import CollectorPool
+from dashboard import SOURCES, STATSD, Dashboard, Renderer, build_tiles, load_config
+from metric_log import MetricLog, MetricRecorder, ReplaySource, replay
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from deckkit.render_cache import DiskRenderCache, code_version  # pylint: disable=wrong-import-position
 
 
 def create_multiline_text_image(text: str, width: int, height: int, font_size: int = 40,
@@ -59,45 +86,112 @@ def create_multiline_text_image(text: str, width: int, height: int, font_size: i
     return image
 
 
-def update_monitor(deck, width: int, height: int) -> None:
+# --- ダッシュボード設定（既定: キー 0～2 に CPU / メモリ / ディスク使用率、キー 8～10 にその履歴、
+#     キー 3, 4, 11, 12 に I/O 速度、キー 16, 17 に上位プロセス）---
+# 環境変数 STREAMDECK_DASHBOARD に PRESETS の名前か JSON ファイルのパスを指定すると、その設定を使用します。
+DEFAULT_DASHBOARD = [
+    {"key": 0, "source": "cpu", "template": "CPU:\n{value}%", "background": (0, 0, 128),
+     "alert": {"above": 90, "clear": 75}},
+    {"key": 1, "source": "memory", "field": "percent", "template": "Mem:\n{value}%", "background": (0, 128, 0)},
+    {"key": 2, "source": "disk", "arg": "/", "field": "percent", "template": "Disk:\n{value}%",
+     "background": (128, 0, 0)},
+    {"key": 3, "type": "rate", "source": "net_rate", "field": "bytes_recv", "label": "Net\nrecv"},
+    {"key": 4, "type": "rate", "source": "net_rate", "field": "bytes_sent", "label": "Net\nsent"},
+    # 2 段目: 直近 120 秒の履歴
+    {"key": 8, "type": "sparkline", "source": "cpu", "samples": 120, "color": (80, 160, 255)},
+    {"key": 9, "type": "sparkline", "source": "memory", "field": "percent", "samples": 120, "color": (80, 255, 80)},
+    {"key": 10, "type": "bars", "source": "disk", "arg": "/", "field": "percent", "samples": 120,
+     "color": (255, 80, 80)},
+    {"key": 11, "type": "rate", "source": "disk_rate", "field": "read_bytes", "label": "Disk\nread",
+     "background": (64, 0, 0)},
+    {"key": 12, "type": "rate", "source": "disk_rate", "field": "write_bytes", "label": "Disk\nwrite",
+     "background": (64, 0, 0)},
+    # 3 段目: CPU・メモリ使用量の上位 3 プロセス
+    {"key": 16, "type": "top", "by": "cpu", "n": 3},
+    {"key": 17, "type": "top", "by": "memory", "n": 3},
+]
+
+# デッキ全体をコアごとの CPU 使用率ヒートマップにする設定（4 Hz 更新）
+HEATMAP_DASHBOARD = [
+    {"type": "heatmap", "interval": 0.25},
+]
+
+PRESETS = {
+    "default": DEFAULT_DASHBOARD,
+    "heatmap": HEATMAP_DASHBOARD,
+}
+
+
+def create_renderer(deck) -> Renderer:
+    here = os.path.dirname(os.path.abspath(__file__))
+    render_cache = DiskRenderCache.from_env(
+        deck, code_version(os.path.abspath(__file__), os.path.join(here, "dashboard.py")))
+    return Renderer(deck, functools.partial(create_multiline_text_image, font_size=20), cache=render_cache)
+
+
+def replay_main(path: str, speed: float) -> None:
     """
-    システムのモニタリング情報（CPU、メモリ、ディスク使用率）を取得し、キー 0～2 に2行で表示します。
+    記録したログを仮想デバイスに再生し、結果を表示します。
     """
-    cpu_percent = psutil.cpu_percent(interval=None)
-    mem = psutil.virtual_memory()
-    disk = psutil.disk_usage('/')
-
-    cpu_text = f"CPU:\n{cpu_percent}%"
-    mem_text = f"Mem:\n{mem.percent}%"
-    disk_text = f"Disk:\n{disk.percent}%"
+    log = MetricLog(path)
+    deck_type = log.meta.get("deck", "Stream Deck XL")
+    deck = next(d for d in DeviceManager(transport="dummy").enumerate() if d.deck_type() == deck_type)
+    deck.open()
 
-    cpu_img = create_multiline_text_image(cpu_text, width, height, font_size=20, background_color=(0, 0, 128))
-    mem_img = create_multiline_text_image(mem_text, width, height, font_size=20, background_color=(0, 128, 0))
-    disk_img = create_multiline_text_image(disk_text, width, height, font_size=20, background_color=(128, 0, 0))
+    tiles = build_tiles(log.meta["config"])
+    source = ReplaySource(log)
+    dashboard = Dashboard(deck, tiles, create_renderer(deck), collectors=source)
+    report = replay(dashboard, source, speed)
+    deck.close()
 
-    deck.set_key_image(0, PILHelper.to_native_format(deck, cpu_img))
-    deck.set_key_image(1, PILHelper.to_native_format(deck, mem_img))
-    deck.set_key_image(2, PILHelper.to_native_format(deck, disk_img))
+    elapsed = max(report.elapsed, 1e-9)
+    print(f"replayed {report.duration:.1f}s of metrics in {report.elapsed:.2f}s "
+          f"({report.duration / elapsed:.0f}x, speed {speed:g})")
+    print(f"samples: {report.samples}, dropped frames: {report.dropped}, max lag: {report.max_lag * 1000:.1f}ms")
+    print(f"ticks: {report.ticks}, renders: {report.renders} ({report.renders / elapsed:.0f}/s), "
+          f"key writes: {report.writes} ({report.writes / elapsed:.0f}/s)")
 
 
 def main() -> None:
     """
     メイン関数:
-      - Stream Deck を初期化し、キーサイズを取得します。
-      - 1秒ごとにシステムモニタリング情報を更新して、キー 0,1,2 に表示します。
+      - Stream Deck を初期化し、ダッシュボード設定からタイルを作成します。
+      - 取得元ごとのバックグラウンドスレッドでメトリクスを取得します（STREAMDECK_RECORD 指定時は記録も行います）。
+      - 各タイルの更新間隔ごとに最新値を読み、表示が変わったキーだけを更新します。
     """
+    replay_path = os.environ.get("STREAMDECK_REPLAY")
+    if replay_path:
+        replay_main(replay_path, float(os.environ.get("STREAMDECK_REPLAY_SPEED", "1")))
+        return
+
     deck = DeviceManager().enumerate()[0]
     deck.open()
     deck.reset()
 
-    key_format = deck.key_image_format()
-    width, height = key_format["size"]
+    renderer = create_renderer(deck)
+
+    setting = os.environ.get("STREAMDECK_DASHBOARD", "default")
+    config = PRESETS[setting] if setting in PRESETS else load_config(setting)
+    tiles = build_tiles(config)
+    recorder = None
+    record_path = os.environ.get("STREAMDECK_RECORD")
+    if record_path:
+        recorder = MetricRecorder(record_path, meta={"config": config, "deck": deck.deck_type()})
+    uses_statsd = any(source == "statsd" for tile in tiles for source, _ in tile.requires())
+    if uses_statsd:
+        STATSD.start()
+    collectors = CollectorPool.for_tiles(SOURCES, tiles, recorder=recorder)
+    collectors.start()
+    dashboard = Dashboard(deck, tiles, renderer, collectors=collectors)
 
     try:
-        while True:
-            update_monitor(deck, width, height)
-            time.sleep(1)
+        dashboard.run()
     except KeyboardInterrupt:
+        collectors.stop()
+        if uses_statsd:
+            STATSD.stop()
+        if recorder is not None:
+            recorder.close()
         deck.reset()
         deck.close()
 
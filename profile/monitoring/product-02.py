@@ -9,24 +9,148 @@ Product-02: StreamDeck Web Server with Enhanced Multiline Update
 http://localhost:5000/update?key=0,1&text=稼働中CPU:%2025%25&font_size=40&fg=0,255,0&bg=0,0,0&max_chars=4
 
 ※ テキストが長い場合、改行が自動で挿入され、フォントサイズも調整されて領域内に収まるように処理します。
+
+http://localhost:5000/metrics では、処理段階ごと（パース、フォント読み込み、サイズ調整ループ、
+Pilmoji 描画、ネイティブ形式変換、set_key_image 書き込み）の所要時間ヒストグラム、
+キーごとの書き込み回数、キャッシュ統計を Prometheus テキスト形式で取得できます。
+
+環境変数 STREAMDECK_RENDER_CACHE=1 を指定すると、描画結果をディスクにキャッシュし、
+再起動後も同じ表示内容は描画せずにすぐ表示します（deckkit/render_cache.py を参照）。
+
+更新は優先度クラスごとのキューに積まれ、1 本の書き込みスレッドが優先度の高いキーから処理します
+（同じキーへの未処理の更新は最新のものにまとめられます）。設定は環境変数で行います。
+    STREAMDECK_KEY_PRIORITY="high=0-2,31;low=16-23"  キーごとの優先度クラス（既定は normal）
+    STREAMDECK_RATE_LIMIT=20                          クライアント IP ごとの 1 秒あたりのリクエスト数
+    STREAMDECK_RATE_BURST=40                          トークンバケットの容量
+制限を超えたリクエストは 429 を返して破棄し、破棄数・後回し数は /metrics に出力します。
 """
 
+import os
+import sys
 import threading
 import time
-from flask import Flask, request, jsonify
+from functools import lru_cache
+from flask import Flask, Response, request, jsonify
 from PIL import Image, ImageDraw, ImageFont
 from StreamDeck.DeviceManager import DeviceManager
 from StreamDeck.ImageHelpers import PILHelper
 from pilmoji import Pilmoji  # 絵文字描画のための pilmoji
 
+from metrics import CONTENT_TYPE, Counter, Gauge, Histogram, Registry
+from update_queue import LANES, PriorityWriter, RateLimiter, parse_priorities
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from deckkit.render_cache import DiskRenderCache, code_version  # pylint: disable=wrong-import-position
+
 app = Flask(__name__)
 
 # グローバル変数：Stream Deck オブジェクト（後で初期化）
 deck = None
 
+# ディスク上の描画キャッシュ（STREAMDECK_RENDER_CACHE 指定時のみ）
+render_cache = None
+
 # キー更新時の排他制御用ロック
 deck_lock = threading.Lock()
 
+# --- /metrics 用の計測 ---
+registry = Registry()
+stage_seconds = registry.register(Histogram(
+    "streamdeck_stage_seconds", "Time spent in each /update processing stage.", labelnames=("stage",)))
+request_seconds = registry.register(Histogram(
+    "streamdeck_update_seconds", "End-to-end /update handling time."))
+key_writes = registry.register(Counter(
+    "streamdeck_key_writes_total", "set_key_image calls per key.", labelnames=("key",)))
+fit_iterations = registry.register(Counter(
+    "streamdeck_fit_iterations_total", "Font size fitting loop iterations."))
+cache_stats = registry.register(Gauge(
+    "streamdeck_cache", "Render cache statistics.", labelnames=("cache", "stat")))
+shed_requests = registry.register(Counter(
+    "streamdeck_shed_total", "Updates dropped before rendering.", labelnames=("reason",)))
+coalesced_updates = registry.register(Counter(
+    "streamdeck_coalesced_total", "Pending updates replaced by a newer update for the same key.",
+    labelnames=("lane",)))
+deferred_updates = registry.register(Counter(
+    "streamdeck_deferred_total", "Updates served after waiting behind higher-priority keys.",
+    labelnames=("lane",)))
+queue_wait_seconds = registry.register(Histogram(
+    "streamdeck_queue_wait_seconds", "Time an update waited in its priority lane.", labelnames=("lane",)))
+queue_depth = registry.register(Gauge(
+    "streamdeck_queue_depth", "Pending key updates per priority lane.", labelnames=("lane",)))
+
+
+@lru_cache(maxsize=64)
+def load_font(font_size: int):
+    """ フォントを読み込みます（サイズごとにキャッシュ）。 """
+    try:
+        # 日本語表示に適したフォントとして、ヒラギノ角ゴシックを使用
+        return ImageFont.truetype(r"/System/Library/Fonts/ヒラギノ角ゴシック W3.ttc", font_size)
+    except IOError:
+        return ImageFont.load_default()
+
+
+def _font_cache_stat(name: str):
+    return lambda: getattr(load_font.cache_info(), name)
+
+
+def _disk_cache_stat(name: str):
+    return lambda: render_cache.stats()[name]
+
+
+for _stat in ("hits", "misses", "currsize"):
+    cache_stats.set_function(_font_cache_stat(_stat), "font", _stat)
+
+
+def _on_queue_event(name: str, lane: str, value: float) -> None:
+    if name == "wait":
+        queue_wait_seconds.observe(value, lane)
+    elif name == "coalesced":
+        coalesced_updates.inc(lane, amount=value)
+    elif name == "deferred":
+        deferred_updates.inc(lane, amount=value)
+
+
+def _queue_depth(lane: str):
+    return lambda: writer.depth(lane)
+
+
+# 直前に描画した内容（複数キーへの同じ更新を 1 回の描画で済ませるため）
+_last_render = {"spec": None, "image": None}
+
+
+def write_key(key: int, spec) -> None:
+    """
+    書き込みスレッドから呼ばれ、spec = (text, font_size, fg, bg, max_chars) を描画してキーに書き込みます。
+    """
+    if spec != _last_render["spec"]:
+        text, font_size, fg, bg, max_chars = spec
+        width, height = deck.key_image_format()["size"]
+
+        def render():
+            img = create_wrapped_text_image(text, width, height, initial_font_size=font_size,
+                                            text_color=fg, background_color=bg, max_chars=max_chars)
+            with stage_seconds.time("native"):
+                return PILHelper.to_native_format(deck, img)
+
+        if render_cache is not None:
+            _last_render["image"] = render_cache.get_or_render(spec, render)
+        else:
+            _last_render["image"] = render()
+        _last_render["spec"] = spec
+    with deck_lock:
+        with stage_seconds.time("write"):
+            deck.set_key_image(key, _last_render["image"])
+    key_writes.inc(key)
+
+
+writer = PriorityWriter(write_key, parse_priorities(os.environ.get("STREAMDECK_KEY_PRIORITY", "")),
+                        on_event=_on_queue_event)
+rate_limiter = RateLimiter(float(os.environ.get("STREAMDECK_RATE_LIMIT", "20")),
+                           float(os.environ.get("STREAMDECK_RATE_BURST", "40")))
+for _lane in LANES:
+    queue_depth.set_function(_queue_depth(_lane), _lane)
+
+
 def parse_color(color_str: str, default: tuple) -> tuple:
     """ "R,G,B" 形式の文字列をタプル (R, G, B) に変換します。 """
     try:
@@ -67,26 +191,25 @@ def create_wrapped_text_image(text: str, width: int, height: int, initial_font_s
     emoji_font_path = "/System/Library/Fonts/Apple Color Emoji.ttc"
 
     while font_size > 10:
+        fit_iterations.inc()
         image = Image.new("RGB", (width, height), background_color)
         draw = ImageDraw.Draw(image)
-        try:
-            # 日本語表示に適したフォントとして、ヒラギノ角ゴシックを使用
-            font = ImageFont.truetype(r"/System/Library/Fonts/ヒラギノ角ゴシック W3.ttc", font_size)
-        except IOError:
-            font = ImageFont.load_default()
+        with stage_seconds.time("font_load"):
+            font = load_font(font_size)
 
         # テキストサイズの測定
-        try:
-            bbox = draw.multiline_textbbox((0, 0), text, font=font, spacing=spacing)
-        except AttributeError:
-            bbox = draw.textbbox((0, 0), text, font=font)
+        with stage_seconds.time("fit"):
+            try:
+                bbox = draw.multiline_textbbox((0, 0), text, font=font, spacing=spacing)
+            except AttributeError:
+                bbox = draw.textbbox((0, 0), text, font=font)
         text_width = bbox[2] - bbox[0]
         text_height = bbox[3] - bbox[1]
         if text_width <= width and text_height <= height:
             x = (width - text_width) // 2
             y = (height - text_height) // 2
             # pilmoji を用いて日本語と絵文字を同時に描画
-            with Pilmoji(image) as pilmoji:
+            with stage_seconds.time("draw"), Pilmoji(image) as pilmoji:
                 # fallback_fonts をインスタンス生成後に設定
                 pilmoji.fallback_fonts = [emoji_font_path]
                 pilmoji.text((x, y), text, font=font, fill=text_color, spacing=spacing, align="center")
@@ -104,8 +227,17 @@ def update_key():
     指定されたキーにテキストを表示します。
     
     複数キーはカンマ区切りで指定可能（例: key=0,1,2）。
+    描画と書き込みは書き込みスレッドで優先度順に行われます。
     """
-    global deck
+    with request_seconds.time():
+        return _handle_update()
+
+
+def _handle_update():
+    if not rate_limiter.allow(request.remote_addr or "unknown"):
+        shed_requests.inc("rate_limit")
+        return jsonify({"status": "error", "message": "rate limit exceeded"}), 429
+    parse_start = time.perf_counter()
     try:
         key_param = request.args.get("key")
         if not key_param:
@@ -121,20 +253,25 @@ def update_key():
         bg = parse_color(bg_str, (0, 0, 0))
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 400
+    stage_seconds.observe(time.perf_counter() - parse_start, "parse")
 
-    key_format = deck.key_image_format()
-    width, height = key_format["size"]
+    # 優先度クラスごとのキューに登録（描画と書き込みは書き込みスレッドで行う）
+    spec = (text, font_size, fg, bg, max_chars)
+    lanes = {key: writer.submit(key, spec) for key in keys}
 
-    # 生成する画像を作成
-    img = create_wrapped_text_image(text, width, height, initial_font_size=font_size,
-                                    text_color=fg, background_color=bg, max_chars=max_chars)
-    native_img = PILHelper.to_native_format(deck, img)
-    with deck_lock:
-        for key in keys:
-            deck.set_key_image(key, native_img)
+    print(f"Queued keys {keys} with text: {text}")
+    return jsonify({"status": "ok", "keys": keys, "text": text, "font_size": font_size, "fg": fg, "bg": bg,
+                    "max_chars": max_chars, "lanes": lanes})
 
-    print(f"Updated keys {keys} with text: {text}")
-    return jsonify({"status": "ok", "keys": keys, "text": text, "font_size": font_size, "fg": fg, "bg": bg, "max_chars": max_chars})
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """
+    /metrics エンドポイント:
+    処理段階ごとの所要時間ヒストグラム、キーごとの書き込み回数、キャッシュ統計を
+    Prometheus テキスト形式で返します。
+    """
+    return Response(registry.render(), content_type=CONTENT_TYPE)
 
 
 def run_flask_server():
@@ -145,14 +282,21 @@ def main() -> None:
     """
     メイン関数:
       - Stream Deck を初期化し、キーサイズを取得します。
-      - Flask サーバーを別スレッドで起動し、HTTP リクエストを待ち受けます。
+      - 書き込みスレッドと Flask サーバーを別スレッドで起動し、HTTP リクエストを待ち受けます。
       - メインループは単に待機し、Ctrl+C で終了します。
     """
-    global deck
+    global deck, render_cache
     deck = DeviceManager().enumerate()[0]
     deck.open()
     deck.reset()
 
+    render_cache = DiskRenderCache.from_env(deck, code_version(os.path.abspath(__file__)))
+    if render_cache is not None:
+        for stat in ("hits", "misses", "writes", "evictions", "entries", "bytes"):
+            cache_stats.set_function(_disk_cache_stat(stat), "disk", stat)
+
+    writer.start()
+
     flask_thread = threading.Thread(target=run_flask_server)
     flask_thread.daemon = True
     flask_thread.start()
@@ -162,6 +306,7 @@ def main() -> None:
         while True:
             time.sleep(0.1)
     except KeyboardInterrupt:
+        writer.stop()
         deck.reset()
         deck.close()
 
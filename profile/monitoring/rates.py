@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+ネットワーク・ディスク I/O のスループット表示
+
+psutil.net_io_counters(pernic=True) / disk_io_counters(perdisk=True) の累積カウンタの差分から
+1 秒あたりの転送量を求め、指数移動平均（EWMA）で平滑化して表示します。
+
+- デバイスごとの値は事前に確保した NumPy 配列（デバイス × フィールド）で持ち、全デバイスをまとめて計算します。
+- 経過時間は time.monotonic() で測り、平滑化の係数は経過時間から求めます（更新間隔がぶれても同じ時定数）。
+- カウンタが巻き戻った場合（再起動・オーバーフロー）は、その回の差分を 0 として扱います。
+- 表示はラベル部分を描いた下地画像をキャッシュし、値が変わったときは数字部分だけを描き直します。
+"""
+
+import functools
+import math
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+NET_FIELDS = ("bytes_sent", "bytes_recv")
+DISK_FIELDS = ("read_bytes", "write_bytes")
+
+UNITS = ("B/s", "KB/s", "MB/s", "GB/s", "TB/s")
+
+
+def format_rate(value: float) -> str:
+    """ 1 秒あたりのバイト数を単位付きの 3 桁程度の文字列にします（例: 12.3MB/s）。 """
+    unit = 0
+    while value >= 1000 and unit < len(UNITS) - 1:
+        value /= 1024
+        unit += 1
+    if value >= 100 or unit == 0:
+        return f"{value:.0f}{UNITS[unit]}"
+    if value >= 10:
+        return f"{value:.1f}{UNITS[unit]}"
+    return f"{value:.2f}{UNITS[unit]}"
+
+
+class CounterRates:
+    """
+    デバイスごとの累積カウンタから、平滑化した 1 秒あたりの増加量を求めます。
+
+    Args:
+        fields (tuple): カウンタの属性名。
+        smoothing (float): EWMA の時定数（秒）。0 なら平滑化しません。
+        capacity (int): 最初に確保するデバイス数（足りなくなったら倍に拡張）。
+    """
+
+    def __init__(self, fields: tuple, smoothing: float = 3.0, capacity: int = 16):
+        self.fields = tuple(fields)
+        self.smoothing = smoothing
+        self.devices = {}  # デバイス名 -> 行番号
+        shape = (capacity, len(self.fields))
+        self._current = np.zeros(shape, dtype=np.float64)
+        self._previous = np.zeros(shape, dtype=np.float64)
+        self._rates = np.zeros(shape, dtype=np.float64)
+        self._seen = np.zeros(capacity, dtype=bool)  # 前回の値があるか
+        self._last_time = None
+
+    def _grow(self) -> None:
+        capacity = len(self._seen) * 2
+        for name in ("_current", "_previous", "_rates"):
+            old = getattr(self, name)
+            new = np.zeros((capacity, len(self.fields)), dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+        seen = np.zeros(capacity, dtype=bool)
+        seen[:len(self._seen)] = self._seen
+        self._seen = seen
+
+    def update(self, counters: dict, now: float = None) -> dict:
+        """
+        {デバイス名: カウンタ} を取り込み、{デバイス名: 平滑化したレートの配列} を返します。
+        "total" には全デバイスの合計が入ります。
+        """
+        now = time.monotonic() if now is None else now
+        present = np.zeros(len(self._seen), dtype=bool)
+        for device, counter in counters.items():
+            row = self.devices.get(device)
+            if row is None:
+                row = len(self.devices)
+                if row >= len(self._seen):
+                    self._grow()
+                    present = np.concatenate((present, np.zeros(len(self._seen) - len(present), dtype=bool)))
+                self.devices[device] = row
+            self._current[row] = [getattr(counter, field) for field in self.fields]
+            present[row] = True
+
+        if self._last_time is not None and now > self._last_time:
+            dt = now - self._last_time
+            valid = present & self._seen
+            delta = np.maximum(self._current - self._previous, 0.0)
+            rate = delta / dt
+            alpha = 1.0 - math.exp(-dt / self.smoothing) if self.smoothing > 0 else 1.0
+            self._rates[valid] += alpha * (rate[valid] - self._rates[valid])
+        self._rates[~present] = 0.0
+        self._previous[present] = self._current[present]
+        self._seen = present
+        self._last_time = now
+
+        result = {device: self._rates[row].copy() for device, row in self.devices.items()}
+        result["total"] = self._rates[:len(self.devices)].sum(axis=0)
+        return result
+
+    def field_index(self, field: str) -> int:
+        return self.fields.index(field)
+
+
+@functools.lru_cache(maxsize=8)
+def _font(size: int):
+    try:
+        return ImageFont.truetype("/System/Library/Fonts/Supplemental/AppleGothic.ttf", size)
+    except IOError:
+        try:
+            return ImageFont.load_default(size)
+        except TypeError:  # Pillow 10.1 より前
+            return ImageFont.load_default()
+
+
+class RateTile:
+    """
+    1 デバイス・1 フィールドのスループットを表示するタイル。
+
+    Args:
+        key (int): 表示するキー番号。
+        source (str): "net_rate" または "disk_rate"。
+        device (str): デバイス名（"eth0", "sda" など）。"total" で全デバイスの合計。
+        field (str): "bytes_sent" / "bytes_recv"（ネットワーク）、"read_bytes" / "write_bytes"（ディスク）。
+        label (str): 上段に表示するラベル（省略時は "デバイス名 フィールド"）。
+        interval (float): 更新間隔（秒）。
+        background (tuple): 背景色 (R, G, B)。
+    """
+
+    def __init__(self, key: int, source: str = "net_rate", device: str = "total", field: str = "bytes_recv",
+                 label: str = None, interval: float = 1.0, background=(0, 0, 64), arg=None):
+        fields = {"net_rate": NET_FIELDS, "disk_rate": DISK_FIELDS}.get(source)
+        if fields is None:
+            raise ValueError(f"unknown rate source: {source}")
+        if field not in fields:
+            raise ValueError(f"unknown {source} field: {field} (expected one of {', '.join(fields)})")
+        if not float(interval) > 0:
+            raise ValueError(f"interval must be positive: {interval}")
+        self.key = key
+        self.keys = [key]
+        self.source = source
+        self.arg = arg
+        self.device = device
+        self.field = field
+        self._field_index = fields.index(field)
+        self.label = label if label is not None else f"{device}\n{field.replace('_bytes', '').replace('bytes_', '')}"
+        self.interval = float(interval)
+        self.background = tuple(background)
+        self._base = None  # ラベルだけを描いた下地画像
+
+    def requires(self) -> list:
+        return [(self.source, self.arg)]
+
+    def state(self, values: dict):
+        rates = values[(self.source, self.arg)]
+        if self.device not in rates:
+            return f"{self.device}?"
+        return format_rate(float(rates[self.device][self._field_index]))
+
+    def _base_image(self, width: int, height: int) -> Image.Image:
+        if self._base is None or self._base.size != (width, height):
+            self._base = Image.new("RGB", (width, height), self.background)
+            ImageDraw.Draw(self._base).multiline_text((4, 4), self.label, fill=(180, 180, 180),
+                                                      font=_font(height // 6), spacing=2)
+        return self._base
+
+    def render(self, renderer, state) -> dict:
+        # 下地画像をコピーして数字部分だけを描く
+        img = self._base_image(renderer.width, renderer.height).copy()
+        draw = ImageDraw.Draw(img)
+        font = _font(renderer.height // 5)
+        text_width = draw.textlength(state, font=font)
+        draw.text(((renderer.width - text_width) // 2, renderer.height * 3 // 5), state,
+                  fill=(255, 255, 255), font=font)
+        return {self.key: renderer.image(img)}
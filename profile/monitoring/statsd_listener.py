@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+ローカル UDP（statsd 形式）のメトリクス受信
+
+同じホストのサービスから、HTTP（product-02 の /update）を使わずにカウンタやゲージを送れるようにします。
+
+    echo "jobs.done:1|c" | nc -u -w0 127.0.0.1 8125
+    echo "queue.depth:42|g" | nc -u -w0 127.0.0.1 8125
+    echo "api.latency:12.5|ms" | nc -u -w0 127.0.0.1 8125
+
+- 受信スレッドは 1 回の待機で届いたデータグラムをまとめて読み出し（recvmmsg に相当するバッチ読み出し）、
+  事前に確保したバッファに改行区切りで詰めてから一度に解析します。
+- 集計はメトリクス名ごとに割り当てたスロット番号で、事前に確保したリストに加算するだけです。
+- flush 間隔ごとに集計結果を不変の辞書として公開し、表示側（dashboard の "statsd" 取得元）は
+  到着頻度に関係なく自分の更新間隔でその辞書を読むだけです。
+
+公開する値:
+    カウンタ (c)       名前 -> 1 秒あたりの件数
+    ゲージ (g)         名前 -> 最新値（"+N" / "-N" は相対変更）
+    タイマー (ms, h)   名前 -> 平均、名前.max -> 最大、名前.count -> 件数
+"""
+
+import select
+import socket
+import threading
+import time
+
+BATCH = 1024          # 1 回にまとめて読み出す最大データグラム数
+DATAGRAM_SIZE = 65535
+
+KIND_COUNTER = 0
+KIND_GAUGE = 1
+KIND_TIMER = 2
+_KINDS = {b"c": KIND_COUNTER, b"g": KIND_GAUGE, b"ms": KIND_TIMER, b"h": KIND_TIMER}
+
+
+class Snapshot(dict):
+    """ 公開用の集計結果。まだ届いていないメトリクスは 0 を返します。 """
+
+    def __missing__(self, key):
+        return 0
+
+
+class StatsdAggregator:
+    """
+    statsd 形式の行を解析して集計します。
+
+    Args:
+        capacity (int): 最初に確保するメトリクス数（足りなくなったら倍に拡張）。
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.slots = {}       # メトリクス名（bytes）-> スロット番号
+        self.names = []       # スロット番号 -> メトリクス名（str）
+        self.kinds = []
+        self._capacity = 0
+        self.sums = []
+        self.counts = []
+        self.maxes = []
+        self.gauges = []
+        self.lines = 0
+        self.errors = 0
+        self._grow(capacity)
+
+    def _grow(self, capacity: int) -> None:
+        extra = capacity - self._capacity
+        self.sums.extend([0.0] * extra)
+        self.counts.extend([0] * extra)
+        self.maxes.extend([float("-inf")] * extra)
+        self.gauges.extend([0.0] * extra)
+        self._capacity = capacity
+
+    def _slot(self, name: bytes, kind: int) -> int:
+        slot = len(self.names)
+        if slot >= self._capacity:
+            self._grow(self._capacity * 2)
+        self.slots[name] = slot
+        self.names.append(name.decode("utf-8", "replace"))
+        self.kinds.append(kind)
+        return slot
+
+    def ingest(self, data: bytes) -> None:
+        """ 改行区切りの statsd 行（複数データグラムを連結したもの）を集計します。 """
+        slots = self.slots
+        sums = self.sums
+        counts = self.counts
+        maxes = self.maxes
+        gauges = self.gauges
+        lines = data.split(b"\n")
+        for line in lines:
+            name, sep, rest = line.partition(b":")
+            if not sep:
+                if line.strip():
+                    self.errors += 1
+                continue
+            value, _, kind = rest.partition(b"|")
+            rate = 1.0
+            if b"|" in kind:
+                kind, _, options = kind.partition(b"|")
+                if options[:1] == b"@":
+                    try:
+                        rate = float(options[1:]) or 1.0
+                    except ValueError:
+                        rate = 1.0
+            slot = slots.get(name)
+            try:
+                if slot is None:
+                    slot = self._slot(name, _KINDS[kind.strip()])
+                    sums, counts, maxes, gauges = self.sums, self.counts, self.maxes, self.gauges
+                number = float(value)
+            except (KeyError, ValueError):
+                self.errors += 1
+                continue
+            kind_id = self.kinds[slot]
+            if kind_id == KIND_COUNTER:
+                sums[slot] += number / rate
+            elif kind_id == KIND_GAUGE:
+                if value[:1] in (b"+", b"-"):
+                    gauges[slot] += number
+                else:
+                    gauges[slot] = number
+            else:
+                sums[slot] += number
+                counts[slot] += 1
+                if number > maxes[slot]:
+                    maxes[slot] = number
+        self.lines += len(lines)
+
+    def flush(self, elapsed: float) -> Snapshot:
+        """ elapsed 秒ぶんの集計結果を返し、カウンタとタイマーをリセットします。 """
+        result = Snapshot()
+        elapsed = elapsed if elapsed > 0 else 1.0
+        for slot, name in enumerate(self.names):
+            kind = self.kinds[slot]
+            if kind == KIND_COUNTER:
+                result[name] = self.sums[slot] / elapsed
+                self.sums[slot] = 0.0
+            elif kind == KIND_GAUGE:
+                result[name] = self.gauges[slot]
+            else:
+                count = self.counts[slot]
+                result[name] = self.sums[slot] / count if count else 0.0
+                result[name + ".max"] = self.maxes[slot] if count else 0.0
+                result[name + ".count"] = count
+                self.sums[slot] = 0.0
+                self.counts[slot] = 0
+                self.maxes[slot] = float("-inf")
+        return result
+
+
+class StatsdListener:
+    """
+    UDP で statsd 形式の行を受信し、flush 間隔ごとに集計結果を公開するスレッド。
+
+    Args:
+        host (str): 待ち受けアドレス（既定はローカルのみ）。
+        port (int): 待ち受けポート。
+        flush_interval (float): 集計結果を公開する間隔（秒）。
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8125, flush_interval: float = 1.0):
+        self.host = host
+        self.port = port
+        self.flush_interval = flush_interval
+        self.aggregator = StatsdAggregator()
+        self.latest = Snapshot()   # 代入のみで更新するためロック不要
+        self.datagrams = 0
+        self.batches = 0
+        self._sock = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()  # start() / stop() の排他
+        # 受信バッファ（データグラムを改行区切りで詰める）
+        self._buffer = bytearray(256 * 1024)
+        self._view = memoryview(self._buffer)
+        self._filled = 0
+
+    def bind(self) -> None:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8 * 1024 * 1024)
+        except OSError:
+            pass
+        sock.bind((self.host, self.port))
+        sock.setblocking(False)
+        self.port = sock.getsockname()[1]
+        self._sock = sock
+
+    def _drain(self) -> int:
+        """
+        すでに届いているデータグラムを、バッファがいっぱいになるか BATCH 件まで読み出します。
+        読み出した件数を返し、内容は改行区切りで self._buffer の先頭から詰めます。
+        """
+        recv_into = self._sock.recv_into
+        view = self._view
+        limit = len(self._buffer) - DATAGRAM_SIZE - 1
+        offset = 0
+        count = 0
+        try:
+            while count < BATCH and offset <= limit:
+                size = recv_into(view[offset:offset + DATAGRAM_SIZE])
+                offset += size
+                self._buffer[offset] = 10  # b"\n"
+                offset += 1
+                count += 1
+        except (BlockingIOError, InterruptedError):
+            pass
+        self._filled = offset
+        return count
+
+    def _run(self) -> None:
+        sock = self._sock
+        last_flush = time.monotonic()
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if now - last_flush >= self.flush_interval:
+                self.latest = self.aggregator.flush(now - last_flush)
+                last_flush = now
+            timeout = max(0.001, self.flush_interval - (now - last_flush))
+            try:
+                readable, _, _ = select.select([sock], [], [], timeout)
+            except (OSError, ValueError):
+                if self._stop.is_set():
+                    return
+                raise
+            if not readable:
+                continue
+            try:
+                count = self._drain()
+            except OSError:
+                if self._stop.is_set():
+                    return
+                raise
+            if count:
+                self.datagrams += count
+                self.batches += 1
+                self.aggregator.ingest(bytes(self._view[:self._filled]))
+
+    def start(self) -> None:
+        """ 受信を開始します。受信中なら何もしません。stop() のあとに再開することもできます。 """
+        with self._lock:
+            if self._thread is not None:
+                return
+            if self._sock is None:
+                self.bind()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="statsd-listener", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        with self._lock:
+            self._stop.set()
+            if self._thread is not None:
+                self._thread.join()
+                self._thread = None
+            if self._sock is not None:
+                self._sock.close()
+                self._sock = None
+
+    def snapshot(self) -> Snapshot:
+        """ 最後に公開した集計結果を返します（start() する前は空の集計結果です）。 """
+        return self.latest
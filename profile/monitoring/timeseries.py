@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+メトリクスの時系列（リングバッファ）と履歴グラフの描画
+
+- RingBuffer: NumPy 配列による固定長のリングバッファ。追加は O(1)、メモリは系列ごとに固定です。
+- render_history: 履歴をスパークライン（折れ線）または棒グラフとしてキー画像（NumPy 配列）に描画します。
+  サンプルごとに draw.line を呼ぶのではなく、列ごとの塗りつぶし範囲をまとめて計算して一度に塗ります。
+"""
+
+import numpy as np
+
+MISSING = np.nan  # まだサンプルがない位置（負の値も正しく扱えるよう NaN にしています）
+
+
+class RingBuffer:
+    """
+    固定長のリングバッファ。
+
+    Args:
+        capacity (int): 保持するサンプル数。
+        dtype: NumPy のデータ型（既定 float32）。window() を使う場合は MISSING を表せる浮動小数点型にします。
+    """
+
+    def __init__(self, capacity: int, dtype=np.float32):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=dtype)
+        self._index = 0  # 次に書き込む位置
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, value: float) -> None:
+        self._data[self._index] = value
+        self._index = (self._index + 1) % self.capacity
+        if self._count < self.capacity:
+            self._count += 1
+
+    def last(self):
+        """ 最新のサンプルを返します（空なら None）。 """
+        if self._count == 0:
+            return None
+        return self._data[self._index - 1].item()
+
+    def values(self) -> np.ndarray:
+        """ 古い順に並べたサンプルのコピーを返します。 """
+        if self._count < self.capacity:
+            return self._data[:self._count].copy()
+        return np.concatenate((self._data[self._index:], self._data[:self._index]))
+
+    def window(self) -> np.ndarray:
+        """ 長さ capacity の配列を返します。まだサンプルのない先頭部分は MISSING で埋めます。 """
+        if self._count < self.capacity:
+            out = np.full(self.capacity, MISSING, dtype=self._data.dtype)
+            out[self.capacity - self._count:] = self._data[:self._count]
+            return out
+        return self.values()
+
+
+def resample(values: np.ndarray, width: int) -> np.ndarray:
+    """
+    サンプル列を width 列に変換します。
+    サンプル数が多い場合は列ごとの最大値（MISSING は無視）、少ない場合は最も近いサンプルを使います。
+    """
+    n = len(values)
+    if n == 0:
+        return np.full(width, MISSING, dtype=np.float32)
+    if n >= width:
+        starts = (np.arange(width) * n) // width
+        return np.fmax.reduceat(values, starts)
+    return values[(np.arange(width) * n) // width]
+
+
+def render_history(values: np.ndarray, width: int, height: int, vmax: float = 100.0,
+                   style: str = "sparkline", color: tuple = (0, 255, 0),
+                   background_color: tuple = (0, 0, 0)) -> np.ndarray:
+    """
+    履歴を height × width × 3（uint8）の画像配列として描画します。
+
+    Args:
+        values (np.ndarray): 古い順のサンプル（MISSING は描画しない）。
+        style (str): "sparkline"（折れ線）または "bars"（棒グラフ）。
+        vmax (float): 上端に対応する値。0 以下なら表示範囲内の最大値を使います。
+    """
+    columns = resample(np.asarray(values, dtype=np.float32), width)
+    present = ~np.isnan(columns)
+    if vmax <= 0:
+        vmax = float(np.nanmax(columns)) if present.any() and np.nanmax(columns) > 0 else 1.0
+    # 各列の値に対応する y 座標（下端 = height - 1）。負の値は下端に描きます
+    level = np.clip(np.where(present, columns, 0.0) / vmax, 0.0, 1.0)
+    y = (height - 1) - np.rint(level * (height - 1)).astype(np.int32)
+
+    rows = np.arange(height, dtype=np.int32)[:, None]
+    if style == "bars":
+        mask = rows >= y[None, :]
+    else:
+        # 前の列とのあいだを縦に埋めて線をつなげる
+        prev = np.concatenate((y[:1], y[:-1]))
+        prev_present = np.concatenate((present[:1], present[:-1]))
+        prev = np.where(prev_present, prev, y)
+        lo = np.minimum(y, prev)
+        hi = np.maximum(y, prev)
+        mask = (rows >= lo[None, :]) & (rows <= hi[None, :])
+    mask &= present[None, :]
+
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:] = background_color
+    frame[mask] = color
+    return frame
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+優先度付きキー更新キューとクライアントごとのレート制限
+
+product-02 の /update で受け付けた更新を、キーごとの優先度クラス（high / normal / low）に振り分け、
+1 本の書き込みスレッドが優先度の高いものから描画・書き込みします。
+
+- 同じキーへの未処理の更新は最新のものだけを残します（coalesce）。
+- クライアント IP ごとのトークンバケットで、過剰なリクエストは受付時に破棄します（shed）。
+- 上位の優先度の処理によって後回しにされた更新は deferred として数えます。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+LANES = ("high", "normal", "low")
+DEFAULT_LANE = "normal"
+
+
+def parse_priorities(setting: str) -> dict:
+    """
+    "high=0-2,31;low=16-23" 形式の文字列を {キー番号: 優先度クラス} に変換します。
+    指定のないキーは DEFAULT_LANE になります。
+    """
+    priorities = {}
+    for part in setting.split(";"):
+        if "=" not in part:
+            continue
+        lane, keys = part.split("=", 1)
+        lane = lane.strip()
+        if lane not in LANES:
+            raise ValueError(f"unknown priority class: {lane}")
+        for item in keys.split(","):
+            item = item.strip()
+            if not item:
+                continue
+            if "-" in item:
+                first, last = item.split("-", 1)
+                for key in range(int(first), int(last) + 1):
+                    priorities[key] = lane
+            else:
+                priorities[int(item)] = lane
+    return priorities
+
+
+class RateLimiter:
+    """
+    クライアント（IP）ごとのトークンバケット。
+
+    Args:
+        rate (float): 1 秒あたりに補充するトークン数。
+        burst (float): バケットの容量。
+    """
+
+    def __init__(self, rate: float, burst: float, max_clients: int = 1024):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = {}  # client -> [tokens, last_time]
+        self._lock = threading.Lock()
+
+    def allow(self, client: str, cost: float = 1.0) -> bool:
+        """ トークンが残っていれば消費して True を返します。 """
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                if len(self._buckets) >= self.max_clients:
+                    self._prune(now)
+                bucket = [self.burst, now]
+                self._buckets[client] = bucket
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens < cost:
+                bucket[0] = tokens
+                return False
+            bucket[0] = tokens - cost
+            return True
+
+    def _prune(self, now: float) -> None:
+        """ 満タンまで回復しているクライアントを削除します。 """
+        refill = self.burst / self.rate if self.rate > 0 else float("inf")
+        for client, (_, last) in list(self._buckets.items()):
+            if now - last >= refill:
+                del self._buckets[client]
+
+
+class PriorityWriter:
+    """
+    優先度ごとのキューを持つ書き込みスレッド。
+
+    Args:
+        write (callable): write(key, spec) で 1 キーを描画・書き込みする関数。
+        priorities (dict): parse_priorities() の戻り値。
+        on_event (callable): on_event(name, lane, value) で統計を通知する関数（省略可）。
+            name は "coalesced" / "deferred" / "wait"。
+    """
+
+    def __init__(self, write, priorities: dict = None, on_event=None):
+        self.write = write
+        self.priorities = priorities or {}
+        self.on_event = on_event or (lambda name, lane, value: None)
+        # lane -> OrderedDict(key -> (spec, enqueue_time, served_above_snapshot))
+        self._pending = {lane: OrderedDict() for lane in LANES}
+        self._served = {lane: 0 for lane in LANES}
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def lane_of(self, key: int) -> str:
+        return self.priorities.get(key, DEFAULT_LANE)
+
+    def _served_above(self, lane: str) -> int:
+        return sum(self._served[l] for l in LANES[:LANES.index(lane)])
+
+    def submit(self, key: int, spec) -> str:
+        """ 更新を登録し、振り分けた優先度クラスを返します。 """
+        lane = self.lane_of(key)
+        with self._cond:
+            queue = self._pending[lane]
+            if key in queue:
+                # 未処理の古い更新は捨てて最新の内容だけを書き込む
+                _, enqueued, snapshot = queue.pop(key)
+                self.on_event("coalesced", lane, 1)
+            else:
+                enqueued, snapshot = time.monotonic(), self._served_above(lane)
+            queue[key] = (spec, enqueued, snapshot)
+            self._cond.notify()
+        return lane
+
+    def depth(self, lane: str) -> int:
+        with self._cond:
+            return len(self._pending[lane])
+
+    def _next(self):
+        for lane in LANES:
+            queue = self._pending[lane]
+            if queue:
+                key, (spec, enqueued, snapshot) = queue.popitem(last=False)
+                deferred = self._served_above(lane) != snapshot
+                self._served[lane] += 1
+                return lane, key, spec, enqueued, deferred
+        return None
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                item = self._next()
+                while item is None and self._running:
+                    self._cond.wait()
+                    item = self._next()
+                if item is None:
+                    return
+            lane, key, spec, enqueued, deferred = item
+            self.on_event("wait", lane, time.monotonic() - enqueued)
+            if deferred:
+                self.on_event("deferred", lane, 1)
+            try:
+                self.write(key, spec)
+            except Exception as e:
+                print(f"Failed to update key {key}: {e}")
+
+    def start(self) -> None:
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """ 残っている更新を書き込んでからスレッドを終了します。 """
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
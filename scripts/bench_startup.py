@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+起動時間のベンチマーク（最初のキー画像が表示されるまでの時間）
+
+各スクリプトを `python -X importtime` の子プロセスで実行し、起動してからデッキに最初のキー画像を書き込むまでの時間と、
+それまでにかかった import の時間（重い描画バックエンド gi / cairo / cv2 の内訳つき）を表示します。
+デッキは StreamDeck ライブラリの仮想デバイス（transport="dummy"）に差し替えるので、実機は不要です。
+最初の set_key_image() が呼ばれた時点で子プロセスを終了します。
+
+    python scripts/bench_startup.py                       # gallery/ と profile/ のデッキを使うスクリプトすべて
+    python scripts/bench_startup.py gallery/game/title_0*.py --repeat 5
+    python scripts/bench_startup.py --json startup.json   # 結果を保存
+    python scripts/bench_startup.py --baseline startup.json   # 保存した結果との差を表示
+
+時間がかかりすぎたもの（--timeout 秒）や、キー画像を書き込む前に終了・失敗したものはその旨を表示します。
+"""
+
+import argparse
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+HEAVY_MODULES = ("gi", "cairo", "cv2")
+
+# 子プロセスで実行するコード: DeviceManager を仮想デバイスに差し替えてからスクリプトを実行する
+BOOTSTRAP = r"""
+import os, runpy, sys, time
+import StreamDeck.DeviceManager as device_manager
+
+script, deck_type = sys.argv[1], sys.argv[2]
+
+
+def first_key_image(self, key, image):
+    sys.stdout.write(f"first-key {time.monotonic()}\n")
+    sys.stdout.flush()
+    os._exit(0)
+
+
+class BenchDeviceManager(device_manager.DeviceManager):
+    def __init__(self, transport=None):
+        super().__init__(transport="dummy")
+
+    def enumerate(self):
+        decks = [deck for deck in super().enumerate() if deck.deck_type() == deck_type]
+        for deck in decks:
+            type(deck).set_key_image = first_key_image
+        return decks
+
+
+device_manager.DeviceManager = BenchDeviceManager
+sys.argv = [script]
+sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+runpy.run_path(script, run_name="__main__")
+"""
+
+
+def default_scripts() -> list:
+    """ gallery/ と profile/ のうち、DeviceManager() でデッキを開くスクリプトの一覧を返します。 """
+    scripts = []
+    for pattern in ("gallery/**/*.py", "profile/**/*.py"):
+        for path in sorted(glob.glob(os.path.join(ROOT, pattern), recursive=True)):
+            with open(path, encoding="utf-8") as f:
+                if "DeviceManager()" in f.read():
+                    scripts.append(path)
+    return scripts
+
+
+def parse_importtime(stderr: str):
+    """
+    -X importtime の出力から (import の合計時間, {重いモジュール: 累積時間}, それ以外の行) を返します（時間は秒）。
+    """
+    total = 0.0
+    heavy = {}
+    other = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            other.append(line)
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # 見出しの行
+        self_us, cumulative_us, name = int(fields[0]), int(fields[1]), fields[2]
+        total += self_us / 1e6
+        if name.strip() in HEAVY_MODULES:
+            heavy[name.strip()] = cumulative_us / 1e6  # 各モジュールは最初に import されたときの 1 行だけ
+    return total, heavy, other
+
+
+def measure(script: str, deck_type: str, timeout: float) -> dict:
+    """ スクリプトを 1 回実行し、最初のキー画像までの時間などを返します。 """
+    started = time.monotonic()
+    try:
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", BOOTSTRAP, script, deck_type],
+                                cwd=ROOT, capture_output=True, text=True, timeout=timeout, check=False)
+    except subprocess.TimeoutExpired as e:
+        stderr = e.stderr.decode("utf-8", "replace") if isinstance(e.stderr, bytes) else (e.stderr or "")
+        imports, heavy, _ = parse_importtime(stderr)
+        return {"first_key": None, "imports": imports, "heavy": heavy, "error": f"timeout ({timeout:g}s)"}
+    imports, heavy, other = parse_importtime(result.stderr)
+    for line in result.stdout.splitlines():
+        if line.startswith("first-key "):
+            return {"first_key": float(line.split()[1]) - started, "imports": imports, "heavy": heavy, "error": None}
+    message = next((line for line in reversed(other) if line.strip()), f"exit {result.returncode}")
+    return {"first_key": None, "imports": imports, "heavy": heavy, "error": message.strip()}
+
+
+def bench(script: str, deck_type: str, timeout: float, repeat: int) -> dict:
+    """ repeat 回実行し、最初のキー画像までの時間の中央値を代表値とします（import の内訳は最後の成功した回）。 """
+    runs = [measure(script, deck_type, timeout) for _ in range(repeat)]
+    ok = [run for run in runs if run["first_key"] is not None]
+    if not ok:
+        return runs[-1]
+    result = dict(ok[-1])
+    result["first_key"] = statistics.median(run["first_key"] for run in ok)
+    return result
+
+
+def format_ms(seconds) -> str:
+    return "-" if seconds is None else f"{seconds * 1000:.0f} ms"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scripts", nargs="*", help="計測するスクリプト（省略時はデッキを使うスクリプトすべて）")
+    parser.add_argument("--deck", default="Stream Deck XL", help="仮想デバイスの機種")
+    parser.add_argument("--repeat", type=int, default=3, help="1 スクリプトあたりの実行回数")
+    parser.add_argument("--timeout", type=float, default=10.0, help="1 回の実行の制限時間（秒）")
+    parser.add_argument("--json", help="結果を保存する JSON ファイル")
+    parser.add_argument("--baseline", help="比較する以前の結果（--json で保存したもの）")
+    args = parser.parse_args()
+
+    scripts = [os.path.abspath(path) for path in args.scripts] or default_scripts()
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    results = {}
+    width = max(len(os.path.relpath(path, ROOT)) for path in scripts)
+    print(f"{'script':<{width}}  {'first key':>9}  {'imports':>8}  {'change':>8}  heavy imports / error")
+    for path in scripts:
+        name = os.path.relpath(path, ROOT)
+        result = bench(path, args.deck, args.timeout, args.repeat)
+        results[name] = result
+        change = ""
+        before = baseline.get(name, {}).get("first_key")
+        if before is not None and result["first_key"] is not None:
+            change = f"{(result['first_key'] - before) * 1000:+.0f} ms"
+        detail = ", ".join(f"{module} {seconds * 1000:.0f} ms" for module, seconds in sorted(result["heavy"].items()))
+        if result["error"]:
+            detail = result["error"]
+        print(f"{name:<{width}}  {format_ms(result['first_key']):>9}  {format_ms(result['imports']):>8}  "
+              f"{change:>8}  {detail}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"deck": args.deck, "python": sys.version.split()[0], "results": results}, f,
+                      ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
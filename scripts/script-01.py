@@ -1,12 +1,53 @@
 #!/usr/bin/env python3
-import gi, cairo
-gi.require_version('Pango', '1.0')
-gi.require_version('PangoCairo', '1.0')
-from gi.repository import Pango, PangoCairo
-from PIL import Image
+"""
+絵文字の画像を生成するスクリプト
+
+引数なしで実行すると、従来どおりスロットのシンボル（assets/slot_images/*.png）を 200×200 で 1 枚ずつ生成します。
+
+--sheet を指定するとまとめて生成するモードになり、絵文字の一覧をプロセスプールで並列に描画して、
+1 枚のスプライトシート（PNG）とその索引（JSON）に詰めます。
+- 各絵文字を Stream Deck の各機種のキーサイズ（--sizes で指定可）ごとに描くので、実行時にリサイズは不要です。
+- 索引には入力（絵文字の一覧・サイズ・このスクリプトのソース）のハッシュとシートのハッシュを記録し、
+  どちらも変わっていなければ何もせずに終了します。
+
+    python scripts/script-01.py --sheet assets/emoji_sheet
+    python scripts/script-01.py --sheet assets/emoji_sheet --emoji-file emojis.txt --sizes 72x72,96x96
+
+索引（emoji_sheet.json）の形式:
+    {"inputs": 入力のハッシュ, "sheet": シートのハッシュ, "image": "emoji_sheet.png",
+     "emoji": {名前: 絵文字}, "sizes": {"96x96": {名前: [x, y, 幅, 高さ], ...}, ...}}
+"""
+
+import argparse
+import concurrent.futures
+import hashlib
+import io
+import json
+import os
 import sys
 
-def generate_emoji_image(emoji, output_filename, width=200, height=200, pointsize=120):
+from PIL import Image
+from StreamDeck.DeviceManager import DeviceManager
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from deckkit.render_cache import code_version  # pylint: disable=wrong-import-position
+from deckkit.rendering import Pango, PangoCairo, cairo  # pylint: disable=wrong-import-position
+
+# スロットのシンボル（引数なしの場合と --emoji-file を省略した場合に使用）
+SLOT_EMOJIS = {
+    "cherry": "🍒",
+    "lemon": "🍋",
+    "orange": "🍊",
+    "grape": "🍇",
+    "star": "⭐",
+    "diamond": "💎"
+}
+
+def render_emoji(emoji, width=200, height=200, pointsize=120):
+    """
+    絵文字を白背景に描いた PNG のバイト列を返します。
+    位置の補正は 200×200 のときの値を基準に、画像サイズに合わせて縮めます。
+    """
     surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)  # type: ignore
     ctx = cairo.Context(surface)  # type: ignore
 
@@ -21,23 +62,130 @@ def generate_emoji_image(emoji, output_filename, width=200, height=200, pointsiz
     layout.set_font_description(font_desc)
 
     _, logical_rect = layout.get_pixel_extents()
-    x = (width - logical_rect.width) // 2 - 20
-    y = (height - logical_rect.height) // 2 + 4
+    x = (width - logical_rect.width) // 2 - round(20 * width / 200)
+    y = (height - logical_rect.height) // 2 + round(4 * height / 200)
     ctx.move_to(x, y)
     PangoCairo.show_layout(ctx, layout)
 
-    surface.write_to_png(output_filename)
+    output = io.BytesIO()
+    surface.write_to_png(output)
+    return output.getvalue()
+
+def generate_emoji_image(emoji, output_filename, width=200, height=200, pointsize=120):
+    with open(output_filename, "wb") as f:
+        f.write(render_emoji(emoji, width, height, pointsize))
+
+def render_tile(task):
+    """
+    プロセスプールのワーカーで 1 枚描画します。task は (名前, 絵文字, 幅, 高さ) です。
+    """
+    name, emoji, width, height = task
+    return name, width, height, render_emoji(emoji, width, height, pointsize=120 * min(width, height) // 200)
+
+def deck_key_sizes():
+    """ StreamDeck ライブラリが対応している各機種のキー画像のサイズ（重複なし、小さい順）を返します。 """
+    sizes = set()
+    for deck in DeviceManager(transport="dummy").enumerate():
+        if deck.key_count() > 0:
+            width, height = deck.key_image_format()["size"]
+            if width and height:
+                sizes.add((width, height))
+    return sorted(sizes)
+
+def parse_sizes(value):
+    """ "72x72,96x96" を [(72, 72), (96, 96)] に変換します。 """
+    sizes = []
+    for part in value.split(","):
+        width, height = (int(n) for n in part.lower().split("x"))
+        sizes.append((width, height))
+    return sizes
+
+def load_emoji_file(path):
+    """ 1 行に「名前 絵文字」を書いたファイルを読み込みます（空行と # で始まる行は無視します）。 """
+    emojis = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            name, emoji = line.split(None, 1)
+            emojis[name] = emoji
+    return emojis
+
+def input_hash(emojis, sizes):
+    """ 絵文字の一覧・サイズ・このスクリプトのソースのハッシュを返します。 """
+    payload = json.dumps({"emoji": emojis, "sizes": sizes, "code": code_version(os.path.abspath(__file__))},
+                         ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def file_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def build_sheet(emojis, sizes, output, workers=None):
+    """
+    output.png（スプライトシート）と output.json（索引）を作ります。
+    入力とシートが前回から変わっていなければ何もせず False を返します。
+
+    シートはサイズごとに 1 行で、各行に絵文字を一覧の順に並べます。
+    """
+    image_path, index_path = output + ".png", output + ".json"
+    inputs = input_hash(emojis, sizes)
+    try:
+        with open(index_path, encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("inputs") == inputs and index.get("sheet") == file_hash(image_path):
+            return False
+    except (OSError, ValueError):
+        pass
+
+    tasks = [(name, emoji, width, height) for width, height in sizes for name, emoji in emojis.items()]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        tiles = {(name, width, height): png for name, width, height, png in pool.map(render_tile, tasks)}
+
+    sheet_width = max(width * len(emojis) for width, _ in sizes)
+    sheet_height = sum(height for _, height in sizes)
+    sheet = Image.new("RGB", (sheet_width, sheet_height), (255, 255, 255))
+    index = {"inputs": inputs, "image": os.path.basename(image_path), "emoji": emojis, "sizes": {}}
+    y = 0
+    for width, height in sizes:
+        placements = {}
+        for i, name in enumerate(emojis):
+            x = i * width
+            sheet.paste(Image.open(io.BytesIO(tiles[(name, width, height)])).convert("RGB"), (x, y))
+            placements[name] = [x, y, width, height]
+        index["sizes"][f"{width}x{height}"] = placements
+        y += height
+
+    os.makedirs(os.path.dirname(os.path.abspath(image_path)), exist_ok=True)
+    sheet.save(image_path, optimize=True)
+    index["sheet"] = file_hash(image_path)
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sheet", help="スプライトシートの出力先（拡張子なし。.png と .json を書き出します）")
+    parser.add_argument("--emoji-file", help="「名前 絵文字」を 1 行ずつ書いたファイル（省略時はスロットのシンボル）")
+    parser.add_argument("--sizes", help="キー画像のサイズ（例: 72x72,96x96。省略時は対応している全機種）")
+    parser.add_argument("--workers", type=int, default=None, help="描画に使うプロセス数（省略時は CPU 数）")
+    args = parser.parse_args()
+
+    if args.sheet is None:
+        for name, emoji in SLOT_EMOJIS.items():
+            output = f"assets/slot_images/{name}.png"
+            generate_emoji_image(emoji, output)
+            print(f"Generated {output}")
+        return
+
+    emojis = load_emoji_file(args.emoji_file) if args.emoji_file else SLOT_EMOJIS
+    sizes = parse_sizes(args.sizes) if args.sizes else deck_key_sizes()
+    if build_sheet(emojis, sizes, args.sheet, workers=args.workers):
+        print(f"Generated {args.sheet}.png and {args.sheet}.json "
+              f"({len(emojis)} emoji x {len(sizes)} sizes)")
+    else:
+        print(f"{args.sheet}.png is up to date")
 
 if __name__ == "__main__":
-    emojis = {
-        "cherry": "🍒",
-        "lemon": "🍋",
-        "orange": "🍊",
-        "grape": "🍇",
-        "star": "⭐",
-        "diamond": "💎"
-    }
-    for name, emoji in emojis.items():
-        output = f"assets/slot_images/{name}.png"
-        generate_emoji_image(emoji, output)
-        print(f"Generated {output}")
+    main()